@@ -0,0 +1,244 @@
+import time
+
+import numpy as np
+
+import cell_graph
+
+# Configuration
+USE_AGENTS = False # Simulate moving characters (merchants, rulers, adventurers) on the cell graph after the economy
+AGENT_SEED = 0
+AGENT_TICKS = 120 # One tick is one day of travel
+AGENT_ROLES = ['merchant', 'ruler', 'adventurer']
+AGENT_COUNTS = {'merchant': 2000, 'adventurer': 300} # Rulers: one per state with burgs
+AGENT_SPEEDS = {'merchant': 2, 'ruler': 1, 'adventurer': 3} # Cells crossed per tick
+STARTING_GOLD = {'merchant': 100, 'ruler': 1000, 'adventurer': 10}
+MERCHANT_CARGO = 10 # Units of its burg's largest surplus a merchant buys (at 1 gold each)
+MERCHANT_MARGIN = 0.2 # Extra gold per unit a merchant gets selling to a burg short of that commodity
+ROBBERY_RATE = 0.1 # Share of their gold merchants lose to adventurers sharing their cell (outside burgs)
+
+# Agents live in struct-of-arrays form: one typed array per attribute, agent index = position.
+# The spatial hash is a CSR index over cells (agents sorted by cell plus the start of every cell),
+# rebuilt every tick (one counting pass plus a stable sort); encounters gather the agents of shared cells from it.
+
+def build_agent_world(cells, table=None, transport_costs=None):
+    """
+    The static world agents move in: the land cell graph as a padded cells x max degree neighbour matrix
+    (-1 = none), cell positions, and the burgs (cells, states, largest surplus and shortages) if a burg table is given.
+    """
+    graph = cell_graph.build_cell_graph(cells, transport_costs or {})
+    n = graph['n']
+    land = graph['h'] >= cell_graph.WATER_HEIGHT
+    degree = np.diff(graph['indptr'])
+    sources = np.repeat(np.arange(n), degree)
+    slots = np.arange(len(graph['indices'])) - graph['indptr'][sources]
+    neighbours = np.full((n, max(int(degree.max(initial=0)), 1)), -1, dtype=np.int32)
+    walkable = land[sources] & land[graph['indices']]
+    neighbours[sources[walkable], slots[walkable]] = graph['indices'][walkable]
+
+    world = {
+        'n_cells': n,
+        'x': graph['x'],
+        'y': graph['y'],
+        'neighbours': neighbours,
+        'land_cells': np.nonzero(land)[0].astype(np.int32),
+        'burg_cells': np.zeros(0, dtype=np.int32),
+        'cell_burg': np.full(n, -1, dtype=np.int32),
+        'commodities': [],
+    }
+    if table is not None:
+        rows = np.array([r for r, c in enumerate(table['cell']) if c is not None and 0 <= c < n and land[c]], dtype=np.int64)
+        burg_cells = np.array([table['cell'][r] for r in rows], dtype=np.int32)
+        states = np.array([-1 if table['state'][r] is None else table['state'][r] for r in rows], dtype=np.int64)
+        order = np.argsort(states, kind='stable')
+        state_ids, starts, counts = np.unique(states[order], return_index=True, return_counts=True)
+        net_production = table['net_production'][rows]
+        world.update({
+            'burg_cells': burg_cells,
+            'state_burg_cells': burg_cells[order], # Burg cells grouped by state, with every state's range
+            'state_ids': state_ids,
+            'state_starts': starts,
+            'state_counts': counts,
+            'surplus': np.where(net_production.max(axis=1, initial=0) > 0, net_production.argmax(axis=1), -1),
+            'shortage': net_production < 0,
+            'commodities': list(table['commodities']),
+        })
+        world['cell_burg'][burg_cells] = np.arange(len(rows), dtype=np.int32)
+        world['capitals'] = [(int(states[r]), int(burg_cells[r])) for r in range(len(rows)) if states[r] > 0 and table['capital'][rows[r]]]
+    return world
+
+def spawn_agents(world, counts=None, seed=None):
+    """
+    Agents as typed arrays: role, cell, goal, home state, gold and inventory (agents x commodities).
+    Merchants start in random burgs, rulers in their capitals and adventurers on random land cells.
+    """
+    counts = AGENT_COUNTS if counts is None else counts
+    rng = np.random.default_rng(AGENT_SEED if seed is None else seed)
+    burg_cells, land_cells = world['burg_cells'], world['land_cells']
+    capitals = world.get('capitals', [])
+
+    starts = {
+        'merchant': burg_cells[rng.integers(len(burg_cells), size=counts.get('merchant', 0))] if len(burg_cells) else np.zeros(0, dtype=np.int32),
+        'ruler': np.array([cell for _, cell in capitals], dtype=np.int32),
+        'adventurer': land_cells[rng.integers(len(land_cells), size=counts.get('adventurer', 0))] if len(land_cells) else np.zeros(0, dtype=np.int32),
+    }
+    role = np.concatenate([np.full(len(starts[r]), i, dtype=np.int8) for i, r in enumerate(AGENT_ROLES)])
+    cell = np.concatenate([starts[r] for r in AGENT_ROLES]).astype(np.int32)
+    state = np.full(len(cell), -1, dtype=np.int32)
+    state[role == AGENT_ROLES.index('ruler')] = [s for s, _ in capitals]
+
+    agents = {
+        'rng': rng,
+        'tick': 0,
+        'role': role,
+        'cell': cell,
+        'goal': cell.copy(),
+        'state': state,
+        'speed': np.array([AGENT_SPEEDS[r] for r in AGENT_ROLES], dtype=np.int32)[role],
+        'gold': np.array([STARTING_GOLD[r] for r in AGENT_ROLES], dtype=np.float32)[role],
+        'inventory': np.zeros((len(cell), len(world['commodities'])), dtype=np.float32),
+        'hash_order': np.zeros(len(cell), dtype=np.int64),
+        'hash_start': np.zeros(world['n_cells'] + 1, dtype=np.int64),
+        'stats': {'arrivals': 0, 'trades': 0, 'encounters': 0, 'robberies': 0, 'stolen_gold': 0.0},
+    }
+    choose_goals(world, agents, np.arange(len(cell)))
+    build_spatial_hash(world, agents)
+    return agents
+
+def choose_goals(world, agents, index):
+    """New goals for the given agents: merchants a random burg, rulers a burg of their state, adventurers any land cell."""
+    rng, role = agents['rng'], agents['role'][index]
+    goal = agents['goal']
+    for code, name in enumerate(AGENT_ROLES):
+        chosen = index[role == code]
+        if not len(chosen):
+            continue
+        if name == 'adventurer' or not len(world['burg_cells']):
+            pool = world['land_cells']
+            if len(pool):
+                goal[chosen] = pool[rng.integers(len(pool), size=len(chosen))]
+        elif name == 'merchant':
+            goal[chosen] = world['burg_cells'][rng.integers(len(world['burg_cells']), size=len(chosen))]
+        else:
+            s = np.searchsorted(world['state_ids'], agents['state'][chosen])
+            picks = world['state_starts'][s] + (rng.random(len(chosen)) * world['state_counts'][s]).astype(np.int64)
+            goal[chosen] = world['state_burg_cells'][picks]
+
+def step_agents(world, agents, moving):
+    """
+    Moves the given agents one cell: to the neighbour closest to their goal if it is closer than where they are,
+    otherwise (stuck behind a coast or a concave border) to a random neighbour.
+    """
+    x, y, neighbours = world['x'], world['y'], world['neighbours']
+    cell, goal = agents['cell'][moving], agents['goal'][moving]
+    candidates = neighbours[cell]
+    valid = candidates >= 0
+    safe = np.where(valid, candidates, 0)
+    gx, gy = x[goal][:, None], y[goal][:, None]
+    distance = np.where(valid, (x[safe] - gx) ** 2 + (y[safe] - gy) ** 2, np.inf)
+    best = distance.argmin(axis=1)
+    rows = np.arange(len(moving))
+    closer = distance[rows, best] < (x[cell] - x[goal]) ** 2 + (y[cell] - y[goal]) ** 2
+
+    # Random valid neighbour for the stuck ones (agents on isolated cells stay)
+    options = valid.sum(axis=1)
+    pick = (agents['rng'].random(len(moving)) * options).astype(np.int64)
+    random_slot = (np.cumsum(valid, axis=1) > pick[:, None]).argmax(axis=1)
+    slot = np.where(closer, best, random_slot)
+    agents['cell'][moving] = np.where(options > 0, candidates[rows, slot], cell)
+
+def build_spatial_hash(world, agents):
+    """Agents sorted by cell (hash_order) and the start of every cell in that order (hash_start, one past the end last)."""
+    counts = np.bincount(agents['cell'], minlength=world['n_cells'])
+    np.cumsum(counts, out=agents['hash_start'][1:])
+    agents['hash_order'] = np.argsort(agents['cell'], kind='stable')
+    return counts
+
+def get_agents_at(agents, cell):
+    """Agents standing on a cell, through the spatial hash."""
+    return agents['hash_order'][agents['hash_start'][cell]:agents['hash_start'][cell + 1]]
+
+def get_agents_in(agents, cells, counts):
+    """Agents standing on any of the given cells (counts: agents per cell) and the position in `cells` of each one's cell."""
+    lengths = counts[cells]
+    offsets = np.cumsum(lengths) - lengths
+    group = np.repeat(np.arange(len(cells)), lengths)
+    positions = agents['hash_start'][cells][group] + np.arange(int(lengths.sum())) - offsets[group]
+    return agents['hash_order'][positions], group
+
+def trade_at_burgs(world, agents, arrived):
+    """Merchants arriving in a burg sell what it is short of (with a margin) and buy a cargo of its largest surplus."""
+    merchants = arrived[(agents['role'][arrived] == AGENT_ROLES.index('merchant'))]
+    burgs = world['cell_burg'][agents['cell'][merchants]]
+    merchants, burgs = merchants[burgs >= 0], burgs[burgs >= 0]
+    if not len(merchants) or not world['commodities']:
+        return
+    inventory, gold = agents['inventory'], agents['gold']
+    sold = inventory[merchants] * world['shortage'][burgs]
+    gold[merchants] += sold.sum(axis=1) * (1 + MERCHANT_MARGIN)
+    inventory[merchants] -= sold
+
+    surplus = world['surplus'][burgs]
+    buying = (surplus >= 0) & (gold[merchants] > 0)
+    amount = np.minimum(gold[merchants[buying]], MERCHANT_CARGO)
+    inventory[merchants[buying], surplus[buying]] += amount
+    gold[merchants[buying]] -= amount
+    agents['stats']['trades'] += int(buying.sum())
+
+def resolve_encounters(world, agents, counts):
+    """
+    Agents sharing a cell meet; where merchants meet adventurers outside a burg, the adventurers rob them and share the loot.
+    Only the agents of shared cells are looked at, gathered through the spatial hash.
+    """
+    shared = np.nonzero(counts >= 2)[0]
+    agents['stats']['encounters'] += len(shared)
+    shared = shared[world['cell_burg'][shared] < 0]
+    met, group = get_agents_in(agents, shared, counts)
+    role, gold = agents['role'][met], agents['gold']
+    merchant, adventurer = role == AGENT_ROLES.index('merchant'), role == AGENT_ROLES.index('adventurer')
+    adventurers = np.bincount(group[adventurer], minlength=len(shared))
+    robbed = merchant & (adventurers[group] > 0)
+    if not robbed.any():
+        return
+    loss = gold[met[robbed]] * ROBBERY_RATE
+    gold[met[robbed]] -= loss
+    loot = np.bincount(group[robbed], weights=loss, minlength=len(shared))
+    gold[met[adventurer]] += loot[group[adventurer]] / adventurers[group[adventurer]]
+    agents['stats']['robberies'] += int(robbed.sum())
+    agents['stats']['stolen_gold'] += float(loss.sum())
+
+def advance_agents(world, agents):
+    """One tick: every agent moves up to its speed towards its goal; arrivals trade and pick new goals; encounters resolve."""
+    speed, cell, goal = agents['speed'], agents['cell'], agents['goal']
+    for step in range(int(speed.max(initial=0))):
+        moving = np.nonzero((speed > step) & (cell != goal))[0]
+        if not len(moving):
+            break
+        step_agents(world, agents, moving)
+
+    arrived = np.nonzero(cell == goal)[0]
+    agents['stats']['arrivals'] += len(arrived)
+    trade_at_burgs(world, agents, arrived)
+    choose_goals(world, agents, arrived)
+    resolve_encounters(world, agents, build_spatial_hash(world, agents))
+    agents['tick'] += 1
+
+def materialize_agents(world, agents):
+    """Agent dicts for output (id, role, cell, goal, state, gold and the commodities carried)."""
+    commodities = world['commodities']
+    return [{'id': i, 'role': AGENT_ROLES[r], 'cell': c, 'goal': g, 'state': None if s < 0 else s, 'gold': round(gold, 2),
+             'inventory': {commodity: round(amount, 2) for commodity, amount in zip(commodities, inventory) if amount}}
+            for i, (r, c, g, s, gold, inventory) in enumerate(zip(agents['role'].tolist(), agents['cell'].tolist(), agents['goal'].tolist(),
+                                                                   agents['state'].tolist(), agents['gold'].tolist(), agents['inventory'].tolist()))]
+
+def run_agents(table, cells, ticks=None, transport_costs=None):
+    """Spawns the agents of a world and runs them for a number of ticks. Returns the agents as dicts and stats."""
+    ticks = AGENT_TICKS if ticks is None else ticks
+    start = time.perf_counter()
+    world = build_agent_world(cells, table, transport_costs)
+    agents = spawn_agents(world)
+    print(f"--- Simulating Agents ({len(agents['role'])} agents, {ticks} ticks) ---")
+    for _ in range(ticks):
+        advance_agents(world, agents)
+    stats = dict(agents['stats'], run_time_s=round(time.perf_counter() - start, 4))
+    print(f"Arrivals: {stats['arrivals']:,}, trades: {stats['trades']:,}, robberies: {stats['robberies']:,} ({stats['run_time_s']:.2f}s)")
+    return materialize_agents(world, agents), stats
@@ -0,0 +1,109 @@
+import numpy as np
+
+# Burg table: one column per burg field instead of one dict per burg.
+# Scalar fields are columns of length n (NumPy arrays when typed, lists when they may hold None),
+# citizens / quartiers / net production / area requirements are dense n x k matrices
+# whose column names are kept next to them (citizen_names, commodities, area_keys).
+# Simulation stages read and write the columns. Dicts are built only for stages whose output is per-burg records:
+# materialize_burgs once for the burgs JSON, map and report, get_trade_burgs for the dict-based trade solvers.
+
+def make_burg_table(burgs, compiled, arrays):
+    """Burg table of raw map burgs and their economy arrays (see simulate_economy.get_burg_economy_arrays)."""
+    return {
+        'n': len(burgs),
+        'id': np.array([burg.get('i') for burg in burgs], dtype=np.int64),
+        'name': [burg.get('name') for burg in burgs],
+        'cell': [burg.get('cell') for burg in burgs],
+        'x': np.array([burg.get('x') for burg in burgs], dtype=np.float64),
+        'y': np.array([burg.get('y') for burg in burgs], dtype=np.float64),
+        'type': [burg.get('type') for burg in burgs],
+        'state': [burg.get('state') for burg in burgs],
+        'state_name': None, # Filled in by set_state_names
+        'capital': [burg.get('capital') for burg in burgs],
+        'population': np.array([round(burg.get('population') * 1000) for burg in burgs], dtype=np.int64),
+        'citizen_names': list(compiled['citizens']),
+        'citizens': arrays['citizens'],
+        'has_citizens': np.asarray(arrays['has_citizens'], dtype=bool),
+        'has_quartiers': np.asarray(arrays['has_citizens'], dtype=bool) & (compiled['inhabitants_per_quartier'] is not None),
+        'quartiers': arrays['quartiers'],
+        'commodities': list(compiled['commodities']),
+        'net_production': arrays['net_production'],
+        'area_keys': list(compiled['area_requirements']),
+        'area_requirements': arrays['area_requirements'],
+    }
+
+def set_state_names(table, states):
+    """
+    Names every burg's state from the map's states list (index = state id), "Neutral" if unknown.
+    Burgs without a state keep no name.
+    """
+    names = []
+    for state_id in table['state']:
+        if state_id is None:
+            names.append(None)
+        elif isinstance(states, list) and 0 <= state_id < len(states):
+            names.append(states[state_id].get('name', 'Neutral'))
+        else:
+            names.append("Neutral")
+    table['state_name'] = names
+
+def get_state_fields(table, i):
+    """The state part of a burg record: state_id and state_name once states are named, else the raw state."""
+    state = table['state'][i]
+    if table['state_name'] is None or state is None:
+        return {'state': state}
+    return {'state_id': state, 'state_name': table['state_name'][i]}
+
+def materialize_burgs(table):
+    """
+    Burg dicts for output (JSON, map, report), built column by column in their final key order.
+    Burgs with a named state lead with id, name, x, y, type, state_id and state_name.
+    Tables with catchment columns (see catchments.apply_catchments) add a catchment_burg entry.
+    """
+    ids, xs, ys, population = table['id'].tolist(), table['x'].tolist(), table['y'].tolist(), table['population'].tolist()
+    citizens, quartiers = table['citizens'].tolist(), table['quartiers'].tolist()
+    net_production, area_requirements = table['net_production'].tolist(), table['area_requirements'].tolist()
+    names, commodities, area_keys = table['citizen_names'], table['commodities'], table['area_keys']
+    catchments = None
+    if 'catchment_ha' in table:
+        catchments = list(zip(table['catchment_cells'].tolist(), table['catchment_ha'].tolist(), table['farmland_feasible'].tolist()))
+
+    burgs = []
+    for i in range(table['n']):
+        burg_citizens = dict(zip(names, citizens[i])) if table['has_citizens'][i] else {}
+        burg_quartiers = dict(zip(names, quartiers[i])) if table['has_quartiers'][i] else {}
+        state = get_state_fields(table, i)
+        head = {'id': ids[i], 'name': table['name'][i]}
+        if 'state' in state:
+            head.update({'cell': table['cell'][i], 'x': xs[i], 'y': ys[i], 'type': table['type'][i], **state})
+        else:
+            head.update({'x': xs[i], 'y': ys[i], 'type': table['type'][i], **state, 'cell': table['cell'][i]})
+        burgs.append({
+            **head,
+            'capital': table['capital'][i],
+            'population': population[i],
+            'citizens': burg_citizens,
+            'soldiers': burg_citizens.get('Soldier', 0),
+            'nr_quartiers': sum(burg_quartiers.values()),
+            'soldier_quartiers': burg_quartiers.get('Soldier', 0),
+            'craftsman_quartiers': burg_quartiers.get('Craftsman', 0),
+            'quartiers': burg_quartiers,
+            'net_production_burg': dict(zip(commodities, net_production[i])),
+            'area_requirements_burg': dict(zip(area_keys, area_requirements[i])),
+        })
+        if catchments is not None:
+            land_cells, land_ha, (feasible_min, feasible_max) = catchments[i]
+            burgs[-1]['catchment_burg'] = {'Land_Cells': land_cells, 'Land_ha': round(land_ha),
+                                           'Farmland_Feasible_Min': feasible_min, 'Farmland_Feasible_Max': feasible_max}
+    return burgs
+
+def get_trade_burgs(table):
+    """
+    Flat burg records for the trade, sea lane and route stages: position, cell, state and net production only
+    (no citizens, quartiers or area requirements).
+    """
+    ids, xs, ys = table['id'].tolist(), table['x'].tolist(), table['y'].tolist()
+    net_production, commodities = table['net_production'].tolist(), table['commodities']
+    return [{'id': ids[i], 'name': table['name'][i], 'x': xs[i], 'y': ys[i], 'cell': table['cell'][i], **get_state_fields(table, i),
+             'net_production_burg': dict(zip(commodities, net_production[i]))}
+            for i in range(table['n'])]
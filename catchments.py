@@ -0,0 +1,62 @@
+import numpy as np
+
+import cell_graph
+
+# Configuration
+USE_CATCHMENTS = False # Check every burg's farmland requirement against the land of its catchment area
+DISTANCE_SCALE = 3 # Km per map unit (Azgaar's distanceScale), used when the map settings do not give one
+MILES_TO_KM = 1.609344
+FARMLAND_KEYS = ("Farmland_to_Feed_Burg_ha_Min", "Farmland_to_Feed_Burg_ha_Max")
+
+def get_hectares_per_area_unit(map_data=None):
+    """Hectares of one unit of cell 'area' (map units squared), from the map's distance scale and unit."""
+    settings = (map_data or {}).get('settings', {})
+    scale = float(settings.get('distanceScale') or DISTANCE_SCALE)
+    if str(settings.get('distanceUnit', 'km')).startswith('mi'):
+        scale *= MILES_TO_KM
+    return scale * scale * 100 # km² -> ha
+
+def assign_cells(table, graph, cutoff=np.inf):
+    """Table row of the burg every cell is cheapest to reach from (-1 beyond cutoff), from one multi-source search."""
+    _, origin, _ = cell_graph.dijkstra(graph, table['cell'], cutoff=cutoff)
+    return origin.astype(np.int64)
+
+def get_catchments(table, cells, transport_costs=None, hectares_per_area_unit=None):
+    """
+    Every land cell goes to the burg it is cheapest to reach from by travel cost (one search over the cell graph);
+    returns the cell -> burg row assignment and the land cells and land hectares of every burg (bincount over the cells).
+    """
+    hectares_per_area_unit = get_hectares_per_area_unit() if hectares_per_area_unit is None else hectares_per_area_unit
+    graph = cell_graph.build_cell_graph(cells, transport_costs or {})
+    origin = assign_cells(table, graph)
+    area = np.zeros(graph['n'])
+    for cell in cells:
+        if 'i' in cell:
+            area[cell['i']] = cell.get('area', 0)
+    owned = (graph['h'] >= cell_graph.WATER_HEIGHT) & (origin >= 0)
+    land_cells = np.bincount(origin[owned], minlength=table['n'])
+    land_ha = np.bincount(origin[owned], weights=area[owned], minlength=table['n']) * hectares_per_area_unit
+    return origin, land_cells, land_ha
+
+def apply_catchments(table, cells, transport_costs=None, hectares_per_area_unit=None):
+    """
+    Adds the catchment columns to the burg table: land cells, land hectares and whether the minimum and the maximum
+    farmland requirement fit into that land (burgs without a cell have no catchment). Returns stats for the report.
+    """
+    _, land_cells, land_ha = get_catchments(table, cells, transport_costs, hectares_per_area_unit)
+    table['catchment_cells'] = land_cells
+    table['catchment_ha'] = land_ha
+    farmland = [table['area_keys'].index(key) for key in FARMLAND_KEYS if key in table['area_keys']]
+    if len(farmland) == len(FARMLAND_KEYS):
+        table['farmland_feasible'] = table['area_requirements'][:, farmland] <= land_ha[:, None]
+    else:
+        table['farmland_feasible'] = np.ones((table['n'], len(FARMLAND_KEYS)), dtype=bool)
+
+    stats = {
+        'infeasible_min': int((~table['farmland_feasible'][:, 0]).sum()),
+        'infeasible_max': int((~table['farmland_feasible'][:, 1]).sum()),
+        'land_ha': float(land_ha.sum()),
+    }
+    print(f"Catchments: {stats['infeasible_min']} of {table['n']} burgs lack the land for their minimum farmland "
+          f"({stats['infeasible_max']} for the maximum)")
+    return stats
@@ -0,0 +1,176 @@
+import heapq
+import math
+
+import numpy as np
+
+# Configuration
+WATER_HEIGHT = 20 # Cells below this height are water (same threshold as the interactive map)
+COST_FIELD_CUTOFF = 500 # Max travel cost (land-equivalent distance) explored from each exporter
+
+def get_cell_travel_cost(cell, transport_costs):
+    """Per-unit-distance travel cost of crossing a cell, normalized so that land costs 1."""
+    land = transport_costs.get('Land', 1) or 1
+    if cell.get('h', 0) < WATER_HEIGHT:
+        return transport_costs.get('Sea', land) / land
+    if cell.get('r', 0):
+        return transport_costs.get('River', land) / land
+    return 1.0
+
+def build_cell_graph(cells, transport_costs):
+    """
+    Builds the weighted cell adjacency graph from pack.cells neighbour lists ('c').
+    Edge weight = distance between cell centers x mean travel cost of both cells.
+    Returns a dict of compact CSR arrays (indptr, indices, weights) plus per-cell positions and heights.
+    Cell ids are the cell 'i' values; missing ids get no edges.
+    """
+    n = max((c.get('i', 0) for c in cells), default=-1) + 1
+    x = np.zeros(n, dtype=np.float64)
+    y = np.zeros(n, dtype=np.float64)
+    h = np.zeros(n, dtype=np.int16)
+    cost = np.ones(n, dtype=np.float64)
+    neighbours = [[] for _ in range(n)]
+
+    for cell in cells:
+        i = cell.get('i')
+        if i is None: continue
+        px, py = cell.get('p', [0, 0])
+        x[i], y[i] = px, py
+        h[i] = cell.get('h', 0)
+        cost[i] = get_cell_travel_cost(cell, transport_costs)
+        neighbours[i] = [j for j in cell.get('c', []) if 0 <= j < n]
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(nb) for nb in neighbours])
+    indices = np.fromiter((j for nb in neighbours for j in nb), dtype=np.int32, count=int(indptr[-1]))
+    sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+
+    lengths = np.sqrt((x[indices] - x[sources]) ** 2 + (y[indices] - y[sources]) ** 2)
+    weights = (lengths * (cost[indices] + cost[sources]) / 2).astype(np.float32)
+
+    return {'n': n, 'indptr': indptr, 'indices': indices, 'weights': weights, 'x': x, 'y': y, 'h': h,
+            'min_unit_cost': float(cost.min()) if n else 1.0}
+
+def dijkstra(graph, sources, cutoff=math.inf, targets=None):
+    """
+    Multi-source Dijkstra over the cell graph.
+    sources: list of cell ids, all starting at cost 0.
+    Returns (cost, origin, predecessor) arrays over all cells: travel cost to the nearest source
+    (inf beyond cutoff), the position in `sources` of that source (-1 if unreached)
+    and the previous cell on the shortest path (-1 for sources and unreached cells).
+    targets: optional cell ids; the search stops once all of them are settled, leaving farther cells unreached.
+    """
+    n = graph['n']
+    cost = np.full(n, np.inf)
+    origin = np.full(n, -1, dtype=np.int32)
+    predecessor = np.full(n, -1, dtype=np.int32)
+
+    # Plain lists are much faster than NumPy element access inside the loop
+    indptr = graph['indptr'].tolist()
+    indices = graph['indices'].tolist()
+    weights = graph['weights'].tolist()
+    best = {}
+    settled = set()
+
+    heap = []
+    for s, cell in enumerate(sources):
+        if cell is None or not 0 <= cell < n: continue
+        if cell not in best:
+            best[cell] = 0.0
+            heap.append((0.0, s, cell, -1))
+    heapq.heapify(heap)
+    remaining = None if targets is None else set(targets)
+
+    while heap:
+        d, s, u, prev = heapq.heappop(heap)
+        if u in settled: continue
+        settled.add(u)
+        cost[u], origin[u], predecessor[u] = d, s, prev
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining: break
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd <= cutoff and nd < best.get(v, math.inf):
+                best[v] = nd
+                heapq.heappush(heap, (nd, s, v, u))
+
+    return cost, origin, predecessor
+
+def dijkstra_targets(graph, source, targets, cutoff=math.inf):
+    """
+    Single-source Dijkstra that only records the cost to the given target cells.
+    Stops early once every target is settled or the cutoff is reached.
+    """
+    indptr = graph['indptr']
+    indices = graph['indices']
+    weights = graph['weights']
+    remaining = {}
+    for t, cell in enumerate(targets):
+        remaining.setdefault(cell, []).append(t)
+    result = np.full(len(targets), np.inf, dtype=np.float32)
+
+    best = {source: 0.0}
+    settled = set()
+    heap = [(0.0, source)]
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if u in settled: continue
+        settled.add(u)
+        for t in remaining.pop(u, []):
+            result[t] = d
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd <= cutoff and nd < best.get(v, math.inf):
+                best[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+    return result
+
+def build_transport_cost_table(graph, source_burgs, target_burgs, cutoff=None):
+    """
+    Travel-cost fields from every source burg, kept only at the target burgs' cells.
+    Returns a dict holding a len(sources) x len(targets) float32 cost matrix (inf beyond cutoff)
+    and id -> row/column lookups, so a burg-to-burg cost is a single array access.
+    The graph is undirected, so the fields are grown from whichever side has fewer burgs.
+    """
+    cutoff = COST_FIELD_CUTOFF if cutoff is None else cutoff
+    print(f"--- Computing transport cost fields ({len(source_burgs)} sources, {len(target_burgs)} targets, cutoff {cutoff}) ---")
+
+    transpose = len(target_burgs) < len(source_burgs)
+    field_burgs, kept_burgs = (target_burgs, source_burgs) if transpose else (source_burgs, target_burgs)
+
+    graph_lists = {'indptr': graph['indptr'].tolist(), 'indices': graph['indices'].tolist(), 'weights': graph['weights'].tolist()}
+    kept_cells = [b.get('cell') for b in kept_burgs]
+    costs = np.full((len(field_burgs), len(kept_burgs)), np.inf, dtype=np.float32)
+    for row, burg in enumerate(field_burgs):
+        cell = burg.get('cell')
+        if cell is None or not 0 <= cell < graph['n']: continue
+        costs[row] = dijkstra_targets(graph_lists, cell, kept_cells, cutoff)
+
+    if transpose:
+        costs = np.ascontiguousarray(costs.T)
+    return make_transport_cost_table(graph, source_burgs, target_burgs, costs, cutoff)
+
+def make_transport_cost_table(graph, source_burgs, target_burgs, costs, cutoff):
+    """Wraps a cost matrix with the lookups and bounds simulate_trade needs."""
+    # Burgs do not sit exactly on their cell center; this bounds how much that shortens a path
+    offsets = [math.hypot(b['x'] - graph['x'][b['cell']], b['y'] - graph['y'][b['cell']])
+               for b in list(source_burgs) + list(target_burgs) if b.get('cell') is not None and 0 <= b['cell'] < graph['n']]
+    return {
+        'rows': {b['id']: r for r, b in enumerate(source_burgs)},
+        'cols': {b['id']: c for c, b in enumerate(target_burgs)},
+        'costs': costs,
+        'cutoff': cutoff,
+        'min_unit_cost': graph['min_unit_cost'],
+        'max_cell_offset': max(offsets, default=0.0),
+    }
+
+def get_transport_cost(table, from_id, to_id):
+    """O(1) burg-to-burg travel cost lookup (inf if unknown or beyond the cutoff)."""
+    row = table['rows'].get(from_id)
+    col = table['cols'].get(to_id)
+    if row is None or col is None:
+        return math.inf
+    return float(table['costs'][row, col])
@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+
+import cell_graph
+
+# Configuration
+USE_CLIMATE = False # Seasons and weather change the food yield of every burg during the economy ticks
+CLIMATE_SEED = 0
+TICKS_PER_YEAR = 12
+SUMMER_TICK = 6 # Tick of the year with the warmest weather (and the most rain)
+SEASONAL_AMPLITUDE = (3, 15) # Half the summer-winter temperature range (°C) of the warmest and the coldest cells
+AMPLITUDE_TEMPERATURES = (25, -5) # Annual mean temperatures (the cells' 't') of those two amplitudes, interpolated between
+PRECIPITATION_SEASONALITY = 0.3 # Relative rise of precipitation in summer (and fall in winter)
+WEATHER_CELL_SIZE = 200 # Map units per weather region: cells in the same region share the weather anomalies
+WEATHER_PERSISTENCE = 0.7 # How much of last tick's weather anomaly carries over
+TEMPERATURE_NOISE = 2.0 # Monthly temperature anomaly noise (°C)
+PRECIPITATION_NOISE = 0.3 # Monthly log-noise of precipitation
+GROWING_TEMPERATURE = (5, 18, 35) # Crops grow above the first, best at the second and not above the third temperature (°C)
+DRY_PRECIPITATION = 40 # Monthly precipitation (mm) below which crops grow less, down to nothing without rain
+# Biome id (Azgaar's default biomes) -> mean monthly precipitation (mm)
+BIOME_PRECIPITATION = {0: 80, 1: 10, 2: 15, 3: 60, 4: 50, 5: 120, 6: 80, 7: 200, 8: 150, 9: 50, 10: 25, 11: 20, 12: 120}
+
+def get_growing_suitability(temperature, precipitation, out=None):
+    """How well crops grow (0 to 1) at these temperatures and precipitations, element-wise."""
+    low, best, high = GROWING_TEMPERATURE
+    out = np.empty_like(temperature) if out is None else out
+    np.minimum((temperature - low) / (best - low), (high - temperature) / (high - best), out=out)
+    np.clip(out, 0, 1, out=out)
+    out *= np.clip(precipitation / DRY_PRECIPITATION, 0, 1)
+    return out
+
+def get_season(tick):
+    """Seasonal cycle at a tick: 1 at the height of summer, -1 in deep winter."""
+    return np.cos(2 * np.pi * (tick - SUMMER_TICK) / TICKS_PER_YEAR)
+
+def build_climate_state(table, cells, seed=None):
+    """
+    Per-cell climate arrays (mean temperature, seasonal amplitude, mean precipitation, weather region) and
+    the cell of every burg. The yearly mean growing suitability of every cell (without weather) is computed
+    once, so burg food yields are 1 on average over a normal year and the static economy stays the baseline.
+    """
+    cells = [c for c in cells if 'i' in c]
+    x = np.array([c.get('p', [0, 0])[0] for c in cells], dtype=np.float64)
+    y = np.array([c.get('p', [0, 0])[1] for c in cells], dtype=np.float64)
+    mean_temperature = np.array([c.get('t', 0) for c in cells], dtype=np.float64)
+    precipitation = np.array([BIOME_PRECIPITATION.get(c.get('biome', 0), 50) for c in cells], dtype=np.float64)
+    water = np.array([c.get('h', 0) < cell_graph.WATER_HEIGHT for c in cells], dtype=bool)
+
+    warm, cold = AMPLITUDE_TEMPERATURES
+    amplitude = np.interp(mean_temperature, [cold, warm], SEASONAL_AMPLITUDE[::-1])
+    amplitude[water] *= 0.5 # The sea evens out the seasons
+
+    # Weather regions: coarse grid squares, numbered densely
+    gx = (x // WEATHER_CELL_SIZE).astype(np.int64)
+    gy = (y // WEATHER_CELL_SIZE).astype(np.int64)
+    _, region = np.unique(gx * (gy.max(initial=0) + 1) + gy, return_inverse=True)
+    n_regions = int(region.max(initial=-1)) + 1
+
+    position = {c['i']: k for k, c in enumerate(cells)}
+    burg_cells = np.array([position.get(cell, -1) if cell is not None else -1 for cell in table['cell']], dtype=np.int64)
+
+    state = {
+        'rng': np.random.default_rng(CLIMATE_SEED if seed is None else seed),
+        'mean_temperature': mean_temperature,
+        'amplitude': amplitude,
+        'mean_precipitation': precipitation,
+        'region': region,
+        'burg_cells': burg_cells,
+        'has_cell': burg_cells >= 0,
+        'temperature_anomaly': np.zeros(n_regions),
+        'precipitation_anomaly': np.zeros(n_regions),
+        'noise': np.zeros(n_regions),
+        # Current fields
+        'temperature': np.zeros(len(cells)),
+        'precipitation': np.zeros(len(cells)),
+        'suitability': np.zeros(len(cells)),
+        'food_yield': np.ones(table['n']),
+    }
+    seasons = get_season(np.arange(TICKS_PER_YEAR))[:, None]
+    normal_year = get_growing_suitability(mean_temperature + amplitude * seasons,
+                                          precipitation * (1 + PRECIPITATION_SEASONALITY * seasons))
+    state['normal_suitability'] = normal_year.mean(axis=0)
+    return state
+
+def advance_climate(state, tick):
+    """
+    Temperature and precipitation of every cell at a tick (season plus the weather anomaly of its region),
+    and the food yield of every burg: its cell's growing suitability relative to a normal year's mean.
+    Burgs without a cell, or whose cell never grows crops, keep a yield of 1.
+    """
+    rng, noise = state['rng'], state['noise']
+    for key, scale in (('temperature_anomaly', TEMPERATURE_NOISE), ('precipitation_anomaly', PRECIPITATION_NOISE)):
+        rng.standard_normal(out=noise)
+        state[key] *= WEATHER_PERSISTENCE
+        state[key] += noise * scale
+
+    season = get_season(tick)
+    temperature, precipitation, region = state['temperature'], state['precipitation'], state['region']
+    np.multiply(state['amplitude'], season, out=temperature)
+    temperature += state['mean_temperature']
+    temperature += state['temperature_anomaly'][region]
+    np.exp(state['precipitation_anomaly'][region], out=precipitation)
+    precipitation *= state['mean_precipitation'] * (1 + PRECIPITATION_SEASONALITY * season)
+    get_growing_suitability(temperature, precipitation, out=state['suitability'])
+
+    food_yield = state['food_yield']
+    cells = state['burg_cells'][state['has_cell']]
+    normal = state['normal_suitability'][cells]
+    food_yield[state['has_cell']] = np.divide(state['suitability'][cells], normal, out=np.ones(len(cells)), where=normal > 0)
+    return food_yield
+
+def get_checkpoint_arrays(state):
+    return {
+        'temperature_anomaly': state['temperature_anomaly'],
+        'precipitation_anomaly': state['precipitation_anomaly'],
+        'climate_rng': json.dumps(state['rng'].bit_generator.state),
+    }
+
+def set_checkpoint_arrays(state, checkpoint):
+    state['temperature_anomaly'][:] = checkpoint['temperature_anomaly']
+    state['precipitation_anomaly'][:] = checkpoint['precipitation_anomaly']
+    state['rng'].bit_generator.state = json.loads(checkpoint['climate_rng'].item())
@@ -0,0 +1,125 @@
+import time
+
+import numpy as np
+
+import cell_graph
+
+# Configuration
+USE_DIFFUSION = False # Spread culture influence over the cell graph from burgs and culture centers
+DIFFUSION_STEPS = 300
+DIFFUSION_RATE = 0.5 # Share of a cell's influence that comes from its neighbours each step
+DIFFUSION_DECAY = 0.05 # Share of all influence lost each step (keeps influence local and bounded)
+WATER_WEIGHT = 0.2 # Weight of edges touching water relative to land edges (the sea slows cultures down)
+BURG_SEED = 0.001 # Influence added per step per inhabitant of a burg, for the burg's culture
+CENTER_SEED = 10 # Influence added per step at a culture's (or religion's) center cell
+MIN_INFLUENCE = 0.01 # Cells below this influence of every group belong to none (-1)
+FLUSH_INFLUENCE = 1e-20 # Influence below this is set to 0 every step (far-away tails would otherwise become slow float32 subnormals)
+
+# The adjacency is a row-normalized CSR matrix over all cells (row = receiving cell), built once.
+# Influence is a dense cells x groups float32 array; each step is one sparse product with it, done with
+# NumPy alone. The product walks the CSR entries slot by slot (the k-th neighbour of every cell at once):
+# one gather of neighbour rows and one multiply-add per slot, which is much faster than summing
+# variable-length row segments (np.add.reduceat) of a gathered nnz x groups array.
+
+def build_diffusion_matrix(cells):
+    """Row-normalized cell adjacency as CSR arrays from the pack.cells neighbour lists, plus its slot-major layout."""
+    graph = cell_graph.build_cell_graph(cells, {})
+    n, indptr, indices = graph['n'], graph['indptr'], graph['indices'].astype(np.int64)
+    degree = np.diff(indptr)
+    sources = np.repeat(np.arange(n), degree)
+    water = graph['h'] < cell_graph.WATER_HEIGHT
+    data = np.where(water[sources] | water[indices], WATER_WEIGHT, 1.0)
+    row_sum = np.bincount(sources, weights=data, minlength=n)
+    data = (data / row_sum[sources]).astype(np.float32)
+
+    # Slot k holds every cell's k-th neighbour and edge weight (cells with fewer neighbours: cell 0 with weight 0)
+    slots = np.arange(len(indices)) - indptr[sources]
+    slot_indices = np.zeros((int(degree.max(initial=0)), n), dtype=np.int64)
+    slot_data = np.zeros((int(degree.max(initial=0)), n), dtype=np.float32)
+    slot_indices[slots, sources] = indices
+    slot_data[slots, sources] = data
+    return {'n': n, 'indptr': indptr, 'indices': indices, 'data': data, 'slot_indices': slot_indices, 'slot_data': slot_data}
+
+def spmv(matrix, x, out, work):
+    """out = matrix @ x for a dense cells x groups x; work is a buffer shaped like x."""
+    out.fill(0)
+    for neighbours, weights in zip(matrix['slot_indices'], matrix['slot_data']):
+        np.take(x, neighbours, axis=0, out=work)
+        work *= weights[:, None]
+        out += work
+    return out
+
+def get_seeds(n_cells, groups, burgs=None, key='culture'):
+    """
+    Cells x groups influence added every step: CENTER_SEED at each group's center cell (scaled by its expansionism),
+    plus BURG_SEED per inhabitant at every burg cell for the burg's group. Group 0 (Wildlands / No religion) gets none.
+    Returns the seeds and the group ids of the columns.
+    """
+    groups = [g for g in groups if isinstance(g, dict) and g.get('i') and not g.get('removed')]
+    ids = [g['i'] for g in groups]
+    column = {group_id: k for k, group_id in enumerate(ids)}
+    expansionism = np.array([g.get('expansionism', 1) or 1 for g in groups], dtype=np.float64)
+    seeds = np.zeros((n_cells, len(groups)))
+
+    centers = [(g.get('center'), k) for k, g in enumerate(groups) if g.get('center') is not None and 0 <= g['center'] < n_cells]
+    if centers:
+        cells, columns = np.array(centers, dtype=np.int64).T
+        np.add.at(seeds, (cells, columns), CENTER_SEED)
+    burg_seeds = [(b['cell'], column[b[key]], b.get('population', 0) * 1000 * BURG_SEED) for b in burgs or []
+                  if isinstance(b, dict) and b.get(key) in column and b.get('cell') is not None and 0 <= b['cell'] < n_cells]
+    if burg_seeds:
+        cells, columns, amounts = zip(*burg_seeds)
+        np.add.at(seeds, (np.array(cells), np.array(columns)), amounts)
+    return (seeds * expansionism).astype(np.float32), ids
+
+def run_diffusion(matrix, seeds, steps=None):
+    """
+    Influence after a number of steps: each step every cell keeps (1 - DIFFUSION_RATE) of its influence, takes
+    DIFFUSION_RATE from the weighted mean of its neighbours, loses DIFFUSION_DECAY of it all and gains its seeds.
+    """
+    steps = DIFFUSION_STEPS if steps is None else steps
+    influence = np.zeros_like(seeds)
+    spread = np.zeros_like(seeds)
+    work = np.zeros_like(seeds)
+    small = np.zeros(seeds.shape, dtype=bool)
+    for _ in range(steps):
+        spmv(matrix, influence, spread, work)
+        influence *= (1 - DIFFUSION_RATE) * (1 - DIFFUSION_DECAY)
+        spread *= DIFFUSION_RATE * (1 - DIFFUSION_DECAY)
+        influence += spread
+        influence += seeds
+        np.less(influence, FLUSH_INFLUENCE, out=small)
+        np.putmask(influence, small, 0)
+    return influence
+
+def get_dominant_groups(influence, ids):
+    """Group id with the most influence in every cell (-1 where no group reaches MIN_INFLUENCE)."""
+    if not len(ids):
+        return np.full(len(influence), -1, dtype=np.int64)
+    dominant = np.array(ids, dtype=np.int64)[influence.argmax(axis=1)]
+    dominant[influence.max(axis=1) < MIN_INFLUENCE] = -1
+    return dominant
+
+def run_culture_diffusion(cells, groups, burgs=None, key='culture', steps=None):
+    """
+    Spreads the influence of cultures (or, with key='religion', religions) over the cells of a map.
+    Returns a summary per group (cells and land area where it dominates) plus the dominant group of every cell.
+    """
+    steps = DIFFUSION_STEPS if steps is None else steps
+    start = time.perf_counter()
+    matrix = build_diffusion_matrix(cells)
+    seeds, ids = get_seeds(matrix['n'], groups, burgs, key)
+    print(f"--- Diffusing {key} influence ({len(ids)} groups, {matrix['n']} cells, {steps} steps) ---")
+    dominant = get_dominant_groups(run_diffusion(matrix, seeds, steps), ids)
+
+    area = np.zeros(matrix['n'])
+    land = np.zeros(matrix['n'], dtype=bool)
+    for cell in cells:
+        if 'i' in cell:
+            area[cell['i']] = cell.get('area', 0)
+            land[cell['i']] = cell.get('h', 0) >= cell_graph.WATER_HEIGHT
+    names = {g['i']: g.get('name') for g in groups if isinstance(g, dict) and 'i' in g}
+    summary = [{'i': group_id, 'name': names.get(group_id), 'cells': int((dominant[land] == group_id).sum()),
+                'area': float(area[land & (dominant == group_id)].sum())} for group_id in ids]
+    print(f"Diffusion finished in {time.perf_counter() - start:.2f}s")
+    return {'groups': summary, 'dominant': dominant.tolist()}
@@ -0,0 +1,169 @@
+import heapq
+import json
+
+import numpy as np
+
+import cell_graph
+import spatial_index
+
+# Configuration
+USE_DISASTERS = False # Floods, plagues and droughts strike during the economy ticks
+DISASTER_SEED = 0
+YIELD_RECOVERY = 0.1 # Share of the lost food yield recovered every tick
+DISASTERS = {
+    # rate: chance per tick of a new disaster of this kind, radius in map units
+    'flood': {'rate': 1 / 60, 'radius': 80, 'mortality': 0.01, 'yield_loss': 0.5}, # River cells of the same river
+    'plague': {'rate': 1 / 120, 'radius': 40, 'mortality': 0.1, 'yield_loss': 0.0, 'spread': 0.6, 'spread_delay': 3, 'max_generations': 4}, # Burgs
+    'drought': {'rate': 1 / 36, 'radius': 150, 'mortality': 0.0, 'yield_loss': 0.4}, # Land cells
+}
+DISASTER_KINDS = list(DISASTERS)
+
+# Events are heap tuples (tick, seq, kind, generation, x, y, severity): seq keeps equal ticks in scheduling
+# order and is never equal for two events, so the heap never compares further.
+# Generation 0 events are natural disasters, each of which schedules the next one of its kind when it strikes.
+
+def build_disaster_state(table, cells, seed=None):
+    """Spatial indexes over burgs and cells plus the event queue, seeded with the first disaster of every kind."""
+    rng = np.random.default_rng(DISASTER_SEED if seed is None else seed)
+    burg_points = list(zip(table['x'].tolist(), table['y'].tolist()))
+    cells = [c for c in cells if 'i' in c]
+    cell_ids = np.array([c['i'] for c in cells], dtype=np.int64)
+    cell_river = np.array([c.get('r', 0) for c in cells], dtype=np.int64)
+    cell_land = np.array([c.get('h', 0) >= cell_graph.WATER_HEIGHT for c in cells], dtype=bool)
+
+    cell_burgs = {}
+    for row, cell in enumerate(table['cell']):
+        if cell is not None:
+            cell_burgs.setdefault(cell, []).append(row)
+
+    state = {
+        'rng': rng,
+        'queue': [],
+        'seq': 0,
+        'burg_index': spatial_index.build_grid_index(burg_points),
+        'cell_index': spatial_index.build_grid_index([tuple(c.get('p', [0, 0])) for c in cells]),
+        'cell_ids': cell_ids,
+        'cell_river': cell_river,
+        'cell_land': cell_land,
+        'cell_burgs': cell_burgs,
+        'start_cells': {'flood': np.nonzero(cell_river > 0)[0], 'drought': np.nonzero(cell_land)[0]}, # Where natural disasters start
+        'burg_population': table['population'].astype(np.float64),
+        'food_yield': np.ones(table['n']),
+        'stats': {kind: {'events': 0, 'burgs_hit': 0, 'deaths': 0.0} for kind in DISASTER_KINDS},
+    }
+    for kind in DISASTER_KINDS:
+        schedule_natural(state, kind, 0)
+    return state
+
+def schedule(state, tick, kind, generation, x, y, severity):
+    heapq.heappush(state['queue'], (tick, state['seq'], DISASTER_KINDS.index(kind), generation, x, y, severity))
+    state['seq'] += 1
+
+def schedule_many(state, events):
+    """Adds many (tick, kind, generation, x, y, severity) events at once: one heapify instead of a push each."""
+    queue, seq = state['queue'], state['seq']
+    events = [(tick, seq + i, DISASTER_KINDS.index(kind), generation, x, y, severity)
+              for i, (tick, kind, generation, x, y, severity) in enumerate(events)]
+    queue.extend(events)
+    state['seq'] = seq + len(events)
+    heapq.heapify(queue)
+
+def schedule_natural(state, kind, now):
+    """Schedules the next natural disaster of a kind after a geometric waiting time, at a place it can strike."""
+    rng = state['rng']
+    tick = now + int(rng.geometric(DISASTERS[kind]['rate']))
+    candidates = state['start_cells'].get(kind)
+    if candidates is None:
+        # Plague starts in a burg, more likely a populous one
+        population = state['burg_population']
+        if not len(population) or population.sum() <= 0:
+            return
+        x, y = state['burg_index']['points'][rng.choice(len(population), p=population / population.sum())]
+    else:
+        if not len(candidates):
+            return
+        x, y = state['cell_index']['points'][candidates[rng.integers(len(candidates))]]
+    schedule(state, tick, kind, 0, float(x), float(y), float(rng.uniform(0.5, 1.0)))
+
+def get_affected_burgs(state, kind, x, y):
+    """Table rows of the burgs a disaster at (x, y) strikes, found through the spatial indexes."""
+    radius = DISASTERS[kind]['radius']
+    if kind == 'plague':
+        return spatial_index.query_radius(state['burg_index'], x, y, radius)
+
+    nearby = np.array(spatial_index.query_radius(state['cell_index'], x, y, radius), dtype=np.int64)
+    if not len(nearby):
+        return []
+    if kind == 'flood':
+        # Only along the river of the cell the flood starts in
+        origin = spatial_index.query_nearest(state['cell_index'], x, y, 1)[0]
+        river = state['cell_river'][origin]
+        nearby = nearby[state['cell_river'][nearby] == river] if river > 0 else nearby[:0]
+    else:
+        nearby = nearby[state['cell_land'][nearby]]
+    cell_burgs = state['cell_burgs']
+    return sorted(row for cell in state['cell_ids'][nearby].tolist() for row in cell_burgs.get(cell, ()))
+
+def strike(state, event, population):
+    """Applies one event to the population and food yield of the burgs it hits; plagues spread to neighbours."""
+    tick, _, kind_code, generation, x, y, severity = event
+    kind = DISASTER_KINDS[kind_code]
+    config = DISASTERS[kind]
+    if generation == 0:
+        schedule_natural(state, kind, tick)
+
+    rows = get_affected_burgs(state, kind, x, y)
+    stats = state['stats'][kind]
+    stats['events'] += 1
+    if not rows:
+        return
+    rows = np.array(rows, dtype=np.int64)
+    deaths = population[rows] * (config['mortality'] * severity)
+    population[rows] -= deaths
+    food_yield = state['food_yield']
+    food_yield[rows] = np.minimum(food_yield[rows], 1 - config['yield_loss'] * severity)
+    stats['burgs_hit'] += len(rows)
+    stats['deaths'] += float(deaths.sum())
+
+    if kind == 'plague' and generation < config['max_generations']:
+        # Travels on to one of the struck burgs, weaker every time
+        rng = state['rng']
+        target = rows[rng.integers(len(rows))]
+        tx, ty = state['burg_index']['points'][target]
+        schedule(state, tick + config['spread_delay'], kind, generation + 1,
+                 float(tx) + float(rng.normal(0, config['radius'] / 2)), float(ty) + float(rng.normal(0, config['radius'] / 2)),
+                 severity * config['spread'])
+
+def run_disasters(state, tick, population):
+    """
+    Lets food yields recover, then strikes every event due by this tick (in tick, then scheduling order).
+    population is updated in place. Returns the number of events that struck.
+    """
+    food_yield = state['food_yield']
+    food_yield += (1 - food_yield) * YIELD_RECOVERY
+    queue = state['queue']
+    count = 0
+    while queue and queue[0][0] <= tick:
+        strike(state, heapq.heappop(queue), population)
+        count += 1
+    return count
+
+def get_checkpoint_arrays(state):
+    """The evolving disaster state as arrays (the event queue as one float row per event), for checkpoints."""
+    return {
+        'disaster_queue': np.array(state['queue'], dtype=np.float64).reshape(-1, 7),
+        'disaster_seq': state['seq'],
+        'disaster_rng': json.dumps(state['rng'].bit_generator.state),
+        'food_yield': state['food_yield'],
+        'disaster_stats': json.dumps(state['stats']),
+    }
+
+def set_checkpoint_arrays(state, checkpoint):
+    """Restores what get_checkpoint_arrays saved."""
+    queue = [(int(t), int(s), int(k), int(g), x, y, sev) for t, s, k, g, x, y, sev in checkpoint['disaster_queue'].tolist()]
+    heapq.heapify(queue)
+    state['queue'] = queue
+    state['seq'] = int(checkpoint['disaster_seq'])
+    state['rng'].bit_generator.state = json.loads(checkpoint['disaster_rng'].item())
+    state['food_yield'][:] = checkpoint['food_yield']
+    state['stats'] = json.loads(checkpoint['disaster_stats'].item())
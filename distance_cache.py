@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Configuration
+CACHE_DIR_NAME = "cache" # Sub-folder of each world's output folder
+CACHE_MAX_BYTES = 512 * 1024 * 1024 # Oldest entries are evicted once the cache grows past this size
+CACHE_VERSION = 1 # Bump when the meaning of cached arrays changes
+
+def get_cache_key(*parts):
+    """Content hash of any JSON-serializable inputs (geometry, terrain settings, ...)."""
+    payload = json.dumps([CACHE_VERSION, parts], sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def get_burg_geometry(burgs):
+    """The burg fields that distances depend on, in a hashable form."""
+    return [[b['id'], b['x'], b['y'], b.get('cell'), b.get('h', 0), bool(b.get('haven')), bool(b.get('road')), b.get('state')]
+            for b in burgs]
+
+def get_cell_geometry(cells):
+    """The cell fields that the cell graph depends on, in a hashable form."""
+    return [[c.get('i'), c.get('c', []), c.get('p'), c.get('h', 0), c.get('r', 0)] for c in cells]
+
+def get_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.npy")
+
+def load_array(cache_dir, key):
+    """Memory-maps a cached array (read only), or returns None on a miss."""
+    path = get_cache_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        array = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        print(f"Warning: dropping unreadable cache entry {path}")
+        os.remove(path)
+        return None
+    os.utime(path) # Mark as recently used for eviction
+    return array
+
+def save_array(cache_dir, key, array, max_bytes=None):
+    """Writes an array atomically, then evicts old entries to stay within max_bytes."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = get_cache_path(cache_dir, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+    evict_cache(cache_dir, max_bytes, keep=path)
+
+def evict_cache(cache_dir, max_bytes=None, keep=None):
+    """Deletes least recently used entries until the cache folder fits in max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.npy'): continue
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, path, stat.st_size))
+    total = sum(size for _, _, size in entries)
+
+    for _, path, size in sorted(entries):
+        if total <= max_bytes: break
+        if path == keep: continue
+        os.remove(path)
+        total -= size
+        print(f"Evicted cache entry {os.path.basename(path)}")
+
+def cached_array(cache_dir, key, compute, max_bytes=None):
+    """
+    Returns the cached array for key, or computes, stores and returns it.
+    With no cache_dir this is just compute().
+    """
+    if cache_dir is None:
+        return compute()
+    array = load_array(cache_dir, key)
+    if array is not None:
+        print(f"Cache hit: {key}")
+        return array
+    array = compute()
+    save_array(cache_dir, key, array, max_bytes)
+    return array
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import climate
+import disasters
+import distance_cache
+import migration
+import resources
+import simulate_economy
+
+# Configuration
+USE_ECONOMY_TICKS = False # Run the economy forward in time before trade (production, consumption, stocks, population)
+ECONOMY_TICKS = 1000 # Ticks to simulate (one tick is one month)
+CHECKPOINT_EVERY = 100 # Ticks between checkpoint writes (0 = only at the end)
+TICK_SEED = 0 # Seed of the production fluctuations
+FOOD_COMMODITY = "Net_Food" # Commodity whose shortage starves the population
+FLUCTUATION_VOLATILITY = 0.1 # Monthly log-noise of production per burg and commodity
+FLUCTUATION_PERSISTENCE = 0.9 # How much of last month's production fluctuation carries over (AR(1) in log space)
+MAX_STOCK_TICKS = 12 # Burgs store at most this many months of their own production or consumption (the larger)
+GROWTH_RATE = 0.001 # Monthly population growth of fed burgs
+STARVATION_RATE = 0.05 # Monthly population loss of a burg getting no food at all
+
+PLUGIN_MODULES = {'migration': migration, 'disasters': disasters, 'resources': resources, 'climate': climate}
+
+def get_plugin_fingerprint(name, plugin):
+    """
+    The settings a fresh plug-in state was built with: its module's configuration constants (USE_ flags aside),
+    a digest of each of its arrays (graph, capacities, climate normals, ...) and the state of its random generator.
+    """
+    module = PLUGIN_MODULES[name]
+    settings = {key: getattr(module, key) for key in dir(module) if key.isupper() and not key.startswith('USE_')}
+    arrays = {}
+    for key, value in plugin.items():
+        if isinstance(value, np.ndarray):
+            arrays[key] = [str(value.dtype), value.shape, hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()]
+        elif isinstance(value, np.random.Generator):
+            arrays[key] = value.bit_generator.state
+        elif isinstance(value, (bool, int, float, str)):
+            arrays[key] = value
+    return [name, settings, arrays]
+
+def get_checkpoint_key(table, config, seed=None, **plugins):
+    """
+    Hash of everything a checkpoint's state depends on besides the tick: the starting burgs, the config,
+    the tick parameters and the settings of every active plug-in state (taken before its first tick).
+    A checkpoint of another key is not resumed.
+    """
+    parameters = [TICK_SEED if seed is None else seed, FOOD_COMMODITY, FLUCTUATION_VOLATILITY, FLUCTUATION_PERSISTENCE,
+                  MAX_STOCK_TICKS, GROWTH_RATE, STARVATION_RATE]
+    return distance_cache.get_cache_key('economy_ticks', table['id'].tolist(), table['population'].tolist(), config, parameters,
+                                        [get_plugin_fingerprint(name, plugin) for name, plugin in sorted(plugins.items()) if plugin is not None])
+
+def init_tick_state(table, config, seed=None, migration_graph=None, disaster_state=None, resource_state=None, climate_state=None):
+    """
+    Preallocates every array the tick engine works on, starting from the burg table's static economy.
+    Each burg keeps its citizen mix (citizen shares of its population) while its population changes.
+    With a migration_graph (see migration.build_migration_graph), population also moves between neighbours every tick,
+    with a disaster_state (see disasters.build_disaster_state) floods, plagues and droughts strike,
+    with a resource_state (see resources.build_resource_state) production is limited by the burgs' hinterland resources,
+    and with a climate_state (see climate.build_climate_state) seasons and weather change food production.
+    """
+    n, k = table['n'], len(table['commodities'])
+    compiled = simulate_economy.compile_citizen_config(config)
+    population = table['population'].astype(np.float64)
+    shares = simulate_economy.get_citizen_shares(population, table['citizens'])
+
+    state = {
+        'tick': 0,
+        'key': get_checkpoint_key(table, config, seed, migration=migration_graph, disasters=disaster_state,
+                                  resources=resource_state, climate=climate_state),
+        'ids': table['id'].copy(),
+        'commodities': list(table['commodities']),
+        'rng': np.random.default_rng(TICK_SEED if seed is None else seed),
+        'inhabitants_per_quartier': compiled['inhabitants_per_quartier'],
+        'area_factors': list(compiled['area_requirements'].values()),
+        'production_matrix': simulate_economy.get_commodity_matrix(config, table['commodities'], ('Production_',)),
+        'consumption_matrix': -simulate_economy.get_commodity_matrix(config, table['commodities'], ('Consumption_',)),
+        'food': table['commodities'].index(FOOD_COMMODITY) if FOOD_COMMODITY in table['commodities'] else None,
+        # Burg state
+        'population': population,
+        'shares': shares,
+        'citizens': table['citizens'].astype(np.float64),
+        'quartiers': table['quartiers'].astype(np.float64),
+        'stocks': np.zeros((n, k)),
+        'log_factor': np.zeros((n, k)),
+        # Per-tick work arrays, overwritten every tick
+        'factor': np.zeros((n, k)),
+        'production': np.zeros((n, k)),
+        'consumption': np.zeros((n, k)),
+        'net_production': np.zeros((n, k)),
+        'shortage': np.zeros((n, k)),
+        'capacity': np.zeros((n, k)),
+        'starved': np.zeros(n),
+        'growth': np.zeros(n),
+        'migration_graph': migration_graph,
+        'disasters': disaster_state,
+        'resources': resource_state,
+        'climate': climate_state,
+        'worked_quartiers': np.zeros((n, len(compiled['citizens']))),
+        'prosperity': np.zeros(n),
+    }
+    return state
+
+def update_citizens(state):
+    """Citizens (rounded, like the static economy) and quartiers of the current population."""
+    np.multiply(state['population'][:, None], state['shares'], out=state['citizens'])
+    np.round(state['citizens'], out=state['citizens'])
+    if state['inhabitants_per_quartier']:
+        # Same as the static economy's truncating int cast (citizens are never negative), without floor_divide's slow float path
+        np.divide(state['citizens'], state['inhabitants_per_quartier'], out=state['quartiers'])
+        np.floor(state['quartiers'], out=state['quartiers'])
+    else:
+        state['quartiers'].fill(0)
+
+def advance_tick(state):
+    """
+    One month: disasters due this tick strike, fluctuating (resource limited, seasonal) production and consumption of every quartier go into the burg's stocks
+    (capped at MAX_STOCK_TICKS months of turnover), unmet food consumption starves the population,
+    migrants move to more prosperous neighbours and citizens and quartiers follow the new population. Works in place on the preallocated arrays.
+    """
+    rng = state['rng']
+    log_factor, factor = state['log_factor'], state['factor']
+    production, consumption, net = state['production'], state['consumption'], state['net_production']
+    stocks, shortage, capacity = state['stocks'], state['shortage'], state['capacity']
+    starved, growth = state['starved'], state['growth']
+
+    # Production fluctuations: AR(1) random walk in log space per burg and commodity
+    rng.standard_normal(out=factor)
+    factor *= FLUCTUATION_VOLATILITY
+    log_factor *= FLUCTUATION_PERSISTENCE
+    log_factor += factor
+    np.exp(log_factor, out=factor)
+
+    if state['disasters'] is not None:
+        disasters.run_disasters(state['disasters'], state['tick'] + 1, state['population'])
+
+    if state['resources'] is not None:
+        # Quartiers produce only as much as their hinterland's resources allow
+        citizen_yields = resources.draw_resources(state['resources'], state['quartiers'])
+        np.multiply(state['quartiers'], citizen_yields, out=state['worked_quartiers'])
+        np.matmul(state['worked_quartiers'], state['production_matrix'], out=production)
+        resources.regenerate_resources(state['resources'])
+    else:
+        np.matmul(state['quartiers'], state['production_matrix'], out=production)
+    production *= factor
+    if state['disasters'] is not None and state['food'] is not None:
+        production[:, state['food']] *= state['disasters']['food_yield']
+    if state['climate'] is not None and state['food'] is not None:
+        production[:, state['food']] *= climate.advance_climate(state['climate'], state['tick'] + 1)
+    np.matmul(state['quartiers'], state['consumption_matrix'], out=consumption)
+    np.subtract(production, consumption, out=net)
+
+    # Stocks absorb the balance; what they cannot cover is a shortage
+    stocks += net
+    np.negative(stocks, out=shortage)
+    np.maximum(shortage, 0, out=shortage)
+    np.maximum(stocks, 0, out=stocks)
+    np.maximum(production, consumption, out=capacity)
+    capacity *= MAX_STOCK_TICKS
+    np.minimum(stocks, capacity, out=stocks)
+
+    # Population grows when fed and shrinks with the share of food consumption left unmet
+    growth.fill(1 + GROWTH_RATE)
+    if state['food'] is not None:
+        food = state['food']
+        starved.fill(0)
+        np.divide(shortage[:, food], consumption[:, food], out=starved, where=consumption[:, food] > 0)
+        starved *= STARVATION_RATE
+        growth -= starved
+    state['population'] *= growth
+
+    if state['migration_graph'] is not None:
+        migration.get_prosperity(state['population'], net, out=state['prosperity'])
+        migration.apply_migration(state['migration_graph'], migration.get_migration_weights(state['migration_graph'], state['prosperity']), state['population'])
+
+    update_citizens(state)
+    state['tick'] += 1
+
+def run_ticks(state, ticks, checkpoint_path=None, checkpoint_every=None):
+    """
+    Advances the state by a number of ticks, writing a checkpoint every checkpoint_every ticks and at the end.
+    Returns the history of world totals: population per tick and stocks / net production per tick and commodity.
+    """
+    checkpoint_every = CHECKPOINT_EVERY if checkpoint_every is None else checkpoint_every
+    k = len(state['commodities'])
+    history = {
+        'tick': np.zeros(ticks, dtype=np.int64),
+        'population': np.zeros(ticks),
+        'stocks': np.zeros((ticks, k)),
+        'net_production': np.zeros((ticks, k)),
+    }
+    for t in range(ticks):
+        advance_tick(state)
+        history['tick'][t] = state['tick']
+        history['population'][t] = state['population'].sum()
+        state['stocks'].sum(axis=0, out=history['stocks'][t])
+        state['net_production'].sum(axis=0, out=history['net_production'][t])
+        if checkpoint_path and checkpoint_every and state['tick'] % checkpoint_every == 0:
+            save_checkpoint(state, checkpoint_path)
+
+    if checkpoint_path and ticks:
+        save_checkpoint(state, checkpoint_path)
+    return history
+
+def save_checkpoint(state, path):
+    """
+    Writes the evolving state (tick, population, stocks, last net production, fluctuations, random generator)
+    to a compressed .npz, with the key of the inputs. Everything else is rebuilt from the burg table and config on resume.
+    """
+    extra = disasters.get_checkpoint_arrays(state['disasters']) if state['disasters'] is not None else {}
+    if state['resources'] is not None:
+        extra.update(resources.get_checkpoint_arrays(state['resources']))
+    if state['climate'] is not None:
+        extra.update(climate.get_checkpoint_arrays(state['climate']))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, key=state['key'], tick=state['tick'], ids=state['ids'], population=state['population'],
+                            stocks=state['stocks'], net_production=state['net_production'], log_factor=state['log_factor'],
+                            rng=json.dumps(state['rng'].bit_generator.state), **extra)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(state, path):
+    """
+    Restores a checkpoint into a freshly initialized state. Returns False (state untouched)
+    if the checkpoint belongs to other burgs, commodities, config or tick parameters.
+    """
+    with np.load(path) as checkpoint:
+        if 'key' not in checkpoint or checkpoint['key'].item() != state['key']:
+            return False
+        if not np.array_equal(checkpoint['ids'], state['ids']) or checkpoint['stocks'].shape != state['stocks'].shape:
+            return False
+        state['tick'] = int(checkpoint['tick'])
+        state['population'][:] = checkpoint['population']
+        state['stocks'][:] = checkpoint['stocks']
+        state['net_production'][:] = checkpoint['net_production']
+        state['log_factor'][:] = checkpoint['log_factor']
+        state['rng'].bit_generator.state = json.loads(checkpoint['rng'].item())
+        if state['disasters'] is not None and 'disaster_queue' in checkpoint:
+            disasters.set_checkpoint_arrays(state['disasters'], checkpoint)
+        if state['resources'] is not None and 'resource_stock' in checkpoint:
+            resources.set_checkpoint_arrays(state['resources'], checkpoint)
+        if state['climate'] is not None and 'climate_rng' in checkpoint:
+            climate.set_checkpoint_arrays(state['climate'], checkpoint)
+    update_citizens(state)
+    return True
+
+def apply_tick_state(table, state):
+    """
+    Writes the population, citizens, quartiers and last net production of the state back into the burg table,
+    and scales the area requirements to the new population.
+    """
+    table['population'] = np.round(state['population']).astype(np.int64)
+    for j, (factor, divisor) in enumerate(state['area_factors']):
+        area = table['population'] * factor
+        table['area_requirements'][:, j] = np.round(area / divisor if divisor != 1 else area)
+    table['citizens'] = state['citizens'].astype(np.int64)
+    table['quartiers'] = state['quartiers'].astype(np.int64)
+    table['net_production'] = state['net_production'].copy()
+
+def run_economy_ticks(table, config, ticks=None, checkpoint_path=None, migration_graph=None, disaster_state=None, resource_state=None, climate_state=None):
+    """
+    Runs the economy of a burg table forward to tick `ticks`, resuming from checkpoint_path if it holds
+    an earlier tick of the same burgs, config and tick parameters, and writes the end state back into the table
+    (left untouched if the state never ran a tick).
+    Returns stats for the report (ticks run, start tick, end totals) and the history of this run.
+    """
+    ticks = ECONOMY_TICKS if ticks is None else ticks
+    start = time.perf_counter()
+    state = init_tick_state(table, config, migration_graph=migration_graph, disaster_state=disaster_state, resource_state=resource_state, climate_state=climate_state)
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        if load_checkpoint(state, checkpoint_path):
+            print(f"Resuming economy from tick {state['tick']}")
+        else:
+            print(f"Warning: ignoring checkpoint {checkpoint_path} of another world or config")
+
+    start_tick = state['tick']
+    remaining = max(ticks - start_tick, 0)
+    print(f"--- Simulating Economy Ticks ({table['n']} burgs, {start_tick} -> {start_tick + remaining}) ---")
+    history = run_ticks(state, remaining, checkpoint_path)
+    if state['tick']:
+        apply_tick_state(table, state)
+
+    stats = {
+        'start_tick': start_tick,
+        'end_tick': state['tick'],
+        'population': float(state['population'].sum()),
+        'stocks': dict(zip(state['commodities'], state['stocks'].sum(axis=0).tolist())),
+        'run_time_s': round(time.perf_counter() - start, 4),
+    }
+    if state['disasters'] is not None:
+        stats['disasters'] = state['disasters']['stats']
+        counts = ', '.join(f"{kind} {kind_stats['events']}" for kind, kind_stats in stats['disasters'].items())
+        print(f"Disasters: {counts}")
+    if state['resources'] is not None:
+        stats['resources'] = resources.get_resource_stats(state['resources'])
+        print(f"Resources left: {stats['resources']}")
+    print(f"Economy at tick {stats['end_tick']}: population {stats['population']:,.0f} ({stats['run_time_s']:.2f}s)")
+    return stats, history
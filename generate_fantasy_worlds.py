@@ -7,8 +7,23 @@ import shutil
 
 # Import modules
 import simulate_economy
+import burg_table
+import economy_ticks
+import migration
+import disasters
+import war
+import resources
+import climate
+import agents
+import catchments
+import diffusion
 import generate_interactive_map
 import simulate_trade
+import cell_graph
+import distance_cache
+import sea_lanes
+import trade_routes
+import market_prices
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -109,7 +124,32 @@ def generate_section_html(section_id, title, table_headers, rows_html, chart_id)
             <div class="chart-container"><canvas id="{chart_id}"></canvas></div>
         </div>"""
 
-def generate_world_report(data, analysis, output_file):
+def generate_trade_stats_html(trade_stats):
+    if not trade_stats:
+        return ""
+    rows = ""
+    for commodity, stats in trade_stats.items():
+        rows += f"""<tr><td>{commodity.replace('Net_', '')}</td><td>{stats['solver']}</td><td>{stats['trades']}</td>
+                    <td>{stats['traded']:,.1f} / {stats['demand']:,.1f}</td><td>{stats['objective']:,.2f}</td><td>{stats['solve_time_s']:.3f}s</td></tr>"""
+    return f"""<div class="card"><h2>Trade</h2><table>
+        <thead><tr><th>Commodity</th><th>Solver</th><th>Trades</th><th>Traded / Demand</th><th>Objective (Amount x Distance)</th><th>Solve Time</th></tr></thead>
+        <tbody>{rows}</tbody>
+    </table></div>"""
+
+def generate_market_stats_html(market_stats):
+    if not market_stats:
+        return ""
+    rows = ""
+    for commodity, stats in market_stats['commodities'].items():
+        rows += f"""<tr><td>{commodity.replace('Net_', '')}</td><td>{stats['price']:.3f}</td><td>{stats['supply']:,.1f}</td><td>{stats['demand']:,.1f}</td></tr>"""
+    status = 'cleared' if market_stats['converged'] else 'not cleared'
+    return f"""<div class="card"><h2>Market Prices</h2>
+    <p>Markets {status} after {market_stats['iterations']} iterations (max excess {market_stats['max_excess']:.1e}, {market_stats['solve_time_s']:.3f}s)</p><table>
+        <thead><tr><th>Commodity</th><th>Price</th><th>Supply</th><th>Demand</th></tr></thead>
+        <tbody>{rows}</tbody>
+    </table></div>"""
+
+def generate_world_report(data, analysis, output_file, trade_stats=None, market_stats=None):
     info = data.get('info', {})
     settings = data.get('settings', {})
     pack = data.get('pack', {})
@@ -299,6 +339,8 @@ def generate_world_report(data, analysis, output_file):
         <div class="stat-box"><div class="stat-value">{analysis['total_area']:,.0f}</div><div>Total Area</div></div>
         <div class="stat-box"><div class="stat-value">{int(analysis['total_pop']):,}</div><div>Total Pop</div></div>
     </div></div>
+    {generate_trade_stats_html(trade_stats)}
+    {generate_market_stats_html(market_stats)}
     {''.join(sections)}
     <script>
         function toggleView(id) {{ document.getElementById(id).classList.toggle('show-table'); }}
@@ -468,39 +510,48 @@ if __name__ == "__main__":
                 if not os.path.exists(map_dir):
                     os.makedirs(map_dir)
                 
-                # 1. Run Economy Simulation
-                processed_burgs = simulate_economy.process_map_data(data, sim_config)
+                # 1. Run Economy Simulation (columnar burg table; burg dicts are only built for output)
+                burgs = simulate_economy.process_map_table(data, sim_config)
 
                 # Add state_name and rename state to state_id
                 states = data.get('pack', {}).get('states', [])
-                for burg in processed_burgs:
-                    state_id = burg.get('state')
-                    if state_id is not None:
-                        # Get state name, default to "Neutral" or "Unknown" if not found
-                        # States list index matches state ID usually, but safe lookup is better if IDs are properties
-                        # Based on typical Azgaar format, states is a list where index = state_id
-                        state_name = "Neutral"
-                        if isinstance(states, list) and 0 <= state_id < len(states):
-                            state_name = states[state_id].get('name', 'Neutral')
-                        
-                        burg['state_name'] = state_name
-                        burg['state_id'] = state_id
-                        del burg['state']
-                        
-                        # Reorder keys for cleaner JSON (optional but nice)
-                        # Create a new dict with desired order
-                        new_order = {'id': burg['id'], 'name': burg['name'], 'x': burg['x'], 'y': burg['y'], 
-                                     'type': burg['type'], 'state_id': state_id, 'state_name': state_name}
-                        # Add remaining keys
-                        for k, v in burg.items():
-                            if k not in new_order:
-                                new_order[k] = v
-                        
-                        # Update burg object in place (clear and update)
-                        burg.clear()
-                        burg.update(new_order)
+                burg_table.set_state_names(burgs, states)
+
+                # Wars between enemy states: burgs change owner, soldiers and sacked populations die
+                if war.USE_WAR:
+                    war.run_war(burgs, states, sim_config)
                 
-                # Save Burgs JSON
+                # Economy over time: production, stocks and population evolve tick by tick (resumes from the last checkpoint)
+                # Migration moves population to more prosperous neighbours (every tick, or as a stage of its own)
+                migration_graph = None
+                if migration.USE_MIGRATION:
+                    migration_graph = migration.build_migration_graph(burgs, data.get('pack', {}).get('cells', []), sim_config['economy'].get('Transport_Costs', {}))
+                if economy_ticks.USE_ECONOMY_TICKS:
+                    cells = data.get('pack', {}).get('cells', [])
+                    disaster_state = disasters.build_disaster_state(burgs, cells) if disasters.USE_DISASTERS and cells else None
+                    resource_state = resources.build_resource_state(burgs, cells, sim_config, sim_config['economy'].get('Transport_Costs', {})) if resources.USE_RESOURCES and cells else None
+                    climate_state = climate.build_climate_state(burgs, cells) if climate.USE_CLIMATE and cells else None
+                    economy_ticks.run_economy_ticks(burgs, sim_config, checkpoint_path=os.path.join(map_dir, f"{safe_name}_economy_checkpoint.npz"),
+                                                    migration_graph=migration_graph, disaster_state=disaster_state, resource_state=resource_state,
+                                                    climate_state=climate_state)
+                elif migration_graph is not None:
+                    migration.run_migration(burgs, sim_config, migration_graph)
+
+                # Price discovery: burgs sell and buy what clears the markets
+                market_stats = market_prices.apply_market_prices_to_table(burgs) if market_prices.USE_MARKET_PRICES else None
+
+                # Moving characters: merchants, rulers and adventurers travel the cell graph
+                cells = data.get('pack', {}).get('cells', [])
+                if agents.USE_AGENTS and cells:
+                    world_agents, _ = agents.run_agents(burgs, cells, transport_costs=sim_config['economy'].get('Transport_Costs', {}))
+                    save_json(world_agents, os.path.join(map_dir, f"{safe_name}_agents.json"))
+
+                # Farmland check: every land cell goes to its nearest burg, whose farmland must fit into that land
+                if catchments.USE_CATCHMENTS and cells:
+                    catchments.apply_catchments(burgs, cells, sim_config['economy'].get('Transport_Costs', {}), catchments.get_hectares_per_area_unit(data))
+
+                # Save Burgs JSON (the map and report embed these same dicts, so they are built once, here)
+                processed_burgs = burg_table.materialize_burgs(burgs)
                 burgs_file = os.path.join(map_dir, f"{safe_name}_burgs.json")
                 save_json(processed_burgs, burgs_file)
                 
@@ -516,11 +567,45 @@ if __name__ == "__main__":
                 cultures_file = os.path.join(map_dir, f"{safe_name}_cultures.json")
                 save_json(cultures, cultures_file)
 
-                trades = simulate_trade.simulate_trade(processed_burgs)
+                # Culture and religion influence spreading from burgs and centers over the cells
+                if diffusion.USE_DIFFUSION and cells:
+                    for key, groups_key in (('culture', 'cultures'), ('religion', 'religions')):
+                        groups = data.get('pack', {}).get(groups_key, [])
+                        if groups:
+                            result = diffusion.run_culture_diffusion(cells, groups, data.get('pack', {}).get('burgs', []), key=key)
+                            save_json(result, os.path.join(map_dir, f"{safe_name}_{key}_diffusion.json"))
+
+                # Distances and transport costs are reused across runs on an unchanged map
+                cache_dir = os.path.join(map_dir, distance_cache.CACHE_DIR_NAME)
+
+                trade_burgs = burg_table.get_trade_burgs(burgs)
+                simulate_trade.SEA_LANES = None
+                if simulate_trade.USE_SEA_LANES:
+                    simulate_trade.SEA_LANES = sea_lanes.build_sea_lanes(data.get('pack', {}).get('cells', []), trade_burgs, cache_dir=cache_dir)
+
+                transport_costs = None
+                if simulate_trade.USE_TRANSPORT_COSTS:
+                    transport_costs = simulate_trade.build_trade_transport_costs(trade_burgs, data.get('pack', {}).get('cells', []), sim_config['economy'].get('Transport_Costs', {}), cache_dir=cache_dir)
+
+                cells = data.get('pack', {}).get('cells', [])
+                trade_stats = {}
+                route_graph = None
+                if trade_routes.USE_CONGESTION and cells:
+                    trades, route_graph, arc_flow = trade_routes.simulate_congested_trade(trade_burgs, cells, sim_config['economy'].get('Transport_Costs', {}), stats=trade_stats)
+                else:
+                    trades = simulate_trade.simulate_trade(trade_burgs, transport_costs=transport_costs, stats=trade_stats, cache_dir=cache_dir)
+                    if trade_routes.ASSIGN_TRADE_ROUTES and cells:
+                        route_graph = trade_routes.prepare_route_graph(cell_graph.build_cell_graph(cells, sim_config['economy'].get('Transport_Costs', {})))
+                        arc_flow = trade_routes.assign_trade_routes(route_graph, trade_burgs, trades)
                 
                 # Save Trade Routes JSON
                 trades_file = os.path.join(map_dir, f"{safe_name}_trade_routes.json")
                 save_json(trades, trades_file)
+
+                # Save the cell corridors carrying the trade volume
+                if route_graph is not None:
+                    corridors_file = os.path.join(map_dir, f"{safe_name}_trade_corridors.json")
+                    save_json(trade_routes.get_corridors(route_graph, arc_flow), corridors_file)
                 
                 # 3. Generate Interactive Map
                 map_file = os.path.join(map_dir, f"{safe_name}_map.html")
@@ -528,7 +613,7 @@ if __name__ == "__main__":
                 
                 # 4. Generate Static Report
                 report_filename = os.path.join(map_dir, f"{safe_name}_report.html")
-                generate_world_report(data, analyze_world_data(data), report_filename)
+                generate_world_report(data, analyze_world_data(data), report_filename, trade_stats=trade_stats, market_stats=market_stats)
                 
                 generated_reports.append((map_name, report_filename, map_file))
                 
@@ -0,0 +1,121 @@
+import time
+
+import numpy as np
+
+import simulate_trade
+
+# Configuration
+USE_MARKET_PRICES = False # Clear markets before trade: prices decide which burgs sell and buy
+RESERVATION_SENSITIVITY = 0.5 # How far a burg's reservation price moves from 1 per (average) unit of its net production per inhabitant
+RESERVATION_SPREAD = 0.5 # Width (in log price) over which a burg goes from not trading to trading all its surplus or deficit
+PRICE_DAMPING = 0.5 # Step size of the log-price update
+PRICE_TOLERANCE = 1e-4 # Markets are cleared once |demand - supply| / (demand + supply) is below this
+MAX_PRICE_ITERATIONS = 500
+MIN_PRICE = 0.01 # Prices are relative to 1 (the reservation price of a burg with balanced production)
+MAX_PRICE = 100.0
+
+# Every burg has its own reservation price per commodity: burgs with a large surplus per inhabitant sell cheap,
+# burgs with a large shortfall per inhabitant pay most. Around that price a burg's offer (or request) goes smoothly
+# from nothing to its whole surplus (or deficit), so the cleared price decides who trades, not just how much.
+
+def get_net_production_matrix(burgs, commodities):
+    """Burgs x commodities matrix of net production (positive = surplus)."""
+    return np.array([[b.get('net_production_burg', {}).get(c, 0) for c in commodities] for b in burgs], dtype=np.float64).reshape(-1, len(commodities))
+
+def get_reservation_prices(net_production, population=None):
+    """
+    Burgs x commodities log reservation prices: minus RESERVATION_SENSITIVITY times the burg's net production
+    per inhabitant, relative to the world's absolute net production per inhabitant of that commodity.
+    """
+    population = np.ones(len(net_production)) if population is None else np.asarray(population, dtype=np.float64)
+    intensity = np.divide(net_production, population[:, None], out=np.zeros_like(net_production), where=population[:, None] > 0)
+    scale = np.abs(net_production).sum(axis=0) / max(population.sum(), 1e-12)
+    relative = np.divide(intensity, scale, out=np.zeros_like(intensity), where=scale > 0)
+    return -RESERVATION_SENSITIVITY * relative
+
+def get_supply_and_demand(net_production, log_prices, log_reservation):
+    """Burgs x commodities supply and demand at the given log prices (one per commodity)."""
+    selling = 1 / (1 + np.exp((log_reservation - log_prices) / RESERVATION_SPREAD))
+    supply = np.maximum(net_production, 0) * selling
+    demand = np.maximum(-net_production, 0) * (1 - selling)
+    return supply, demand
+
+def solve_market_prices(net_production, log_reservation):
+    """
+    Damped tatonnement over all commodities at once: each price moves in log space in proportion
+    to its relative excess demand, and its step is halved every time the excess changes sign.
+    Excess demand falls with the price (more burgs sell, fewer buy), so every market has one clearing price.
+    Commodities that cannot clear within [MIN_PRICE, MAX_PRICE] (e.g. nobody produces them) stop at the bound.
+    Returns (log prices, stats).
+    """
+    start = time.perf_counter()
+    n_commodities = net_production.shape[1]
+    log_prices = np.zeros(n_commodities)
+    step = np.full(n_commodities, PRICE_DAMPING)
+    previous_sign = np.zeros(n_commodities)
+    bounds = np.log(MIN_PRICE), np.log(MAX_PRICE)
+
+    for iteration in range(1, MAX_PRICE_ITERATIONS + 1):
+        supply, demand = get_supply_and_demand(net_production, log_prices, log_reservation)
+        total_supply, total_demand = supply.sum(axis=0), demand.sum(axis=0)
+        excess = (total_demand - total_supply) / np.maximum(total_demand + total_supply, 1e-12)
+
+        # A price stuck at a bound while still pushed outwards cannot clear its market
+        at_bound = ((log_prices <= bounds[0]) & (excess < 0)) | ((log_prices >= bounds[1]) & (excess > 0))
+        open_excess = np.where(at_bound, 0, excess)
+        if np.all(np.abs(open_excess) < PRICE_TOLERANCE):
+            break
+
+        sign = np.sign(excess)
+        step = np.where(sign * previous_sign < 0, step / 2, step)
+        previous_sign = sign
+        log_prices = np.clip(log_prices + step * excess, *bounds)
+
+    stats = {
+        'iterations': iteration,
+        'converged': bool(np.all(np.abs(open_excess) < PRICE_TOLERANCE)),
+        'max_excess': float(np.abs(open_excess).max(initial=0)),
+        'unclearable': int(at_bound.sum()),
+        'solve_time_s': round(time.perf_counter() - start, 4),
+    }
+    return log_prices, stats
+
+def clear_markets(net_production, commodities, population=None):
+    """
+    Clears all markets of a burgs x commodities net production matrix (population: inhabitants of every burg,
+    for the reservation prices; equal if None). Returns the cleared net production (what burgs actually sell
+    and buy at the equilibrium prices) and the convergence stats plus the price, supply and demand of every commodity.
+    """
+    print(f"--- Clearing Markets ({len(net_production)} burgs, {len(commodities)} commodities) ---")
+    log_reservation = get_reservation_prices(net_production, population)
+    log_prices, stats = solve_market_prices(net_production, log_reservation)
+    supply, demand = get_supply_and_demand(net_production, log_prices, log_reservation)
+    prices = np.exp(log_prices)
+
+    stats['commodities'] = {c: {'price': round(float(p), 4), 'supply': float(s), 'demand': float(d)}
+                            for c, p, s, d in zip(commodities, prices, supply.sum(axis=0), demand.sum(axis=0))}
+    print(f"Markets {'cleared' if stats['converged'] else 'NOT cleared'} after {stats['iterations']} iterations "
+          f"(max excess {stats['max_excess']:.2e}, {stats['solve_time_s']:.3f}s)")
+    return supply - demand, stats
+
+def apply_market_prices(burgs, commodities=None):
+    """
+    Clears all markets and writes the resulting quantities back into each burg's net_production_burg,
+    so trade matches what burgs actually sell and buy at the equilibrium prices.
+    Returns the stats of clear_markets.
+    """
+    commodities = commodities or simulate_trade.get_burg_commodities(burgs)
+    population = [b.get('population', 0) for b in burgs]
+    cleared, stats = clear_markets(get_net_production_matrix(burgs, commodities), commodities, population)
+
+    for burg, row in zip(burgs, cleared.tolist()):
+        net = burg.setdefault('net_production_burg', {})
+        for commodity, amount in zip(commodities, row):
+            if commodity in net:
+                net[commodity] = amount
+    return stats
+
+def apply_market_prices_to_table(table):
+    """apply_market_prices on a burg table (see burg_table): the net production column is replaced in place."""
+    table['net_production'], stats = clear_markets(table['net_production'], table['commodities'], table['population'])
+    return stats
@@ -0,0 +1,112 @@
+import numpy as np
+
+import cell_graph
+import simulate_economy
+import spatial_index
+
+# Configuration
+USE_MIGRATION = False # Move population between neighbouring burgs towards the more prosperous ones
+MIGRATION_GRAPH = "cells" # "cells" (burgs whose cell regions touch) or "nearest" (MIGRATION_NEIGHBOURS closest burgs); "cells" needs the map cells
+MIGRATION_NEIGHBOURS = 6
+MIGRATION_TICKS = 120 # Ticks of the standalone migration stage (one tick is one month)
+MIGRATION_RATE = 0.01 # Largest share of a burg's population leaving per tick
+PROSPERITY_SCALE = 1.0 # Prosperity gap (net production per 1000 inhabitants) at which migration is about 3/4 of its rate
+
+def get_graph_from_pairs(n, a, b):
+    """Symmetric neighbour graph of n burgs (by table row) as directed edge arrays, without duplicates or self loops."""
+    a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+    keep = a != b
+    keys = np.unique(np.concatenate([a[keep] * n + b[keep], b[keep] * n + a[keep]]))
+    return {'n': n, 'rows': keys // n, 'cols': keys % n}
+
+def build_nearest_graph(table, k=None):
+    """Every burg joined to its k nearest burgs (and they to it)."""
+    k = MIGRATION_NEIGHBOURS if k is None else k
+    points = list(zip(table['x'].tolist(), table['y'].tolist()))
+    index = spatial_index.build_grid_index(points)
+    a, b = [], []
+    for i, (x, y) in enumerate(points):
+        for j in spatial_index.query_nearest(index, x, y, k, exclude=i):
+            a.append(i)
+            b.append(j)
+    return get_graph_from_pairs(table['n'], a, b)
+
+def build_cell_region_graph(table, cells, transport_costs=None):
+    """
+    Burgs whose regions on the cell graph touch: one multi-source search from every burg cell assigns each
+    cell to its cheapest burg, and any cell edge between two regions joins their burgs.
+    Burgs without a cell fall back to nobody (they neither send nor receive migrants).
+    """
+    graph = cell_graph.build_cell_graph(cells, transport_costs or {})
+    _, origin, _ = cell_graph.dijkstra(graph, table['cell'])
+    sources = np.repeat(np.arange(graph['n'], dtype=np.int64), np.diff(graph['indptr']))
+    a, b = origin[sources], origin[graph['indices']]
+    border = (a >= 0) & (b >= 0) & (a != b)
+    return get_graph_from_pairs(table['n'], a[border], b[border])
+
+def build_migration_graph(table, cells=None, transport_costs=None):
+    """Neighbour graph of the burg table as configured by MIGRATION_GRAPH."""
+    if MIGRATION_GRAPH == "cells" and cells:
+        graph = build_cell_region_graph(table, cells, transport_costs)
+    else:
+        graph = build_nearest_graph(table)
+    print(f"Migration graph: {table['n']} burgs, {len(graph['rows']) // 2} neighbour pairs")
+    return graph
+
+def get_prosperity(population, net_production, out=None):
+    """Net production of all commodities per 1000 inhabitants (0 for empty burgs)."""
+    out = np.zeros(len(population)) if out is None else out
+    net_production.sum(axis=1, out=out)
+    np.divide(out * 1000, population, out=out, where=population > 0)
+    out[population <= 0] = 0
+    return out
+
+def get_migration_weights(graph, prosperity):
+    """
+    Migration operator: the share of the population of burg rows[e] moving to burg cols[e] in one tick.
+    Only edges towards a more prosperous burg carry migrants, and a burg sends at most MIGRATION_RATE in total.
+    """
+    degree = np.bincount(graph['rows'], minlength=graph['n'])
+    gap = prosperity[graph['cols']] - prosperity[graph['rows']]
+    weights = np.tanh(np.maximum(gap, 0) / PROSPERITY_SCALE)
+    weights *= MIGRATION_RATE / degree[graph['rows']]
+    return weights
+
+def apply_migration(graph, weights, population):
+    """
+    Applies the migration operator to the population vector in place (sparse product: one term per edge).
+    Returns the migrants per edge.
+    """
+    migrants = weights * population[graph['rows']]
+    population += np.bincount(graph['cols'], weights=migrants, minlength=graph['n'])
+    population -= np.bincount(graph['rows'], weights=migrants, minlength=graph['n'])
+    return migrants
+
+def run_migration(table, config, graph, ticks=None):
+    """
+    Standalone migration stage on a burg table: every tick, population moves along the neighbour graph
+    towards more prosperous burgs. Fractional migrants accumulate, and only the burgs whose (whole) population
+    changed are recomputed.
+    Returns stats (migrants in total, burgs recomputed per tick on average).
+    """
+    ticks = MIGRATION_TICKS if ticks is None else ticks
+    print(f"--- Simulating Migration ({table['n']} burgs, {ticks} ticks) ---")
+    compiled = simulate_economy.compile_citizen_config(config)
+    population = table['population'].astype(np.float64)
+    shares = simulate_economy.get_citizen_shares(population, table['citizens'])
+    prosperity = np.zeros(table['n'])
+
+    total_migrants, recomputed = 0.0, 0
+    for _ in range(ticks):
+        get_prosperity(population, table['net_production'], out=prosperity)
+        migrants = apply_migration(graph, get_migration_weights(graph, prosperity), population)
+        if not migrants.any():
+            break
+        rows = np.nonzero(np.round(population) != table['population'])[0]
+        simulate_economy.update_burg_rows(table, compiled, population, shares, rows)
+        total_migrants += float(migrants.sum())
+        recomputed += len(rows)
+
+    stats = {'migrants': round(total_migrants), 'recomputed_per_tick': round(recomputed / max(ticks, 1), 1)}
+    print(f"Migrants: {stats['migrants']:,}, burgs recomputed per tick: {stats['recomputed_per_tick']}")
+    return stats
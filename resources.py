@@ -0,0 +1,132 @@
+import numpy as np
+
+import catchments
+import cell_graph
+import simulate_economy
+
+# Configuration
+USE_RESOURCES = False # Food and gold producers draw down the resources of their burg's hinterland during the economy ticks
+RESOURCES = ['forest', 'ore', 'fish', 'soil']
+CITIZEN_RESOURCES = {'Farmer': 'soil', 'Fisherman': 'fish', 'Hunter': 'forest', 'Craftsman': 'ore'} # Citizens whose production needs a resource
+HINTERLAND_COST = 60 # Travel cost (land-equivalent distance) from a burg within which its cells are worked
+RESOURCE_DENSITY = {'forest': 0.5, 'ore': 1.0, 'fish': 0.2, 'soil': 1.0} # Stock of a full cell per unit of cell area
+REGENERATION_RATE = {'forest': 0.02, 'ore': 0.002, 'fish': 0.1, 'soil': 0.05} # Share of the missing stock that grows back per tick
+# Biome id (Azgaar's default biomes) -> (forest, soil) richness between 0 and 1
+BIOME_RESOURCES = {
+    0: (0.0, 0.0), # Marine
+    1: (0.0, 0.1), # Hot desert
+    2: (0.0, 0.1), # Cold desert
+    3: (0.2, 0.6), # Savanna
+    4: (0.1, 1.0), # Grassland
+    5: (0.8, 0.7), # Tropical seasonal forest
+    6: (1.0, 0.9), # Temperate deciduous forest
+    7: (1.0, 0.5), # Tropical rainforest
+    8: (1.0, 0.7), # Temperate rainforest
+    9: (0.8, 0.3), # Taiga
+    10: (0.1, 0.1), # Tundra
+    11: (0.0, 0.0), # Glacier
+    12: (0.4, 0.4), # Wetland
+}
+RIVER_FISH = 0.5 # Fish richness of river cells (sea and lake cells are 1)
+
+def get_cell_capacities(cells):
+    """Cells x RESOURCES array of full stocks from each cell's biome, height, river and area."""
+    height = np.array([c.get('h', 0) for c in cells], dtype=np.float64)
+    area = np.array([c.get('area', 0) for c in cells], dtype=np.float64)
+    river = np.array([c.get('r', 0) > 0 for c in cells], dtype=bool)
+    biome = np.array([BIOME_RESOURCES.get(c.get('biome', 0), (0.0, 0.0)) for c in cells], dtype=np.float64).reshape(-1, 2)
+    water = height < cell_graph.WATER_HEIGHT
+
+    richness = np.zeros((len(cells), len(RESOURCES)))
+    richness[:, RESOURCES.index('forest')] = np.where(water, 0, biome[:, 0])
+    richness[:, RESOURCES.index('soil')] = np.where(water, 0, biome[:, 1])
+    richness[:, RESOURCES.index('ore')] = np.where(water, 0, np.clip((height - cell_graph.WATER_HEIGHT) / (100 - cell_graph.WATER_HEIGHT), 0, 1))
+    richness[:, RESOURCES.index('fish')] = np.where(water, 1, np.where(river, RIVER_FISH, 0))
+    return richness * area[:, None] * np.array([RESOURCE_DENSITY[r] for r in RESOURCES])
+
+def get_hinterland(table, cells, transport_costs=None):
+    """Cell id and burg table row of every cell within HINTERLAND_COST of a burg (each cell goes to its cheapest burg)."""
+    origin = catchments.assign_cells(table, cell_graph.build_cell_graph(cells, transport_costs or {}), cutoff=HINTERLAND_COST)
+    cell_ids = np.nonzero(origin >= 0)[0]
+    return cell_ids, origin[cell_ids]
+
+def build_resource_state(table, cells, config, transport_costs=None):
+    """
+    Resource stocks of every hinterland cell (full at the start) with their cell -> burg assignment,
+    plus the citizens x RESOURCES matrix of how much each citizen's quartier draws per tick (its production).
+    """
+    cells = [c for c in cells if 'i' in c]
+    cell_ids, burgs = get_hinterland(table, cells, transport_costs)
+    position = {c['i']: k for k, c in enumerate(cells)}
+    capacity = get_cell_capacities([cells[position[i]] for i in cell_ids.tolist()])
+
+    citizens = simulate_economy.compile_citizen_config(config)['citizens']
+    production = {c['Citizen']: sum(v for k, v in c.items() if k.startswith('Production_')) for c in config['citizens']}
+    draw_matrix = np.zeros((len(citizens), len(RESOURCES)))
+    for j, citizen in enumerate(citizens):
+        if citizen in CITIZEN_RESOURCES:
+            draw_matrix[j, RESOURCES.index(CITIZEN_RESOURCES[citizen])] = production[citizen]
+    print(f"Resources: {len(cell_ids)} hinterland cells of {table['n']} burgs")
+
+    n = table['n']
+    return {
+        'n': n,
+        'cell_ids': cell_ids,
+        'burgs': burgs,
+        'capacity': capacity,
+        'stock': capacity.copy(),
+        'regeneration': np.array([REGENERATION_RATE[r] for r in RESOURCES]),
+        'draw_matrix': draw_matrix,
+        'resource_citizens': np.nonzero(draw_matrix.any(axis=1))[0], # Columns of the citizens that need a resource, and which
+        'citizen_resource': draw_matrix.argmax(axis=1)[draw_matrix.any(axis=1)],
+        # Per-tick work arrays
+        'demand': np.zeros((n, len(RESOURCES))),
+        'available': np.zeros((n, len(RESOURCES))),
+        'yields': np.ones((n, len(RESOURCES))),
+        'citizen_yields': np.ones((n, len(citizens))),
+    }
+
+def draw_resources(state, quartiers):
+    """
+    One tick of harvesting: every burg's demand (quartiers x draw matrix) is taken from its hinterland cells,
+    each cell giving the same share of its stock. Returns the burgs x citizens yields (share of the demand met,
+    1 for citizens that need no resource) to multiply the quartiers' production with.
+    """
+    demand, available, yields = state['demand'], state['available'], state['yields']
+    burgs, stock = state['burgs'], state['stock']
+    np.matmul(quartiers, state['draw_matrix'], out=demand)
+    for r in range(len(RESOURCES)):
+        available[:, r] = np.bincount(burgs, weights=stock[:, r], minlength=state['n'])
+
+    # Share of the hinterland's stock taken, and of the demand met
+    taken = np.divide(demand, available, out=np.zeros_like(demand), where=available > 0)
+    np.minimum(taken, 1, out=taken)
+    stock -= stock * taken[burgs]
+    yields.fill(1)
+    np.divide(available, demand, out=yields, where=demand > 0)
+    np.minimum(yields, 1, out=yields)
+
+    citizen_yields = state['citizen_yields']
+    citizen_yields[:, state['resource_citizens']] = yields[:, state['citizen_resource']]
+    return citizen_yields
+
+def regenerate_resources(state):
+    """Every cell's stocks grow back by REGENERATION_RATE of what they are missing."""
+    stock = state['stock']
+    stock += (state['capacity'] - stock) * state['regeneration']
+
+def get_resource_stats(state):
+    """Remaining share of the full stock per resource."""
+    capacity = state['capacity'].sum(axis=0)
+    remaining = np.divide(state['stock'].sum(axis=0), capacity, out=np.ones(len(RESOURCES)), where=capacity > 0)
+    return {r: round(float(share), 4) for r, share in zip(RESOURCES, remaining)}
+
+def get_checkpoint_arrays(state):
+    return {'resource_cells': state['cell_ids'], 'resource_stock': state['stock']}
+
+def set_checkpoint_arrays(state, checkpoint):
+    """Restores the stocks saved by get_checkpoint_arrays (ignored if the hinterland changed)."""
+    if np.array_equal(checkpoint['resource_cells'], state['cell_ids']):
+        state['stock'][:] = checkpoint['resource_stock']
+    else:
+        print("Warning: ignoring resource stocks of another hinterland")
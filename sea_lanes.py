@@ -0,0 +1,138 @@
+import heapq
+import math
+
+import numpy as np
+
+import cell_graph
+import distance_cache
+
+def get_port_cell(burg, cells_by_id):
+    """
+    Water cell a haven burg sails from: its 'haven' cell (Azgaar stores the nearest water cell there),
+    else a water neighbour of its cell. None for burgs that are not ports.
+    """
+    cell = cells_by_id.get(burg.get('cell'))
+    if cell is None:
+        return None
+    haven = burg.get('haven') or cell.get('haven')
+    if not haven:
+        return None
+    if haven in cells_by_id and cells_by_id[haven].get('h', 0) < cell_graph.WATER_HEIGHT:
+        return haven
+    for neighbour in cell.get('c', []):
+        if neighbour in cells_by_id and cells_by_id[neighbour].get('h', 0) < cell_graph.WATER_HEIGHT:
+            return neighbour
+    return None
+
+def build_water_graph(cells):
+    """Cell graph restricted to water cells (h < WATER_HEIGHT), weighted by plain distance between cell centers."""
+    graph = cell_graph.build_cell_graph(cells, {})
+    sources = np.repeat(np.arange(graph['n'], dtype=np.int32), np.diff(graph['indptr']))
+    water = graph['h'] < cell_graph.WATER_HEIGHT
+    keep = water[sources] & water[graph['indices']]
+
+    indptr = np.zeros(graph['n'] + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(sources[keep], minlength=graph['n']))
+    return dict(graph, indptr=indptr, indices=graph['indices'][keep], weights=graph['weights'][keep])
+
+def compute_lanes(graph, port_cells):
+    """
+    One multi-source search over the water graph from every port cell. Wherever the regions reached
+    first from two ports touch, the ports are joined by a lane (cost to the border on both sides plus
+    the border edge); the shortest such crossing is kept.
+    Returns the lanes as COO rows (port_a, port_b, length) with port_a < port_b.
+    """
+    cost, origin, _ = cell_graph.dijkstra(graph, port_cells)
+    sources = np.repeat(np.arange(graph['n'], dtype=np.int32), np.diff(graph['indptr']))
+    targets = graph['indices']
+    a, b = origin[sources], origin[targets]
+    border = (a >= 0) & (b >= 0) & (a < b)
+
+    a, b = a[border], b[border]
+    length = cost[sources[border]] + graph['weights'][border] + cost[targets[border]]
+    order = np.lexsort((length, b, a))
+    a, b, length = a[order], b[order], length[order]
+    first = np.ones(len(a), dtype=bool)
+    first[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+    return np.column_stack([a[first], b[first], length[first]]).astype(np.float64)
+
+def build_sea_lanes(cells, burgs, cache_dir=None):
+    """
+    Port-to-port sea lane network of a map, computed once and cached (it is the expensive part).
+    Returns a dict with the burg id -> port lookup and the lanes as a sparse CSR matrix between
+    ports (indptr, indices, lengths); longer voyages chain lanes, see get_sea_distance.
+    """
+    cells_by_id = {c.get('i'): c for c in cells if 'i' in c}
+    burg_ports = {b['id']: get_port_cell(b, cells_by_id) for b in burgs}
+    port_cells = sorted({cell for cell in burg_ports.values() if cell is not None})
+    port_index = {cell: p for p, cell in enumerate(port_cells)}
+    print(f"--- Building sea lanes ({len(port_cells)} ports) ---")
+
+    key = distance_cache.get_cache_key('sea_lanes', distance_cache.get_cell_geometry(cells), port_cells, cell_graph.WATER_HEIGHT)
+    lanes = distance_cache.cached_array(cache_dir, key, lambda: compute_lanes(build_water_graph(cells), port_cells))
+
+    # Symmetric CSR over ports
+    a, b, length = lanes[:, 0].astype(np.int64), lanes[:, 1].astype(np.int64), lanes[:, 2]
+    rows, cols, lengths = np.concatenate([a, b]), np.concatenate([b, a]), np.concatenate([length, length])
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(len(port_cells) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=len(port_cells)))
+
+    print(f"Sea lanes: {len(lanes)}")
+    return {
+        'key': key,
+        'ports': {burg_id: port_index[cell] for burg_id, cell in burg_ports.items() if cell is not None},
+        'indptr': indptr,
+        'indices': cols[order],
+        'lengths': lengths[order],
+        'voyages': {}, # Memoized get_port_distances rows
+    }
+
+def get_port_distances(sea_lanes, port):
+    """Sailing distance from one port to every port over the lane network (inf if on another water body)."""
+    voyages = sea_lanes['voyages']
+    if port in voyages:
+        return voyages[port]
+
+    indptr = sea_lanes['indptr']
+    indices = sea_lanes['indices']
+    lengths = sea_lanes['lengths']
+    dist = np.full(len(indptr) - 1, np.inf)
+    best = {port: 0.0}
+    heap = [(0.0, port)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > best[u]: continue
+        dist[u] = d
+        for k in range(indptr[u], indptr[u + 1]):
+            v = int(indices[k])
+            nd = d + float(lengths[k])
+            if nd < best.get(v, math.inf):
+                best[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+    voyages[port] = dist
+    return dist
+
+def get_sea_distance(sea_lanes, from_id, to_id):
+    """
+    Sailing distance between two burgs along the lane network, inf unless both are ports on the same water body.
+    Voyages chain lanes between neighbouring ports' water regions (see compute_lanes), so this approximates
+    the shortest water path from above rather than being it.
+    """
+    from_port = sea_lanes['ports'].get(from_id)
+    to_port = sea_lanes['ports'].get(to_id)
+    if from_port is None or to_port is None:
+        return math.inf
+    return float(get_port_distances(sea_lanes, from_port)[to_port])
+
+def get_sea_distance_matrix(sea_lanes, from_ids, to_ids):
+    """Batched get_sea_distance: len(from_ids) x len(to_ids) array."""
+    to_ports = np.array([sea_lanes['ports'].get(i, -1) for i in to_ids], dtype=np.int64)
+    known = to_ports >= 0
+    result = np.full((len(from_ids), len(to_ids)), np.inf)
+    for row, from_id in enumerate(from_ids):
+        from_port = sea_lanes['ports'].get(from_id)
+        if from_port is None: continue
+        result[row, known] = get_port_distances(sea_lanes, from_port)[to_ports[known]]
+    return result
@@ -0,0 +1,174 @@
+import glob
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import burg_table
+import simulate_economy
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(BASE_DIR, 'fantasy_maps')
+OUTPUT_DIR = os.path.join(BASE_DIR, 'fantasy_worlds')
+SENSITIVITY_TOP = 10 # Parameters listed per state in the state report (and printed for the world)
+
+# Gradients are taken on the smooth economy: citizens = population x frequency share and
+# quartiers = citizens / inhabitants per quartier, without the rounding of the real economy
+# (which is piecewise constant, so its own gradients are zero almost everywhere).
+# Parameters are named by the same paths as in sweep.py ("citizens.<Citizen>.<key>..." and "economy.<key>...").
+
+def get_parameters(config, compiled):
+    """
+    Every numeric parameter of the economy with its value and where it acts: frequency parameters
+    (Base_Frequency and the burg type / feature modifiers) on one citizen's frequency, Production_ / Consumption_
+    values on one citizen x commodity entry and the quartier sizes on the inhabitants per quartier.
+    """
+    parameters = []
+    for j, citizen in enumerate(config.get('citizens', [])):
+        prefix = f"citizens.{citizen.get('Citizen')}"
+        parameters.append({'parameter': f"{prefix}.Base_Frequency", 'value': citizen.get('Base_Frequency'), 'kind': 'base', 'citizen': j})
+        for burg_type, value in citizen.get('Burg_Type_Frequency_Modifiers', {}).items():
+            parameters.append({'parameter': f"{prefix}.Burg_Type_Frequency_Modifiers.{burg_type}", 'value': value,
+                               'kind': 'type', 'citizen': j, 'index': compiled['types'][burg_type]})
+        for feature, value in citizen.get('Burg_Features_Frequency_Modifiers', {}).items():
+            parameters.append({'parameter': f"{prefix}.Burg_Features_Frequency_Modifiers.{feature}", 'value': value,
+                               'kind': 'feature', 'citizen': j, 'index': compiled['features'][feature.lower()]})
+        for key, value in citizen.items():
+            if key.startswith(('Production_', 'Consumption_')):
+                parameters.append({'parameter': f"{prefix}.{key}", 'value': value, 'kind': 'commodity', 'citizen': j,
+                                   'index': compiled['commodities'].index(f"Net_{key.split('_', 1)[1]}")})
+    if compiled['inhabitants_per_quartier']:
+        for key in ('Min_Inhabitants_Per_Quartier', 'Max_Inhabitants_Per_Quartier'):
+            value = config['economy']['Quartiers'].get(key)
+            if value is not None:
+                parameters.append({'parameter': f"economy.Quartiers.{key}", 'value': value, 'kind': 'quartier'})
+    return parameters
+
+def get_smooth_economy(inputs, compiled):
+    """Frequencies, total frequency, citizen shares, quartiers and net production of the smooth economy (burgs x ...)."""
+    frequencies = compiled['base'] + compiled['type_matrix'][inputs['type_rows']] + inputs['features'] @ compiled['feature_matrix']
+    frequencies = frequencies.reshape(len(inputs['population']), len(compiled['citizens']))
+    total = np.maximum(frequencies, 0).sum(axis=1)
+    shares = np.divide(np.maximum(frequencies, 0), total[:, None], out=np.zeros_like(frequencies), where=total[:, None] > 0)
+    ipq = compiled['inhabitants_per_quartier']
+    quartiers = inputs['population'][:, None] * shares / ipq if ipq else np.zeros_like(shares)
+    return frequencies, total, shares, quartiers, quartiers @ compiled['commodity_matrix']
+
+def get_burg_gradients(inputs, compiled, parameters):
+    """
+    Burgs x parameters x commodities gradients of net production, all in one pass.
+    Through the frequency normalization, d net / d frequency_c = population / (ipq x total) x (M_c - shares @ M):
+    raising a citizen's frequency moves quartiers from the burg's average citizen to that one. A parameter adds to
+    the frequency of every burg it applies to (all of them, those of its type, or per matching feature key).
+    Frequencies below zero are clipped, so they do not respond; at exactly zero the gradient of a rise is used.
+    """
+    frequencies, total, shares, quartiers, net_production = get_smooth_economy(inputs, compiled)
+    commodity_matrix = compiled['commodity_matrix']
+    n, k = net_production.shape
+    ipq = compiled['inhabitants_per_quartier']
+
+    scale = np.divide(inputs['population'], total * ipq, out=np.zeros(n), where=total > 0) if ipq else np.zeros(n)
+    frequency_gradient = (frequencies >= 0)[:, :, None] * scale[:, None, None] * (commodity_matrix[None, :, :] - (shares @ commodity_matrix)[:, None, :])
+
+    gradients = np.zeros((n, len(parameters), k))
+    frequency = [p for p, parameter in enumerate(parameters) if parameter['kind'] in ('base', 'type', 'feature')]
+    coefficients = np.ones((n, len(frequency)))
+    for column, p in enumerate(frequency):
+        parameter = parameters[p]
+        if parameter['kind'] == 'type':
+            coefficients[:, column] = inputs['type_rows'] == parameter['index']
+        elif parameter['kind'] == 'feature':
+            coefficients[:, column] = inputs['features'][:, parameter['index']]
+    citizens = np.array([parameters[p]['citizen'] for p in frequency], dtype=np.int64)
+    gradients[:, frequency, :] = coefficients[:, :, None] * frequency_gradient[:, citizens, :]
+
+    for p, parameter in enumerate(parameters):
+        if parameter['kind'] == 'commodity':
+            gradients[:, p, parameter['index']] = quartiers[:, parameter['citizen']]
+        elif parameter['kind'] == 'quartier':
+            gradients[:, p, :] = -0.5 * net_production / ipq # ipq is the mean of both bounds
+    return gradients
+
+def get_sensitivities(burgs, config):
+    """
+    Gradients of every burg's, state's and the world's net production with respect to every config parameter.
+    Returns the parameters and commodities, the burgs x parameters x commodities gradients, the state ids
+    (-1 = burgs without a state) with their states x parameters x commodities gradients, and the world gradients.
+    """
+    burgs = [b for b in burgs if isinstance(b, dict) and 'name' in b]
+    compiled = simulate_economy.compile_citizen_config(config)
+    inputs = simulate_economy.get_burg_economy_inputs(burgs, compiled)
+    parameters = get_parameters(config, compiled)
+    gradients = get_burg_gradients(inputs, compiled, parameters)
+
+    state_ids, codes = np.unique([-1 if b.get('state') is None else b.get('state') for b in burgs], return_inverse=True)
+    state_gradients = np.zeros((len(state_ids),) + gradients.shape[1:])
+    np.add.at(state_gradients, codes, gradients)
+    return {
+        'parameters': parameters,
+        'commodities': compiled['commodities'],
+        'burg': gradients,
+        'state_ids': state_ids,
+        'state': state_gradients,
+        'world': gradients.sum(axis=0),
+        'world_net_production': get_smooth_economy(inputs, compiled)[4].sum(axis=0),
+    }
+
+def rank_gradients(gradients, parameters, commodities):
+    """
+    Long table of parameter x commodity gradients, ranked by effect: the change of net production from changing
+    the parameter by its own size (by 1 for parameters that are 0), so parameters of different scales compare.
+    """
+    values = np.array([float(p['value']) for p in parameters])
+    scale = np.where(values != 0, np.abs(values), 1)
+    report = pd.DataFrame({
+        'parameter': np.repeat([p['parameter'] for p in parameters], len(commodities)),
+        'value': np.repeat(values, len(commodities)),
+        'commodity': np.tile(commodities, len(parameters)),
+        'gradient': gradients.ravel(),
+        'effect': (gradients * scale[:, None]).ravel(),
+    })
+    report = report[report['gradient'] != 0]
+    report = report.reindex(report['effect'].abs().sort_values(ascending=False, kind='stable').index)
+    report.insert(0, 'rank', np.arange(1, len(report) + 1))
+    return report.reset_index(drop=True)
+
+def get_sensitivity_report(burgs, config, states=None):
+    """Ranked world report (with elasticities) and the SENSITIVITY_TOP ranked parameters per state."""
+    sensitivities = get_sensitivities(burgs, config)
+    parameters, commodities = sensitivities['parameters'], sensitivities['commodities']
+
+    world = rank_gradients(sensitivities['world'], parameters, commodities)
+    totals = dict(zip(commodities, sensitivities['world_net_production']))
+    world['elasticity'] = [value * gradient / totals[c] if totals[c] else np.nan
+                           for value, gradient, c in zip(world['value'], world['gradient'], world['commodity'])]
+
+    probe = {'state': [None if s < 0 else int(s) for s in sensitivities['state_ids']], 'state_name': None}
+    burg_table.set_state_names(probe, states or [])
+    state_reports = []
+    for s, (state_id, state_name) in enumerate(zip(probe['state'], probe['state_name'])):
+        report = rank_gradients(sensitivities['state'][s], parameters, commodities).head(SENSITIVITY_TOP)
+        report.insert(0, 'state_name', state_name)
+        report.insert(0, 'state_id', state_id)
+        state_reports.append(report)
+    return world, pd.concat(state_reports, ignore_index=True) if state_reports else pd.DataFrame()
+
+
+if __name__ == "__main__":
+    sim_config = simulate_economy.load_simulation_config()
+    for filepath in glob.glob(os.path.join(INPUT_DIR, '*.json')):
+        print(f"Sensitivity of {os.path.basename(filepath)}...")
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        safe_name = re.sub(r'[^\w\-_]', '_', data.get('info', {}).get('mapName', 'Unknown_Map'))
+        map_dir = os.path.join(OUTPUT_DIR, safe_name)
+        os.makedirs(map_dir, exist_ok=True)
+
+        pack = data.get('pack', {})
+        world, state_report = get_sensitivity_report(pack.get('burgs', []), sim_config, states=pack.get('states', []))
+        world.to_csv(os.path.join(map_dir, f"{safe_name}_sensitivity.csv"), index=False)
+        state_report.to_csv(os.path.join(map_dir, f"{safe_name}_sensitivity_states.csv"), index=False)
+        print(world.head(SENSITIVITY_TOP).to_string(index=False))
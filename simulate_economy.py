@@ -1,6 +1,10 @@
 import json
 import statistics
 
+import numpy as np
+
+import burg_table
+
 CITIZEN_INFO_FILE = "info/citizen_info.json"
 SETTLEMENT_INFO_FILE = "info/settlement_info.json"
 ECONOMY_INFO_FILE = "info/economy_info.json"
@@ -41,11 +45,15 @@ def process_map_data(map_data, config):
     Processes the map data (loaded JSON) and adds simulation data to burgs.
     Returns the list of processed burg models.
     """
+    return burg_table.materialize_burgs(process_map_table(map_data, config))
+
+def process_map_table(map_data, config):
+    """Same as process_map_data, but returns the burg table (see burg_table) instead of burg dicts."""
     print(f"\n--- Processing Map Data ---")
     
     if not map_data:
         print("Error: No map data provided.")
-        return []
+        return get_burg_table([], config)
 
     burgs = []
     if 'burgs' in map_data.get('pack', {}):
@@ -53,31 +61,35 @@ def process_map_data(map_data, config):
         print(f"Found {len(burgs)} burgs in map data.")
     else:
         print("Warning: No 'burgs' found in map data pack.")
-        return []
+        return get_burg_table([], config)
 
     # Filter out empty/invalid burgs (often the first one is a placeholder)
     valid_burgs = [b for b in burgs if isinstance(b, dict) and 'name' in b]
     
-    return get_burg_models(valid_burgs, config)
+    return get_burg_table(valid_burgs, config)
 
 def get_burg_models(burgs, config):
+    """Burg models (dicts, see get_burg_model) of all burgs, computed in bulk through the burg table."""
+    return burg_table.materialize_burgs(get_burg_table(burgs, config))
+
+def get_burg_table(burgs, config):
     print("\n--- Processing burgs ---")
 
-    l = len(burgs)
-    burg_models = []
-    for b, burg in enumerate(burgs):
-        # print(f"Processing burg {b + 1} of {l}: {burg.get('name', 'Unknown')}")
-        if burg:
-            burg_models.append(get_burg_model(burg, config))
+    burgs = [burg for burg in burgs if burg]
 
-    print(f"Burg processing complete. Processed {len(burg_models)} burgs.")
+    # Citizens, quartiers, production and area requirements of all burgs at once (see get_burg_economy_arrays)
+    compiled = compile_citizen_config(config)
+    table = burg_table.make_burg_table(burgs, compiled, get_burg_economy_arrays(burgs, compiled))
+
+    print(f"Burg processing complete. Processed {table['n']} burgs.")
     
-    return burg_models
+    return table
 
 # BURG > GET MODEL
 def get_burg_model(burg, config):
     """
     Process a burg. Generate the citizens and quartiers based on the simulation configuration.
+    Reference path burg by burg; get_burg_table computes the same for all burgs at once.
     """
 
     citizens = get_citizens_for_burg(burg, config)
@@ -107,6 +119,144 @@ def get_burg_model(burg, config):
     }
 
 
+# ALL BURGS > VECTORIZED ENGINE
+AREA_REQUIREMENT_COLUMNS = {
+    # Output key: (config key, divisor)
+    "Farmland_to_Feed_Burg_ha_Min": ('Farmland_to_Feed_Person_ha_Min', 1),
+    "Farmland_to_Feed_Burg_ha_Max": ('Farmland_to_Feed_Person_ha_Max', 1),
+    "Urban_Area_Burg_ha_Min": ('Urban_Area_Per_Person_m2_Min', 10_000),
+    "Urban_Area_Burg_ha_Max": ('Urban_Area_Per_Person_m2_Max', 10_000),
+}
+
+def compile_citizen_config(config):
+    """
+    Compiles the simulation config once into arrays: base frequencies, burg type x citizen and
+    feature x citizen frequency modifiers (feature names lowercased), the citizen x commodity
+    production matrix, inhabitants per quartier and the area requirement factors.
+    """
+    citizens = config.get('citizens', [])
+    types, features = {}, {}
+    for citizen in citizens:
+        for burg_type in citizen.get('Burg_Type_Frequency_Modifiers', {}):
+            types.setdefault(burg_type, len(types))
+        for feature in citizen.get('Burg_Features_Frequency_Modifiers', {}):
+            features.setdefault(feature.lower(), len(features))
+
+    # Last row of the type matrix stays zero for types no citizen mentions
+    type_matrix = np.zeros((len(types) + 1, len(citizens)))
+    feature_matrix = np.zeros((len(features), len(citizens)))
+    for j, citizen in enumerate(citizens):
+        for burg_type, modifier in citizen.get('Burg_Type_Frequency_Modifiers', {}).items():
+            type_matrix[types[burg_type], j] = modifier
+        for feature, modifier in {k.lower(): v for k, v in citizen.get('Burg_Features_Frequency_Modifiers', {}).items()}.items():
+            feature_matrix[features[feature], j] = modifier
+
+    quartiers_config = config.get('economy', {}).get('Quartiers')
+    inhabitants_per_quartier = None
+    if quartiers_config:
+        inhabitants_per_quartier = statistics.mean([quartiers_config.get('Min_Inhabitants_Per_Quartier', 100), quartiers_config.get('Max_Inhabitants_Per_Quartier', 1000)])
+
+    area_config = config.get('economy', {}).get('Area_Requirements')
+    commodities = get_commodities(config)
+    return {
+        'citizens': [citizen.get('Citizen') for citizen in citizens],
+        'base': np.array([citizen.get('Base_Frequency') for citizen in citizens], dtype=np.float64),
+        'types': types,
+        'type_matrix': type_matrix,
+        'features': features,
+        'feature_matrix': feature_matrix,
+        'commodities': commodities,
+        'commodity_matrix': get_commodity_matrix(config, commodities),
+        'inhabitants_per_quartier': inhabitants_per_quartier,
+        'area_requirements': {key: (area_config.get(name, 0), divisor) for key, (name, divisor) in AREA_REQUIREMENT_COLUMNS.items()} if area_config else {},
+    }
+
+def get_burg_feature_matrix(burgs, compiled):
+    """Burgs x features matrix: how many of a burg's keys name the feature (case-insensitive) with a value > 0."""
+    features = compiled['features']
+    feature_matrix = np.zeros((len(burgs), len(features)))
+    for i, burg in enumerate(burgs):
+        for key, value in burg.items():
+            f = features.get(key.lower())
+            if f is not None and value > 0:
+                feature_matrix[i, f] += 1
+    return feature_matrix
+
+def get_burg_economy_inputs(burgs, compiled):
+    """
+    The burg data the economy depends on, as arrays: population, row of the burg type in the type matrix
+    and burgs x features counts. They only depend on the names in the config, not on its values,
+    so they can be reused for any variant of the same config (see sweep.py).
+    """
+    return {
+        'population': np.round(np.array([burg.get('population') * 1000 for burg in burgs], dtype=np.float64)),
+        'type_rows': np.array([compiled['types'].get(burg.get('type'), len(compiled['types'])) for burg in burgs], dtype=np.int64),
+        'features': get_burg_feature_matrix(burgs, compiled),
+    }
+
+def get_burg_economy_arrays(burgs, compiled, inputs=None):
+    """
+    Same results as get_citizens_for_burg, get_quartiers_for_burg, get_net_production_for_burg and
+    get_area_requirements_for_burg, computed for all burgs at once as array operations.
+    Returns burgs x citizens, burgs x commodities and burgs x area requirement matrices, plus a flag
+    per burg telling whether it has any citizens at all (zero total frequency gives none).
+    inputs: precomputed get_burg_economy_inputs (burgs is then not used).
+    """
+    inputs = get_burg_economy_inputs(burgs, compiled) if inputs is None else inputs
+    population = inputs['population']
+    n = len(population)
+
+    frequencies = compiled['base'] + compiled['type_matrix'][inputs['type_rows']] + inputs['features'] @ compiled['feature_matrix']
+    frequencies = np.maximum(0, frequencies).reshape(n, len(compiled['citizens']))
+    # Left-to-right running sum, the same additions as the built-in sum()
+    total = np.cumsum(frequencies, axis=1)[:, -1] if frequencies.shape[1] else np.zeros(n)
+    has_citizens = total != 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        citizens = np.round(population[:, None] * (frequencies / total[:, None]))
+    citizens = np.where(has_citizens[:, None], citizens, 0).astype(np.int64)
+
+    if compiled['inhabitants_per_quartier']:
+        quartiers = (citizens / compiled['inhabitants_per_quartier']).astype(np.int64)
+    else:
+        quartiers = np.zeros_like(citizens)
+
+    area_factors = list(compiled['area_requirements'].values())
+    area_requirements = np.zeros((n, len(area_factors)), dtype=np.int64)
+    for j, (factor, divisor) in enumerate(area_factors):
+        area = population * factor
+        area_requirements[:, j] = np.round(area / divisor if divisor != 1 else area)
+
+    return {
+        'citizens': citizens,
+        'has_citizens': has_citizens.tolist(),
+        'quartiers': quartiers,
+        'net_production': quartiers.astype(np.float64) @ compiled['commodity_matrix'],
+        'area_requirements': area_requirements,
+    }
+
+
+def get_citizen_shares(population, citizens):
+    """Burgs x citizens share of each citizen type in the population (0 for empty burgs), to rescale citizens when population changes."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(population[:, None] > 0, citizens / population[:, None], 0.0)
+
+def update_burg_rows(table, compiled, population, shares, rows):
+    """
+    Recomputes population, citizens, quartiers, net production and area requirements of the given burg table rows only,
+    the same way get_burg_economy_arrays does for a whole world.
+    """
+    table['population'][rows] = np.round(population[rows])
+    citizens = np.round(table['population'][rows, None] * shares[rows])
+    table['citizens'][rows] = citizens
+    if compiled['inhabitants_per_quartier']:
+        table['quartiers'][rows] = citizens / compiled['inhabitants_per_quartier']
+    table['net_production'][rows] = table['quartiers'][rows].astype(np.float64) @ compiled['commodity_matrix']
+    for j, (factor, divisor) in enumerate(compiled['area_requirements'].values()):
+        area = table['population'][rows] * factor
+        table['area_requirements'][rows, j] = np.round(area / divisor if divisor != 1 else area)
+
+
 # BURG > CITIZENS
 def get_citizens_for_burg(burg, config):
     population = round(burg.get('population')*1000)
@@ -152,25 +302,59 @@ def get_number_of_quartiers_for_citizen_population(citizen_population, quartiers
 
 
 # BURG > PRODUCTION
+def get_commodities(config):
+    """
+    Commodities declared in citizen_info.json: every Production_<Good> or Consumption_<Good> key
+    of any citizen adds a Net_<Good> commodity (in order of first appearance).
+    """
+    commodities = []
+    for citizen in config.get('citizens', []):
+        for key in citizen:
+            for prefix in ('Production_', 'Consumption_'):
+                if key.startswith(prefix) and f"Net_{key[len(prefix):]}" not in commodities:
+                    commodities.append(f"Net_{key[len(prefix):]}")
+    return commodities
+
+
+def get_commodity_matrix(config, commodities, prefixes=('Production_', 'Consumption_')):
+    """
+    Citizens x commodities matrix of net production per quartier, rows in citizen_info.json order.
+    With prefixes=('Production_',) or ('Consumption_',) only that side is summed up.
+    """
+    return np.array([[sum(citizen.get(f"{prefix}{c[len('Net_'):]}", 0) for prefix in prefixes) for c in commodities]
+                     for citizen in config.get('citizens', [])], dtype=np.float64).reshape(-1, len(commodities))
+
+
+def get_net_production_matrix(quartiers_per_burg, config, commodities=None):
+    """
+    Net production of a list of burgs (given as their quartiers per citizen type) as a burgs x commodities matrix:
+    the burgs x citizens quartier counts times the per-quartier commodity matrix.
+    """
+    commodities = get_commodities(config) if commodities is None else commodities
+    citizen_names = [citizen.get('Citizen') for citizen in config.get('citizens', [])]
+    quartier_matrix = np.array([[quartiers.get(name, 0) for name in citizen_names] for quartiers in quartiers_per_burg], dtype=np.float64)
+    return quartier_matrix.reshape(-1, len(citizen_names)) @ get_commodity_matrix(config, commodities)
+
+
 def get_net_production_for_burg(quartiers, config):
-    return get_net_production_from_per_quartier_type(get_net_production_and_consumption_per_quartier_type_for_burg(quartiers, config))
+    commodities = get_commodities(config)
+    return dict(zip(commodities, get_net_production_matrix([quartiers], config, commodities)[0].tolist()))
 
 
 def get_net_production_and_consumption_per_quartier_type_for_burg(quartiers, config):
-    return {citizen_name: get_net_production_and_consumption_for_quartier(quartier_number, [citizen for citizen in config.get('citizens') if citizen.get('Citizen') == citizen_name][0]) for citizen_name, quartier_number in quartiers.items()}
+    return {citizen_name: get_net_production_and_consumption_for_quartier(quartier_number, [citizen for citizen in config.get('citizens') if citizen.get('Citizen') == citizen_name][0], get_commodities(config)) for citizen_name, quartier_number in quartiers.items()}
 
 
-def get_net_production_and_consumption_for_quartier(quartier_number, citizen_config):
-    return {
-            'Net_Food': quartier_number * citizen_config.get('Production_Food', 0) + quartier_number * citizen_config.get('Consumption_Food', 0),
-            'Net_Gold': quartier_number * citizen_config.get('Production_Gold', 0) + quartier_number * citizen_config.get('Consumption_Gold', 0)
-    }
+def get_net_production_and_consumption_for_quartier(quartier_number, citizen_config, commodities=None):
+    commodities = ['Net_Food', 'Net_Gold'] if commodities is None else commodities
+    return {c: quartier_number * citizen_config.get(f"Production_{c[len('Net_'):]}", 0) + quartier_number * citizen_config.get(f"Consumption_{c[len('Net_'):]}", 0)
+            for c in commodities}
 
 def get_net_production_from_per_quartier_type(net_production_per_quartier_type):
-    return {
-            'Net_Food': sum(net_quartier.get('Net_Food') for net_quartier in net_production_per_quartier_type.values()),
-            'Net_Gold': sum(net_quartier.get('Net_Gold') for net_quartier in net_production_per_quartier_type.values())
-    }
+    commodities = []
+    for net_quartier in net_production_per_quartier_type.values():
+        commodities.extend(c for c in net_quartier if c not in commodities)
+    return {c: sum(net_quartier.get(c, 0) for net_quartier in net_production_per_quartier_type.values()) for c in commodities}
 
 
 # BURG > AREA REQUIREMENTS
@@ -1,7 +1,28 @@
+import concurrent.futures
+import heapq
 import math
+import time
+
+import numpy as np
+
+import cell_graph
+import distance_cache
+import sea_lanes
+import spatial_index
+import trade_flow
 
 # Configuration
 USE_TERRAIN_AND_INFRASTRUCTURE = True
+USE_TRANSPORT_COSTS = False # Use cell-graph travel costs (economy_info Transport_Costs) instead of calculate_distance
+USE_SEA_LANES = False # Havens only get the sea bonus when a sea lane joins them (needs the map cells)
+SEA_LANES = None # Sea lane network of the current map (sea_lanes.build_sea_lanes), None = any two havens are joined by sea
+TRADE_SOLVER = "greedy" # "greedy" (gravity model, per importer), "flow" (min-cost flow over each commodity) or "hub" (match inside hubs, then between hubs)
+TRADE_ENGINE = "spatial" # Greedy solver only: "spatial" (grid-pruned candidate search), "matrix" (NumPy distance block) or "full_scan" (score every exporter)
+FLOW_CANDIDATES = 8 # Flow solver only: each importer can be supplied by its k nearest exporters
+HUB_GROUPING = "state" # Hub solver only: "state" (one hub per state) or "grid" (spatial clusters of about HUB_SIZE burgs)
+HUB_SIZE = 25
+TRADE_WORKERS = 1 # Processes matching commodities in parallel (1 = serial)
+PARALLEL_REGIONS = True # Parallel greedy solver only: also split disconnected regions (needs transport costs) into separate tasks
 
 def calculate_distance(burg1, burg2):
     """
@@ -20,7 +41,16 @@ def calculate_distance(burg1, burg2):
         
         # Sea/Haven (Fastest)
         # If both are havens (ports), sea travel is very efficient
-        if burg1.get('haven') and burg2.get('haven'):
+        if SEA_LANES is not None:
+            # Ports must share a water body, and a voyage is never shorter than the straight line
+            sea_distance = sea_lanes.get_sea_distance(SEA_LANES, burg1.get('id'), burg2.get('id'))
+            sea_route = sea_distance < math.inf
+            if sea_route:
+                dist = max(dist, sea_distance)
+        else:
+            sea_route = burg1.get('haven') and burg2.get('haven')
+
+        if sea_route:
             multiplier *= 0.3
 
         # Roads (Faster)
@@ -42,74 +72,827 @@ def calculate_distance(burg1, burg2):
         
     return dist
 
-def simulate_trade(burgs, commodities=['Net_Food', 'Net_Gold']):
+def round_distances(distances, decimals=2):
+    """
+    Vectorized round() that matches Python's built-in round exactly.
+    np.round only disagrees on values whose scaled fraction sits on .5, so those few are redone in Python.
+    """
+    scale = 10 ** decimals
+    rounded = np.round(distances, decimals)
+    scaled = distances * scale
+    halfway = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for idx in zip(*np.nonzero(halfway)):
+        rounded[idx] = round(float(distances[idx]), decimals)
+    return rounded
+
+def get_burg_arrays(burgs, state_codes):
+    """
+    Coordinates and calculate_distance modifier inputs of a list of burgs as NumPy arrays.
+    state_codes maps state values to integer codes and is shared between the two sides of a matrix.
+    """
+    return {
+        'x': np.array([b['x'] for b in burgs], dtype=np.float64),
+        'y': np.array([b['y'] for b in burgs], dtype=np.float64),
+        'h': np.array([b.get('h', 0) for b in burgs], dtype=np.float64),
+        'haven': np.array([bool(b.get('haven')) for b in burgs], dtype=bool),
+        'road': np.array([bool(b.get('road')) for b in burgs], dtype=bool),
+        # Missing states compare equal to each other, exactly like burg.get('state') does
+        'state': np.array([state_codes.setdefault(b.get('state'), len(state_codes)) for b in burgs], dtype=np.int64),
+    }
+
+def build_distance_matrix(burgs_a, burgs_b):
+    """
+    Batched calculate_distance: returns the len(burgs_a) x len(burgs_b) matrix of trade distances,
+    with the same USE_TERRAIN_AND_INFRASTRUCTURE modifiers and rounding as the scalar version.
+    """
+    state_codes = {}
+    a = get_burg_arrays(burgs_a, state_codes)
+    b = get_burg_arrays(burgs_b, state_codes)
+
+    dx = b['x'][None, :] - a['x'][:, None]
+    dy = b['y'][None, :] - a['y'][:, None]
+    dist = np.sqrt(dx * dx + dy * dy)
+
+    if not USE_TERRAIN_AND_INFRASTRUCTURE:
+        return dist
+
+    # Same operation order as calculate_distance so the floats match bit for bit
+    if SEA_LANES is not None:
+        sea_distance = sea_lanes.get_sea_distance_matrix(SEA_LANES, [x['id'] for x in burgs_a], [x['id'] for x in burgs_b])
+        both_havens = np.isfinite(sea_distance)
+        dist = np.where(both_havens, np.maximum(dist, sea_distance), dist)
+    else:
+        both_havens = a['haven'][:, None] & b['haven'][None, :]
+    both_roads = a['road'][:, None] & b['road'][None, :]
+    multiplier = np.where(both_havens, 0.3, np.where(both_roads, 0.5, 1.0))
+    multiplier = multiplier * (1 + 3 * np.abs(a['h'][:, None] - b['h'][None, :]))
+    multiplier = np.where(a['state'][:, None] == b['state'][None, :], multiplier * 0.8, multiplier)
+
+    return round_distances(dist * multiplier)
+
+def get_min_distance_multiplier(burg):
+    """
+    Smallest multiplier calculate_distance can apply between this burg and any other burg.
+    Used to turn Euclidean lower bounds into lower bounds of the trade distance.
+    """
+    if not USE_TERRAIN_AND_INFRASTRUCTURE or not isinstance(burg, dict):
+        return 1.0
+
+    multiplier = 1.0
+    if (burg.get('id') in SEA_LANES['ports']) if SEA_LANES is not None else burg.get('haven'):
+        multiplier *= 0.3
+    elif burg.get('road'):
+        multiplier *= 0.5
+    # Height difference can be 0 and states can match, so only the same-state bonus can lower it further
+    return multiplier * 0.8
+
+def get_trade_distance(importer_burg, exporter_burg, transport_costs=None):
+    """
+    Distance used by the gravity model: calculate_distance, or the cell-graph travel cost
+    when a transport cost table (see cell_graph.build_transport_cost_table) is given.
+    """
+    if transport_costs is None:
+        return calculate_distance(importer_burg, exporter_burg)
+    return round(cell_graph.get_transport_cost(transport_costs, exporter_burg['id'], importer_burg['id']), 2)
+
+def get_min_trade_distance(importer_burg, min_euclidean_distance, transport_costs=None):
+    """Lower bound of get_trade_distance for any exporter at least min_euclidean_distance away."""
+    if transport_costs is None:
+        return min_euclidean_distance * get_min_distance_multiplier(importer_burg)
+    return max(0, min_euclidean_distance - 2 * transport_costs['max_cell_offset']) * transport_costs['min_unit_cost']
+
+def simulate_trade(burgs, commodities=None, engine=None, transport_costs=None, solver=None, stats=None, cache_dir=None, workers=None):
     """
     Simulates trade between burgs based on supply and demand using a gravity model.
+    commodities: defaults to every commodity in the burgs' net production (see get_burg_commodities).
+    solver: "greedy", "flow" or "hub" (defaults to TRADE_SOLVER).
+    engine: greedy candidate search, "spatial", "matrix" or "full_scan" (defaults to TRADE_ENGINE). All produce the same trades.
+    transport_costs: optional cell-graph cost table (exporters x importers) replacing calculate_distance.
+    Exporters beyond its cutoff are unreachable for an importer.
+    stats: optional dict, filled per commodity with solve time, objective (sum of Amount x Distance) and volumes.
+    cache_dir: optional distance_cache folder; the matrix engine reuses its distance block from there across runs.
+    workers: processes for parallel matching (defaults to TRADE_WORKERS), see run_parallel_trade. Same trades as serial.
     """
-    print(f"--- Simulating Trade (Terrain & Infrastructure: {'ON' if USE_TERRAIN_AND_INFRASTRUCTURE else 'OFF'}) ---")
+    solver = solver or TRADE_SOLVER
+    engine = engine or TRADE_ENGINE
+    workers = workers or TRADE_WORKERS
+    commodities = commodities or get_burg_commodities(burgs)
+    print(f"--- Simulating Trade (Terrain & Infrastructure: {'ON' if USE_TERRAIN_AND_INFRASTRUCTURE else 'OFF'}, Solver: {solver}, Engine: {engine}) ---")
     
     trades = []
     
     # Create a lookup for burgs by ID for easy access
     burg_lookup = {b['id']: b for b in burgs}
     
+    markets = {commodity: get_exporters_and_importers(burgs, commodity) for commodity in commodities}
+
+    # The matrix engine builds one distance block and matches all commodities in one pass over it
+    distance_block = build_distance_block(burgs, commodities, transport_costs, cache_dir) if solver == "greedy" and engine == "matrix" else None
+    batched_trades = parallel_results = None
+    if workers > 1:
+        parallel_results = run_parallel_trade(burgs, markets, solver, engine, transport_costs, distance_block, workers)
+    elif distance_block is not None:
+        start = time.perf_counter()
+        batched_trades = match_matrix_commodities(markets, burg_lookup, distance_block)
+        batch_time = time.perf_counter() - start
+    # Distances looked up by the spatial engine are shared between commodities
+    distance_memo = {}
+    
     for commodity in commodities:
-        exporters = []
-        importers = []
-        
-        # Identify Exporters and Importers
-        for b in burgs:
-            net = b.get('net_production_burg', {}).get(commodity, 0)
-            if net > 0.01:
-                exporters.append({'id': b['id'], 'supply': net, 'original_supply': net})
-            elif net < -0.01:
-                importers.append({'id': b['id'], 'demand': -net, 'original_demand': -net})
+        exporters, importers = markets[commodity]
         
         print(f"--- Simulating Trade for {commodity} ---")
         print(f"Exporters: {len(exporters)}, Importers: {len(importers)}")
         
-        # Gravity Model Matching
-        # For each importer, calculate a score for each exporter: Supply / (Distance^2)
-        for importer in importers:
-            importer_burg = burg_lookup[importer['id']]
-            scores = []
+        start = time.perf_counter()
+        if parallel_results is not None:
+            commodity_trades, solve_time = parallel_results[commodity]
+        elif batched_trades is not None:
+            commodity_trades, solve_time = batched_trades[commodity], batch_time
+        else:
+            commodity_trades = match_commodity(solver, engine, exporters, importers, burg_lookup, commodity, transport_costs, distance_block, distance_memo)
+            solve_time = time.perf_counter() - start
+        
+        commodity_stats = get_trade_stats(commodity_trades, exporters, importers, solver, solve_time)
+        print(f"Solve time: {solve_time:.3f}s, Objective: {commodity_stats['objective']:,.2f}, "
+              f"Traded: {commodity_stats['traded']:,.2f} of {commodity_stats['demand']:,.2f} demanded")
+        if stats is not None:
+            stats[commodity] = commodity_stats
+        
+        trades.extend(commodity_trades)
+        
+    return trades
+
+def match_commodity(solver, engine, exporters, importers, burg_lookup, commodity, transport_costs=None, distance_block=None, distance_memo=None):
+    """Matches one commodity with the chosen solver / greedy engine."""
+    if solver == "flow":
+        return match_min_cost_flow(exporters, importers, burg_lookup, commodity, transport_costs)
+    if solver == "hub":
+        return match_hubs(exporters, importers, burg_lookup, commodity, transport_costs)
+    if solver != "greedy":
+        raise ValueError(f"Unknown trade solver: {solver}")
+    if engine == "full_scan":
+        return match_full_scan(exporters, importers, burg_lookup, commodity, transport_costs)
+    if engine == "spatial":
+        return match_spatial(exporters, importers, burg_lookup, commodity, transport_costs, distance_memo)
+    if engine == "matrix":
+        return match_matrix(exporters, importers, burg_lookup, commodity, distance_block)
+    raise ValueError(f"Unknown trade engine: {engine}")
+
+# Burgs and distance inputs of a trade worker process, set once by init_trade_worker
+_worker_state = {}
+
+def init_trade_worker(burgs, transport_costs, distance_block, settings):
+    """Process pool initializer: receives the shared data once per worker instead of once per task."""
+    globals().update(settings)
+    _worker_state.update(burgs=burgs, burg_lookup={b['id']: b for b in burgs}, transport_costs=transport_costs, distance_block=distance_block)
+
+def run_trade_task(solver, engine, commodity, region):
+    """
+    Worker task: matches one commodity, restricted to the burgs of one region (a set of ids) if given.
+    Returns (trades, solve time).
+    """
+    start = time.perf_counter()
+    exporters, importers = get_exporters_and_importers(_worker_state['burgs'], commodity)
+    if region is not None:
+        exporters = [e for e in exporters if e['id'] in region]
+        importers = [i for i in importers if i['id'] in region]
+    trades = match_commodity(solver, engine, exporters, importers, _worker_state['burg_lookup'], commodity,
+                             _worker_state['transport_costs'], _worker_state['distance_block'], {})
+    return trades, time.perf_counter() - start
+
+def get_trade_regions(transport_costs):
+    """
+    Connected components of the transport cost table: groups of burg ids such that no exporter
+    can reach an importer of another group. Burgs outside the table are not part of any region.
+    """
+    rows = list(transport_costs['rows'])
+    cols = list(transport_costs['cols'])
+    # Union-find over exporters (0..len(rows)-1) and importers (len(rows)..)
+    parent = list(range(len(rows) + len(cols)))
+    def find(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+    for r, c in zip(*np.nonzero(np.isfinite(transport_costs['costs']))):
+        a, b = find(int(r)), find(len(rows) + int(c))
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    regions = {}
+    for node, burg_id in enumerate(rows + cols):
+        regions.setdefault(find(node), set()).add(burg_id)
+    return list(regions.values())
+
+def run_parallel_trade(burgs, markets, solver, engine, transport_costs, distance_block, workers):
+    """
+    Matches commodities in a process pool; each commodity is independent of the others.
+    With the greedy solver and a transport cost table, disconnected regions are independent too
+    (no importer can reach another region's exporters), so each becomes its own task and
+    its trades are merged back in importer order, exactly as the serial loop would emit them.
+    Returns commodity -> (trades, summed solve time).
+    """
+    regions = [None]
+    if solver == "greedy" and PARALLEL_REGIONS and transport_costs is not None:
+        regions = get_trade_regions(transport_costs)
+    print(f"--- Parallel trade: {len(markets)} commodities x {len(regions)} regions on {workers} workers ---")
+
+    # Module settings the matching depends on; worker processes may not share this module's state
+    settings = {name: globals()[name] for name in ('USE_TERRAIN_AND_INFRASTRUCTURE', 'SEA_LANES', 'FLOW_CANDIDATES', 'HUB_GROUPING', 'HUB_SIZE')}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_trade_worker,
+                                                initargs=(burgs, transport_costs, distance_block, settings)) as pool:
+        futures = {(commodity, r): pool.submit(run_trade_task, solver, engine, commodity, region)
+                   for commodity in markets for r, region in enumerate(regions)}
+        results = {key: future.result() for key, future in futures.items()}
+
+    merged = {}
+    for commodity, (_, importers) in markets.items():
+        position = {importer['id']: p for p, importer in enumerate(importers)}
+        trades = [t for r in range(len(regions)) for t in results[(commodity, r)][0]]
+        if len(regions) > 1:
+            # Stable: every importer's trades come from a single task, already in order
+            trades.sort(key=lambda t: position[t['To_ID']])
+        merged[commodity] = (trades, sum(results[(commodity, r)][1] for r in range(len(regions))))
+    return merged
+
+def get_trade_stats(trades, exporters, importers, solver, solve_time):
+    """
+    Summary of one commodity's matching: total transport cost (objective) and volumes.
+    Commodities matched in one batched pass all report the time of the whole pass.
+    """
+    return {
+        'solver': solver,
+        'solve_time_s': round(solve_time, 4),
+        'objective': round(sum(t['Amount'] * t['Distance'] for t in trades), 2),
+        'trades': len(trades),
+        'traded': sum(t['Amount'] for t in trades),
+        'supply': sum(e['original_supply'] for e in exporters),
+        'demand': sum(i['original_demand'] for i in importers),
+    }
+
+def get_burg_commodities(burgs):
+    """Every commodity appearing in the burgs' net production, in order of first appearance."""
+    commodities = {}
+    for b in burgs:
+        commodities.update(dict.fromkeys(b.get('net_production_burg', {})))
+    return list(commodities)
+
+def get_trading_burgs(burgs, commodities):
+    """Burgs that import and burgs that export at least one of the commodities."""
+    nets = [b.get('net_production_burg', {}) for b in burgs]
+    importing = [b for b, net in zip(burgs, nets) if any(net.get(c, 0) < -0.01 for c in commodities)]
+    exporting = [b for b, net in zip(burgs, nets) if any(net.get(c, 0) > 0.01 for c in commodities)]
+    return importing, exporting
+
+def build_trade_transport_costs(burgs, cells, transport_costs, commodities=None, cache_dir=None):
+    """
+    One precompute per map: builds the cell graph and the exporter x importer travel cost table
+    that simulate_trade(transport_costs=...) queries.
+    With a cache_dir, the cost matrix is memory-mapped from a previous run on the same geometry and settings.
+    """
+    graph = cell_graph.build_cell_graph(cells, transport_costs)
+    importing, exporting = get_trading_burgs(burgs, commodities or get_burg_commodities(burgs))
+    key = distance_cache.get_cache_key('transport_costs', distance_cache.get_cell_geometry(cells),
+                                       distance_cache.get_burg_geometry(exporting), distance_cache.get_burg_geometry(importing),
+                                       transport_costs, cell_graph.COST_FIELD_CUTOFF, cell_graph.WATER_HEIGHT)
+    costs = distance_cache.cached_array(cache_dir, key, lambda: cell_graph.build_transport_cost_table(graph, exporting, importing)['costs'])
+    return cell_graph.make_transport_cost_table(graph, exporting, importing, costs, cell_graph.COST_FIELD_CUTOFF)
+
+def get_exporters_and_importers(burgs, commodity):
+    """Splits burgs into exporters (surplus) and importers (deficit) of a commodity."""
+    exporters = []
+    importers = []
+    for b in burgs:
+        net = b.get('net_production_burg', {}).get(commodity, 0)
+        if net > 0.01:
+            exporters.append({'id': b['id'], 'supply': net, 'original_supply': net})
+        elif net < -0.01:
+            importers.append({'id': b['id'], 'demand': -net, 'original_demand': -net})
+    return exporters, importers
+
+def make_trade(exporter, importer, burg_lookup, commodity, amount, distance):
+    return {
+        'From_ID': exporter['id'],
+        'From_Name': burg_lookup[exporter['id']]['name'],
+        'To_ID': importer['id'],
+        'To_Name': burg_lookup[importer['id']]['name'],
+        'Commodity': commodity,
+        'Amount': amount,
+        'Distance': distance
+    }
+
+def match_full_scan(exporters, importers, burg_lookup, commodity, transport_costs=None):
+    """
+    Gravity Model Matching
+    For each importer, calculate a score for each exporter: Supply / (Distance^2)
+    """
+    trades = []
+    for importer in importers:
+        trades.extend(fulfill_importer_full_scan(importer, exporters, burg_lookup, commodity, transport_costs))
+    return trades
+
+def fulfill_importer_full_scan(importer, exporters, burg_lookup, commodity, transport_costs=None):
+    """Scores every exporter with supply left for one importer and greedily consumes the best."""
+    trades = []
+    importer_burg = burg_lookup[importer['id']]
+    scores = []
+    
+    for exporter in exporters:
+        if exporter['supply'] <= 0: continue
+        
+        exporter_burg = burg_lookup[exporter['id']]
+        
+        # Pass full burg objects to calculate_distance
+        dist = get_trade_distance(importer_burg, exporter_burg, transport_costs)
+        if dist == math.inf: continue # Beyond the transport cost cutoff
+        if dist < 1: dist = 1 # Avoid division by zero
+        
+        score = exporter['supply'] / (dist ** 2)
+        scores.append({'exporter': exporter, 'score': score, 'distance': dist})
+    
+    # Sort by score (highest first)
+    scores.sort(key=lambda x: x['score'], reverse=True)
+    
+    # Fulfill demand
+    for match in scores:
+        if importer['demand'] <= 0: break
+        
+        exporter = match['exporter']
+        
+        # Greedy consumption: take as much as possible from this exporter
+        amount = min(importer['demand'], exporter['supply'])
+        
+        if amount > 0:
+            trades.append(make_trade(exporter, importer, burg_lookup, commodity, amount, match['distance']))
             
-            for exporter in exporters:
-                if exporter['supply'] <= 0: continue
-                
-                exporter_burg = burg_lookup[exporter['id']]
-                
-                # Pass full burg objects to calculate_distance
-                dist = calculate_distance(importer_burg, exporter_burg)
-                if dist < 1: dist = 1 # Avoid division by zero
-                
-                score = exporter['supply'] / (dist ** 2)
-                scores.append({'exporter': exporter, 'score': score, 'distance': dist})
+            importer['demand'] -= amount
+            exporter['supply'] -= amount
+    return trades
+
+def match_spatial(exporters, importers, burg_lookup, commodity, transport_costs=None, distance_memo=None):
+    """
+    Same gravity model matching as match_full_scan, but exporters are bucketed in a grid and
+    each importer only scores the cells whose score upper bound can still beat the best candidate.
+    Exhausted exporters are dropped from their cell, so later importers never see them again.
+    Candidates are released best-first with ties broken by exporter order, which reproduces the
+    stable sort of the full scan exactly.
+    distance_memo: optional dict of (importer id, exporter id) -> distance, shared between commodities.
+    """
+    trades = []
+    if not exporters or not importers:
+        return trades
+
+    grid = build_exporter_grid(exporters, burg_lookup)
+    for importer in importers:
+        if not grid['active']:
+            break
+        trades.extend(fulfill_importer_spatial(importer, exporters, grid, burg_lookup, commodity, transport_costs, distance_memo))
+
+    return trades
+
+def build_exporter_grid(exporters, burg_lookup):
+    """Grid index of the exporters with, per cell, the exporters that still have supply and a bound of it."""
+    points = [(burg_lookup[e['id']]['x'], burg_lookup[e['id']]['y']) for e in exporters]
+    index = spatial_index.build_grid_index(points)
+    active = {key: [e for e in members if exporters[e]['supply'] > 0] for key, members in index['cells'].items()}
+    active = {key: members for key, members in active.items() if members}
+    return {
+        'index': index,
+        'active': active,
+        'cell_max_supply': {key: max(exporters[e]['supply'] for e in members) for key, members in active.items()},
+        'positions': {e['id']: i for i, e in enumerate(exporters)},
+    }
+
+def fulfill_importer_spatial(importer, exporters, grid, burg_lookup, commodity, transport_costs=None, distance_memo=None):
+    """Best-first greedy consumption for one importer over the exporter grid (see match_spatial)."""
+    trades = []
+    index, active, cell_max_supply = grid['index'], grid['active'], grid['cell_max_supply']
+    max_supply = max(cell_max_supply.values(), default=0)
+
+    importer_burg = burg_lookup[importer['id']]
+    x, y = importer_burg['x'], importer_burg['y']
+    max_ring = spatial_index.get_max_ring(index, x, y)
+
+    def score_bound(supply, min_distance):
+        # Rounding to 2 decimals can lower a distance by at most half a hundredth
+        dist = max(1, get_min_trade_distance(importer_burg, min_distance, transport_costs) - 0.01)
+        return supply / (dist ** 2)
+
+    # Heap entries: (-value, kind, order, payload); kind 0 = cell bound, 1 = exporter score.
+    # Cells pop before exporters with an equal value so tied exporters get compared by order.
+    heap = []
+    ring = 0
+    while importer['demand'] > 0:
+        ring_bound = score_bound(max_supply, spatial_index.get_ring_min_distance(index, ring)) if ring <= max_ring else -1
+
+        if heap and -heap[0][0] > ring_bound:
+            _, kind, order, payload = heapq.heappop(heap)
+            if kind == 0:
+                for e in active.get(payload, []):
+                    exporter = exporters[e]
+                    if distance_memo is None:
+                        dist = get_trade_distance(importer_burg, burg_lookup[exporter['id']], transport_costs)
+                    else:
+                        pair = (importer['id'], exporter['id'])
+                        if pair not in distance_memo:
+                            distance_memo[pair] = get_trade_distance(importer_burg, burg_lookup[exporter['id']], transport_costs)
+                        dist = distance_memo[pair]
+                    if dist == math.inf: continue # Beyond the transport cost cutoff
+                    if dist < 1: dist = 1 # Avoid division by zero
+                    heapq.heappush(heap, (-(exporter['supply'] / (dist ** 2)), 1, e, dist))
+                continue
+
+            exporter = exporters[order]
+            amount = min(importer['demand'], exporter['supply'])
+            if amount > 0:
+                trades.append(make_trade(exporter, importer, burg_lookup, commodity, amount, payload))
+                importer['demand'] -= amount
+                exporter['supply'] -= amount
+                update_active_cell(grid, exporters, order)
+            continue
+
+        if ring > max_ring:
+            break
+
+        for key in spatial_index.iter_ring_cells(index, x, y, ring):
+            if not active.get(key): continue
+            bound = score_bound(cell_max_supply[key], spatial_index.get_cell_min_distance(index, key, x, y))
+            heapq.heappush(heap, (-bound, 0, 0, key))
+        ring += 1
+
+    return trades
+
+def match_min_cost_flow(exporters, importers, burg_lookup, commodity, transport_costs=None, k=None):
+    """
+    Solves the commodity as a transportation problem: exporters supply, importers demand,
+    shipping costs Amount x Distance. Unlike the greedy matching, the result does not depend on
+    importer order and minimizes the total cost of the maximum deliverable volume.
+    Each importer is only connected to its k nearest exporters, so the network stays sparse.
+    """
+    k = k or FLOW_CANDIDATES
+    trades = []
+    if not exporters or not importers:
+        return trades
+
+    points = [(burg_lookup[e['id']]['x'], burg_lookup[e['id']]['y']) for e in exporters]
+    index = spatial_index.build_grid_index(points)
+
+    edges = []
+    distances = {}
+    for t, importer in enumerate(importers):
+        importer_burg = burg_lookup[importer['id']]
+        for e in spatial_index.query_nearest(index, importer_burg['x'], importer_burg['y'], k):
+            dist = get_trade_distance(importer_burg, burg_lookup[exporters[e]['id']], transport_costs)
+            if dist == math.inf: continue # Beyond the transport cost cutoff
+            if dist < 1: dist = 1 # Same floor as the gravity model
+            edges.append((e, t, dist))
+            distances[(e, t)] = dist
+
+    flows, objective = trade_flow.solve_min_cost_flow([e['supply'] for e in exporters], [i['demand'] for i in importers], edges)
+    print(f"Min-cost flow: {len(edges)} edges, objective {objective:,.2f}")
+
+    # Same record order as the greedy solvers: by importer, closest supplier first
+    for (e, t), amount in sorted(flows.items(), key=lambda f: (f[0][1], distances[f[0]], f[0][0])):
+        exporter, importer = exporters[e], importers[t]
+        trades.append(make_trade(exporter, importer, burg_lookup, commodity, amount, distances[(e, t)]))
+        importer['demand'] -= amount
+        exporter['supply'] -= amount
+
+    return trades
+
+def get_hub_keys(burgs, grouping=None):
+    """
+    Hub of every burg (id -> hub key): its state, or its cell in a grid sized to hold about HUB_SIZE burgs.
+    """
+    grouping = grouping or HUB_GROUPING
+    if grouping == "state":
+        return {b['id']: b.get('state', b.get('state_id')) for b in burgs}
+    if grouping == "grid":
+        index = spatial_index.build_grid_index([(b['x'], b['y']) for b in burgs], points_per_cell=HUB_SIZE)
+        return {b['id']: spatial_index.get_cell_key(index, b['x'], b['y']) for b in burgs}
+    raise ValueError(f"Unknown hub grouping: {grouping}")
+
+def match_hubs(exporters, importers, burg_lookup, commodity, transport_costs=None, grouping=None):
+    """
+    Hierarchical matching: burgs are grouped into hubs (see get_hub_keys), supply and demand are
+    first matched inside each hub with the gravity model, and only what is left over, each hub's
+    net surplus or deficit, is matched between hubs. Hub-to-hub volumes are then split back onto
+    the burgs that still have supply or demand, so records stay per burg.
+    Hub-level distances are calculate_distance between supply/demand weighted hub centers.
+    """
+    trades = []
+    if not exporters or not importers:
+        return trades
+
+    hub_keys = get_hub_keys([burg_lookup[m['id']] for m in exporters + importers], grouping)
+    hubs = {}
+    for exporter in exporters:
+        hubs.setdefault(hub_keys[exporter['id']], {'exporters': [], 'importers': []})['exporters'].append(exporter)
+    for importer in importers:
+        hubs.setdefault(hub_keys[importer['id']], {'exporters': [], 'importers': []})['importers'].append(importer)
+
+    # 1. Local matching inside every hub
+    for hub in hubs.values():
+        trades.extend(match_spatial(hub['exporters'], hub['importers'], burg_lookup, commodity, transport_costs))
+
+    # 2. Match hub surpluses against hub deficits
+    hub_burgs, hub_exporters, hub_importers = {}, [], []
+    for h, (key, hub) in enumerate(hubs.items()):
+        supply = sum(e['supply'] for e in hub['exporters'] if e['supply'] > 0)
+        demand = sum(i['demand'] for i in hub['importers'] if i['demand'] > 0)
+        if supply <= 0.01 and demand <= 0.01: continue
+        hub_burgs[h] = get_hub_burg(key, hub, burg_lookup, grouping)
+        hub['burg'] = hub_burgs[h]
+        if supply > 0.01:
+            hub_exporters.append({'id': h, 'key': key, 'supply': supply, 'original_supply': supply})
+        if demand > 0.01:
+            hub_importers.append({'id': h, 'key': key, 'demand': demand, 'original_demand': demand})
+
+    hub_trades = []
+    for hub_importer in hub_importers:
+        # A hub left with both supply and demand could not match them locally, so it never supplies itself
+        others = [e for e in hub_exporters if e['id'] != hub_importer['id']]
+        hub_trades.extend(fulfill_importer_full_scan(hub_importer, others, hub_burgs, commodity))
+    print(f"Hubs: {len(hubs)}, inter-hub flows: {len(hub_trades)}")
+
+    # 3. Push every hub-to-hub volume back down onto individual burgs
+    for hub_trade in hub_trades:
+        source, target = hubs[hub_burgs[hub_trade['From_ID']]['key']], hubs[hub_burgs[hub_trade['To_ID']]['key']]
+        trades.extend(split_hub_trade(hub_trade['Amount'], source, target, burg_lookup, commodity, transport_costs))
+
+    return trades
+
+def get_hub_burg(key, hub, burg_lookup, grouping=None):
+    """Pseudo burg standing for a hub in calculate_distance: the weighted center of its remaining supply and demand."""
+    members = [(e['id'], e['supply']) for e in hub['exporters'] if e['supply'] > 0] + \
+              [(i['id'], i['demand']) for i in hub['importers'] if i['demand'] > 0]
+    total = sum(weight for _, weight in members)
+    return {
+        'id': key,
+        'key': key,
+        'name': f"Hub {key}",
+        'x': sum(burg_lookup[m]['x'] * weight for m, weight in members) / total,
+        'y': sum(burg_lookup[m]['y'] * weight for m, weight in members) / total,
+        'state': key if (grouping or HUB_GROUPING) == "state" else None,
+    }
+
+def split_hub_trade(amount, source, target, burg_lookup, commodity, transport_costs=None):
+    """
+    Splits a hub-to-hub volume into burg trades: the target hub's importers closest to the source hub
+    are served first, each by the source hub's exporters closest to the target hub.
+    """
+    trades = []
+    source_center, target_center = source['burg'], target['burg']
+    exporters = sorted((e for e in source['exporters'] if e['supply'] > 0),
+                       key=lambda e: math.hypot(burg_lookup[e['id']]['x'] - target_center['x'], burg_lookup[e['id']]['y'] - target_center['y']))
+    importers = sorted((i for i in target['importers'] if i['demand'] > 0),
+                       key=lambda i: math.hypot(burg_lookup[i['id']]['x'] - source_center['x'], burg_lookup[i['id']]['y'] - source_center['y']))
+
+    for importer in importers:
+        if amount <= 0: break
+        importer_burg = burg_lookup[importer['id']]
+        for exporter in exporters:
+            if amount <= 0 or importer['demand'] <= 0: break
+            if exporter['supply'] <= 0: continue
+            dist = get_trade_distance(importer_burg, burg_lookup[exporter['id']], transport_costs)
+            if dist == math.inf: continue # Beyond the transport cost cutoff
+            if dist < 1: dist = 1
+            traded = min(amount, importer['demand'], exporter['supply'])
+            trades.append(make_trade(exporter, importer, burg_lookup, commodity, traded, dist))
+            importer['demand'] -= traded
+            exporter['supply'] -= traded
+            amount -= traded
+    return trades
+
+def build_distance_block(burgs, commodities, transport_costs=None, cache_dir=None):
+    """
+    Squared trade distances between every burg that imports and every burg that exports
+    any of the commodities. Row/column lookups map burg ids to matrix positions.
+    calculate_distance blocks are cached in cache_dir when one is given.
+    """
+    row_burgs, col_burgs = get_trading_burgs(burgs, commodities)
+
+    if transport_costs is None:
+        key = distance_cache.get_cache_key('distance_block', USE_TERRAIN_AND_INFRASTRUCTURE, SEA_LANES and SEA_LANES['key'],
+                                           distance_cache.get_burg_geometry(row_burgs), distance_cache.get_burg_geometry(col_burgs))
+        distances = distance_cache.cached_array(cache_dir, key, lambda: build_distance_matrix(row_burgs, col_burgs))
+    else:
+        # Gather the importer x exporter block out of the exporter x importer cost table
+        src = np.array([transport_costs['rows'].get(b['id'], -1) for b in col_burgs], dtype=np.int64)
+        tgt = np.array([transport_costs['cols'].get(b['id'], -1) for b in row_burgs], dtype=np.int64)
+        known_cols, known_rows = np.nonzero(src >= 0)[0], np.nonzero(tgt >= 0)[0]
+        distances = np.full((len(row_burgs), len(col_burgs)), np.inf)
+        with np.errstate(invalid='ignore'):
+            block = round_distances(transport_costs['costs'][np.ix_(src[known_cols], tgt[known_rows])].T.astype(np.float64))
+        distances[np.ix_(known_rows, known_cols)] = block
+    # Avoid division by zero
+    clamped = distances < 1
+    distances = np.where(clamped, 1.0, distances)
+
+    print(f"Distance block: {len(row_burgs)} x {len(col_burgs)}")
+    return {
+        'rows': {b['id']: r for r, b in enumerate(row_burgs)},
+        'cols': {b['id']: c for c, b in enumerate(col_burgs)},
+        'distances': distances,
+        'clamped': clamped,
+        'squared': distances * distances,
+    }
+
+def match_matrix(exporters, importers, burg_lookup, commodity, distance_block, top_k=8):
+    """Single-commodity match_matrix_commodities."""
+    return match_matrix_commodities({commodity: (exporters, importers)}, burg_lookup, distance_block, top_k)[commodity]
+
+def match_matrix_commodities(markets, burg_lookup, distance_block, top_k=8):
+    """
+    Same gravity model matching as match_full_scan for several commodities in one pass over a
+    precomputed distance block. markets maps commodity -> (exporters, importers); returns commodity -> trades.
+    Remaining supplies live in one commodities x exporters array, so each importer's distance row is
+    read once and scored for every commodity it imports with a single array division.
+    Only the top_k best are sorted first; the full stable sort is done only if the importer needs more.
+    Squares are taken as d * d, which can differ from Python's d ** 2 in the last bit, so scores
+    within one ulp of each other may order differently than in the scalar engines (exact ties do not).
+    Importers are expected in burg order, as get_exporters_and_importers returns them.
+    """
+    commodities = list(markets)
+    trades = {commodity: [] for commodity in commodities}
+    rows, cols = distance_block['rows'], distance_block['cols']
+
+    # Block columns are exporting burgs in burg order, so column order is exporter order for every commodity
+    supply = np.zeros((len(commodities), len(cols)))
+    sellers = [{} for _ in commodities]
+    row_importers = {}
+    for c, commodity in enumerate(commodities):
+        exporters, importers = markets[commodity]
+        if not exporters: continue
+        for exporter in exporters:
+            col = cols[exporter['id']]
+            supply[c, col] = exporter['supply']
+            sellers[c][col] = exporter
+        for importer in importers:
+            row_importers.setdefault(rows[importer['id']], []).append((c, importer))
+
+    for row in sorted(row_importers):
+        # Exporters beyond the transport cost cutoff are unreachable
+        reachable = np.isfinite(distance_block['distances'][row])
+        buying = [c for c, _ in row_importers[row]]
+        all_scores = supply[buying] / distance_block['squared'][row]
+
+        for (c, importer), scores in zip(row_importers[row], all_scores):
+            candidates = np.nonzero((supply[c] > 0) & reachable)[0]
+            if len(candidates) == 0:
+                continue
+            scores = scores[candidates]
+
+            # Everything scoring at least the k-th best is a prefix of the full stable descending order
+            if len(candidates) > top_k:
+                kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+                head = np.nonzero(scores >= kth)[0]
+                order = head[np.argsort(-scores[head], kind='stable')]
+            else:
+                order = np.argsort(-scores, kind='stable')
+
+            commodity = commodities[c]
+            consumed = consume_in_order(order, candidates, sellers[c], importer, supply[c], row, burg_lookup, commodity, distance_block, trades[commodity])
+            if importer['demand'] > 0 and len(order) < len(candidates):
+                order = np.argsort(-scores, kind='stable')[consumed:]
+                consume_in_order(order, candidates, sellers[c], importer, supply[c], row, burg_lookup, commodity, distance_block, trades[commodity])
+
+    return trades
+
+def consume_in_order(order, candidates, sellers, importer, supply, row, burg_lookup, commodity, distance_block, trades):
+    """
+    Greedy consumption along a score order over block columns (sellers maps column -> exporter).
+    Returns how many positions of `order` were visited.
+    """
+    visited = 0
+    for pos in order:
+        if importer['demand'] <= 0: break
+        visited += 1
+
+        col = candidates[pos]
+        exporter = sellers[col]
+        amount = min(importer['demand'], exporter['supply'])
+
+        if amount > 0:
+            dist = 1 if distance_block['clamped'][row, col] else float(distance_block['distances'][row, col])
+            trades.append(make_trade(exporter, importer, burg_lookup, commodity, amount, dist))
+
+            importer['demand'] -= amount
+            exporter['supply'] -= amount
+            supply[col] = exporter['supply']
+    return visited
+
+def update_active_cell(grid, exporters, e):
+    """Drops exporter e from its cell once exhausted and refreshes the cell's supply bound."""
+    index, active, cell_max_supply = grid['index'], grid['active'], grid['cell_max_supply']
+    x, y = index['points'][e]
+    key = spatial_index.get_cell_key(index, x, y)
+    members = active[key]
+    if exporters[e]['supply'] <= 0:
+        members.remove(e)
+    if members:
+        cell_max_supply[key] = max(exporters[m]['supply'] for m in members)
+    else:
+        del active[key]
+        del cell_max_supply[key]
+
+def resimulate_trade(burgs, previous_trades, changed_ids, commodities=None, transport_costs=None):
+    """
+    Incremental version of the greedy simulate_trade for what-if sessions.
+    burgs: current burgs; previous_trades: greedy result before the change (same transport_costs);
+    changed_ids: ids of burgs whose net_production_burg changed since then.
+    Returns exactly what a full greedy rerun would, but only re-matches the importers whose
+    decision can have changed; every other importer keeps its previous trades.
+
+    Replaying importers in order, an exporter is "dirty" while its remaining supply may differ
+    from the previous run (changed burgs, and anything consumed differently by a re-matched importer).
+    An unchanged importer must be re-matched if it previously took from a dirty exporter, or if a dirty
+    exporter now scores at least as high as the last exporter it took from (any dirty exporter with
+    supply, if its demand was not met).
+    """
+    print(f"--- Re-simulating Trade ({len(changed_ids)} changed burgs) ---")
+    changed_ids = set(changed_ids)
+    burg_lookup = {b['id']: b for b in burgs}
+    commodities = commodities or get_burg_commodities(burgs)
+    trades = []
+    
+    for commodity in commodities:
+        exporters, importers = get_exporters_and_importers(burgs, commodity)
+        exporter_lookup = {e['id']: e for e in exporters}
+        grid = build_exporter_grid(exporters, burg_lookup) if exporters else None
+        
+        previous_by_importer = {}
+        for t in previous_trades:
+            if t['Commodity'] == commodity:
+                previous_by_importer.setdefault(t['To_ID'], []).append(t)
+        
+        # Remaining supply of unchanged exporters as it was in the previous run
+        previous_supply = {e['id']: e['supply'] for e in exporters if e['id'] not in changed_ids}
+        dirty = set(changed_ids)
+        rematched = 0
+        
+        importer_lookup = {i['id']: i for i in importers}
+        for burg in burgs:
+            previous = previous_by_importer.get(burg['id'], [])
+            importer = importer_lookup.get(burg['id'])
             
-            # Sort by score (highest first)
-            scores.sort(key=lambda x: x['score'], reverse=True)
+            if importer is None:
+                # No longer an importer: whatever it took before is available again
+                dirty.update(t['From_ID'] for t in previous)
+            elif not importer_needs_rematch(importer, previous, previous_supply, dirty, exporter_lookup, burg_lookup, changed_ids, transport_costs):
+                # Same inputs as last time, so the same decision
+                for t in previous:
+                    exporter_lookup[t['From_ID']]['supply'] -= t['Amount']
+                    importer['demand'] -= t['Amount']
+                    update_active_cell(grid, exporters, grid['positions'][t['From_ID']])
+                trades.extend(previous)
+            else:
+                rematched += 1
+                new = fulfill_importer_spatial(importer, exporters, grid, burg_lookup, commodity, transport_costs) if grid else []
+                dirty.update(get_changed_suppliers(previous, new))
+                trades.extend(new)
             
-            # Fulfill demand
-            for match in scores:
-                if importer['demand'] <= 0: break
-                
-                exporter = match['exporter']
-                
-                # Greedy consumption: take as much as possible from this exporter
-                amount = min(importer['demand'], exporter['supply'])
-                
-                if amount > 0:
-                    trades.append({
-                        'From_ID': exporter['id'],
-                        'From_Name': burg_lookup[exporter['id']]['name'],
-                        'To_ID': importer['id'],
-                        'To_Name': burg_lookup[importer['id']]['name'],
-                        'Commodity': commodity,
-                        'Amount': amount,
-                        'Distance': match['distance']
-                    })
-                    
-                    importer['demand'] -= amount
-                    exporter['supply'] -= amount
+            for t in previous:
+                if t['From_ID'] in previous_supply:
+                    previous_supply[t['From_ID']] -= t['Amount']
         
+        print(f"{commodity}: re-matched {rematched} of {len(importers)} importers")
+    
     return trades
+
+def get_changed_suppliers(previous, new):
+    """Exporters from which an importer now takes a different amount than before."""
+    taken = {}
+    for t in previous:
+        taken[t['From_ID']] = taken.get(t['From_ID'], 0) + t['Amount']
+    for t in new:
+        taken[t['From_ID']] = taken.get(t['From_ID'], 0) - t['Amount']
+    return [exporter_id for exporter_id, difference in taken.items() if difference != 0]
+
+def importer_needs_rematch(importer, previous, previous_supply, dirty, exporter_lookup, burg_lookup, changed_ids, transport_costs=None):
+    """Whether dirty exporters could change this importer's greedy decision (see resimulate_trade)."""
+    if importer['id'] in changed_ids:
+        return True
+    if any(t['From_ID'] in dirty for t in previous):
+        return True
+    
+    dirty_exporters = [exporter_lookup[d] for d in dirty if d in exporter_lookup and exporter_lookup[d]['supply'] > 0]
+    if not dirty_exporters:
+        return False
+    
+    # Score of the last exporter taken from, with the supply it had at the time
+    demand_met = sum(t['Amount'] for t in previous) >= importer['original_demand'] - 1e-9
+    last_score = 0
+    if previous and demand_met:
+        last = previous[-1]
+        last_score = previous_supply[last['From_ID']] / (last['Distance'] ** 2)
+    
+    importer_burg = burg_lookup[importer['id']]
+    for exporter in dirty_exporters:
+        dist = get_trade_distance(importer_burg, burg_lookup[exporter['id']], transport_costs)
+        if dist == math.inf: continue
+        if dist < 1: dist = 1
+        if exporter['supply'] / (dist ** 2) >= last_score:
+            return True
+    return False
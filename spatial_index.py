@@ -0,0 +1,107 @@
+import math
+
+def build_grid_index(points, cell_size=None, points_per_cell=4):
+    """
+    Buckets points (list of (x, y) tuples) into a uniform grid.
+    If no cell_size is given, it is chosen so that each grid cell holds about `points_per_cell` points.
+    Returns a dict describing the grid; buckets hold indices into `points`.
+    """
+    if not points:
+        return {'cell_size': 1.0, 'min_x': 0.0, 'min_y': 0.0, 'nx': 0, 'ny': 0, 'cells': {}, 'points': []}
+
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(ys), max(ys)
+
+    if cell_size is None:
+        area = max(max_x - min_x, 1.0) * max(max_y - min_y, 1.0)
+        cell_size = math.sqrt(area * points_per_cell / len(points))
+    cell_size = max(cell_size, 1e-9)
+
+    nx = int((max_x - min_x) / cell_size) + 1
+    ny = int((max_y - min_y) / cell_size) + 1
+
+    cells = {}
+    for idx, (x, y) in enumerate(points):
+        key = (int((x - min_x) / cell_size), int((y - min_y) / cell_size))
+        cells.setdefault(key, []).append(idx)
+
+    return {'cell_size': cell_size, 'min_x': min_x, 'min_y': min_y, 'nx': nx, 'ny': ny, 'cells': cells, 'points': points}
+
+
+def get_cell_key(index, x, y):
+    """Grid coordinates of the cell containing (x, y). May lie outside the grid."""
+    return (math.floor((x - index['min_x']) / index['cell_size']), math.floor((y - index['min_y']) / index['cell_size']))
+
+
+def get_max_ring(index, x, y):
+    """Largest Chebyshev ring around (x, y) that still touches the grid."""
+    ci, cj = get_cell_key(index, x, y)
+    return max(ci, index['nx'] - 1 - ci, cj, index['ny'] - 1 - cj, 0)
+
+
+def iter_ring_cells(index, x, y, ring):
+    """Yields the keys of the non-empty grid cells at Chebyshev distance `ring` from the cell of (x, y)."""
+    ci, cj = get_cell_key(index, x, y)
+    cells = index['cells']
+    if ring == 0:
+        if (ci, cj) in cells: yield (ci, cj)
+        return
+
+    for i in range(ci - ring, ci + ring + 1):
+        for j in (cj - ring, cj + ring):
+            if (i, j) in cells: yield (i, j)
+    for j in range(cj - ring + 1, cj + ring):
+        for i in (ci - ring, ci + ring):
+            if (i, j) in cells: yield (i, j)
+
+
+def get_ring_min_distance(index, ring):
+    """Lower bound on the distance from a point to any point in a cell `ring` rings away."""
+    return max(0, ring - 1) * index['cell_size']
+
+
+def get_cell_min_distance(index, key, x, y):
+    """Euclidean distance from (x, y) to the closest point of the rectangle of grid cell `key`."""
+    cs = index['cell_size']
+    x0 = index['min_x'] + key[0] * cs
+    y0 = index['min_y'] + key[1] * cs
+    dx = max(x0 - x, 0, x - (x0 + cs))
+    dy = max(y0 - y, 0, y - (y0 + cs))
+    return math.sqrt(dx * dx + dy * dy)
+
+
+def query_radius(index, x, y, radius):
+    """Indices of all indexed points within `radius` of (x, y), in ascending index order."""
+    found = []
+    r2 = radius * radius
+    max_ring = min(get_max_ring(index, x, y), int(radius / index['cell_size']) + 1)
+    for ring in range(max_ring + 1):
+        for key in iter_ring_cells(index, x, y, ring):
+            if get_cell_min_distance(index, key, x, y) > radius: continue
+            for idx in index['cells'][key]:
+                px, py = index['points'][idx]
+                if (px - x) ** 2 + (py - y) ** 2 <= r2:
+                    found.append(idx)
+    return sorted(found)
+
+
+def query_nearest(index, x, y, k, exclude=None):
+    """
+    Indices of the k indexed points closest to (x, y), nearest first (ties by index).
+    `exclude` is an optional index to skip (e.g. the query point itself).
+    """
+    best = []
+    max_ring = get_max_ring(index, x, y)
+    for ring in range(max_ring + 1):
+        # Stop once the k-th best is closer than anything still unvisited
+        if len(best) >= k and best[k - 1][0] < get_ring_min_distance(index, ring):
+            break
+        for key in iter_ring_cells(index, x, y, ring):
+            for idx in index['cells'][key]:
+                if idx == exclude: continue
+                px, py = index['points'][idx]
+                best.append((math.sqrt((px - x) ** 2 + (py - y) ** 2), idx))
+        best.sort()
+    return [idx for _, idx in best[:k]]
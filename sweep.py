@@ -0,0 +1,239 @@
+import concurrent.futures
+import contextlib
+import copy
+import glob
+import io
+import itertools
+import json
+import os
+import re
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import burg_table
+import market_prices
+import simulate_economy
+import simulate_trade
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(BASE_DIR, 'fantasy_maps')
+OUTPUT_DIR = os.path.join(BASE_DIR, 'fantasy_worlds')
+SWEEP_INFO_FILE = "info/sweep_info.json" # Parameter -> list of values, {"range": [start, stop, steps]}, {"uniform": [low, high]} or {"normal": [mean, sd]}
+SWEEP_SAMPLES = 200 # Variants drawn when any parameter has a distribution (otherwise every grid combination runs)
+SWEEP_SEED = 0
+SWEEP_WORKERS = os.cpu_count() or 1
+
+# Parameters are addressed by path: "citizens.<Citizen>.<key>" or "economy.<key>.<key>..."
+def get_parameter_parent(config, path):
+    """The dict holding a parameter and its key. Raises KeyError for paths that do not exist in the config."""
+    parts = path.split('.')
+    if parts[0] == 'citizens':
+        node = next((c for c in config.get('citizens', []) if c.get('Citizen') == parts[1]), None)
+        if node is None:
+            raise KeyError(f"Unknown citizen in sweep parameter {path}")
+        parts = parts[2:]
+    else:
+        node = config
+    for part in parts[:-1]:
+        node = node[part]
+    if parts[-1] not in node:
+        raise KeyError(f"Unknown sweep parameter {path}")
+    return node, parts[-1]
+
+def apply_variant(config, variant):
+    """Copy of the config with the variant's parameter values set."""
+    config = copy.deepcopy(config)
+    for path, value in variant.items():
+        node, key = get_parameter_parent(config, path)
+        node[key] = value
+    return config
+
+def get_grid_values(spec):
+    """Values of a grid parameter (a list, or an evenly spaced range), None for distributions."""
+    if isinstance(spec, list):
+        return spec
+    if 'range' in spec:
+        start, stop, steps = spec['range']
+        return np.linspace(start, stop, int(steps)).tolist()
+    return None
+
+def draw_value(spec, rng):
+    grid = get_grid_values(spec)
+    if grid is not None:
+        return grid[rng.integers(len(grid))]
+    if 'uniform' in spec:
+        return float(rng.uniform(*spec['uniform']))
+    if 'normal' in spec:
+        return float(rng.normal(*spec['normal']))
+    raise ValueError(f"Unknown sweep distribution: {spec}")
+
+def get_variants(sweep, samples=None, seed=None):
+    """
+    Parameter variants of a sweep: every combination when all parameters are grids,
+    otherwise `samples` Monte Carlo draws (grid parameters are drawn uniformly from their values).
+    """
+    grids = {path: get_grid_values(spec) for path, spec in sweep.items()}
+    if all(values is not None for values in grids.values()):
+        return [dict(zip(grids, values)) for values in itertools.product(*grids.values())]
+
+    rng = np.random.default_rng(SWEEP_SEED if seed is None else seed)
+    samples = SWEEP_SAMPLES if samples is None else samples
+    return [{path: draw_value(spec, rng) for path, spec in sweep.items()} for _ in range(samples)]
+
+
+# SHARED MAP ARRAYS
+def get_map_arrays(burgs, compiled):
+    """Config-independent arrays of a map's burgs: economy inputs plus ids, positions, cells and states (-1 = none)."""
+    arrays = simulate_economy.get_burg_economy_inputs(burgs, compiled)
+    arrays.update({
+        'id': np.array([b.get('i') for b in burgs], dtype=np.int64),
+        'x': np.array([b.get('x') for b in burgs], dtype=np.float64),
+        'y': np.array([b.get('y') for b in burgs], dtype=np.float64),
+        'cell': np.array([-1 if b.get('cell') is None else b.get('cell') for b in burgs], dtype=np.int64),
+        'state': np.array([-1 if b.get('state') is None else b.get('state') for b in burgs], dtype=np.int64),
+    })
+    return arrays
+
+def share_arrays(arrays):
+    """
+    Copies arrays into shared memory blocks. Returns the blocks (the caller closes and unlinks them)
+    and the descriptors (name -> block name, shape, dtype) that workers attach with.
+    """
+    blocks, descriptors = [], {}
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        descriptors[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, descriptors
+
+def attach_arrays(descriptors):
+    """Read-only NumPy views of shared arrays, plus the attached blocks (keep them alive while the views are used)."""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in descriptors.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        blocks.append(block)
+        arrays[name] = array
+    return blocks, arrays
+
+
+# VARIANTS
+_worker_state = {}
+
+def init_sweep_worker(descriptors, names, state_names, config, settings):
+    """Process pool initializer: attaches the shared map arrays once per worker."""
+    for (module, name), value in settings.items():
+        setattr(globals()[module], name, value)
+    blocks, arrays = attach_arrays(descriptors)
+    _worker_state.update(blocks=blocks, arrays=arrays, names=names, state_names=state_names, config=config)
+
+def run_variant(index, variant):
+    """Economy (plus market clearing if enabled) and trade of one variant. Returns its summary row and per-state rows."""
+    state = _worker_state
+    arrays = state['arrays']
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        compiled = simulate_economy.compile_citizen_config(apply_variant(state['config'], variant))
+        economy = simulate_economy.get_burg_economy_arrays(None, compiled, arrays)
+        commodities = compiled['commodities']
+        net_production = economy['net_production']
+        if market_prices.USE_MARKET_PRICES:
+            net_production, _ = market_prices.clear_markets(net_production, commodities, arrays['population'])
+
+        table = {
+            'n': len(arrays['id']), 'id': arrays['id'], 'name': state['names'], 'x': arrays['x'], 'y': arrays['y'],
+            'cell': [None if c < 0 else c for c in arrays['cell'].tolist()],
+            'state': [None if s < 0 else s for s in arrays['state'].tolist()], 'state_name': state['state_names'],
+            'commodities': commodities, 'net_production': net_production,
+        }
+        trades = simulate_trade.simulate_trade(burg_table.get_trade_burgs(table), commodities, workers=1)
+
+    row = {'variant': index, **variant, 'population': float(arrays['population'].sum())}
+    row.update({c: float(total) for c, total in zip(commodities, net_production.sum(axis=0))})
+    traded = {c: 0.0 for c in commodities}
+    for t in trades:
+        traded[t['Commodity']] += t['Amount']
+    row.update({f"Traded_{c}": amount for c, amount in traded.items()})
+    row.update({'trades': len(trades), 'time_s': round(time.perf_counter() - start, 3)})
+
+    # Per-state balances (burgs without a state are left out)
+    has_state = arrays['state'] >= 0
+    states, codes = np.unique(arrays['state'][has_state], return_inverse=True)
+    population = np.bincount(codes, weights=arrays['population'][has_state], minlength=len(states))
+    balances = [np.bincount(codes, weights=net_production[has_state, k], minlength=len(states)) for k in range(len(commodities))]
+    state_rows = [{'variant': index, 'state_id': int(s), 'population': float(population[i]),
+                   **{c: float(balances[k][i]) for k, c in enumerate(commodities)}}
+                  for i, s in enumerate(states)]
+    return row, state_rows
+
+def run_sweep(burgs, config, variants, states=None, workers=None):
+    """
+    Runs economy + trade for every variant. The map's burg arrays are parsed once and shared with the
+    workers through shared memory. Returns (summary, state_balances) DataFrames, one summary row per variant.
+    Trade uses the configured simulate_trade solver on straight-line distances (no transport cost tables).
+    """
+    workers = SWEEP_WORKERS if workers is None else workers
+    burgs = [b for b in burgs if isinstance(b, dict) and 'name' in b]
+    for variant in variants:
+        apply_variant(config, variant) # Fail early on unknown parameters
+    print(f"--- Sweep: {len(variants)} variants x {len(burgs)} burgs on {workers} workers ---")
+
+    compiled = simulate_economy.compile_citizen_config(config)
+    names = [b.get('name') for b in burgs]
+    probe = {'state': [b.get('state') for b in burgs], 'state_name': None}
+    burg_table.set_state_names(probe, states or [])
+    settings = {('simulate_trade', name): getattr(simulate_trade, name) for name in
+                ('USE_TERRAIN_AND_INFRASTRUCTURE', 'SEA_LANES', 'TRADE_SOLVER', 'TRADE_ENGINE', 'FLOW_CANDIDATES', 'HUB_GROUPING', 'HUB_SIZE')}
+    settings[('market_prices', 'USE_MARKET_PRICES')] = market_prices.USE_MARKET_PRICES
+
+    start = time.perf_counter()
+    blocks, descriptors = share_arrays(get_map_arrays(burgs, compiled))
+    try:
+        initargs = (descriptors, names, probe['state_name'], config, settings)
+        if workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_sweep_worker, initargs=initargs) as pool:
+                results = list(pool.map(run_variant, range(len(variants)), variants, chunksize=max(1, len(variants) // (workers * 4))))
+        else:
+            init_sweep_worker(*initargs)
+            results = [run_variant(i, variant) for i, variant in enumerate(variants)]
+    finally:
+        for block in _worker_state.pop('blocks', []):
+            block.close()
+        _worker_state.clear()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    summary = pd.DataFrame([row for row, _ in results])
+    state_balances = pd.DataFrame([r for _, state_rows in results for r in state_rows])
+    if len(state_balances):
+        state_names = {b.get('state'): name for b, name in zip(burgs, probe['state_name'])}
+        state_balances.insert(2, 'state_name', state_balances['state_id'].map(state_names))
+    print(f"Sweep finished in {time.perf_counter() - start:.1f}s")
+    return summary, state_balances
+
+
+if __name__ == "__main__":
+    sweep = simulate_economy.load_json_file(SWEEP_INFO_FILE) or {}
+    sim_config = simulate_economy.load_simulation_config()
+    variants = get_variants(sweep)
+
+    for filepath in glob.glob(os.path.join(INPUT_DIR, '*.json')):
+        print(f"Sweeping {os.path.basename(filepath)}...")
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        safe_name = re.sub(r'[^\w\-_]', '_', data.get('info', {}).get('mapName', 'Unknown_Map'))
+        map_dir = os.path.join(OUTPUT_DIR, safe_name)
+        os.makedirs(map_dir, exist_ok=True)
+
+        pack = data.get('pack', {})
+        summary, state_balances = run_sweep(pack.get('burgs', []), sim_config, variants, states=pack.get('states', []))
+        summary.to_csv(os.path.join(map_dir, f"{safe_name}_sweep.csv"), index=False)
+        state_balances.to_csv(os.path.join(map_dir, f"{safe_name}_sweep_states.csv"), index=False)
+        print(summary.drop(columns='variant').describe().T[['mean', 'std', 'min', 'max']].to_string())
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import agents
+import simulate_economy
+from test_economy import load_config
+from test_trade_engines import make_lattice_cells
+
+def make_world(config):
+    burgs = [{'i': i, 'name': f"Burg {i}", 'x': 100.0 * (i % 8), 'y': 100.0 * (i // 8), 'type': ['Generic', 'Naval'][i % 2],
+              'state': 1 + i % 2, 'capital': int(i < 3), 'population': 2 + (i * 5 % 13), 'port': 0} for i in range(1, 33)]
+    cells = make_lattice_cells(burgs)
+    table = simulate_economy.get_burg_table(burgs, config)
+    return agents.build_agent_world(cells, table), table
+
+def test_agents_walk_land_and_hash_by_cell():
+    """Agents only stand on land, merchants reach burgs, rulers stay in their state and the spatial hash finds everyone."""
+    world, table = make_world(load_config())
+    population = agents.spawn_agents(world, counts={'merchant': 300, 'adventurer': 100})
+    assert sorted(population['state'][population['role'] == agents.AGENT_ROLES.index('ruler')].tolist()) == [1, 2]
+    gold = population['gold'].sum() + population['inventory'].sum()
+
+    land = set(world['land_cells'].tolist())
+    for _ in range(60):
+        agents.advance_agents(world, population)
+        assert set(population['cell'].tolist()) <= land
+    assert population['stats']['arrivals'] > 300 and population['stats']['trades'] > 0
+    # Robbery moves gold between agents, trade turns gold into cargo and back (plus the margin)
+    assert population['gold'].min() >= 0 and population['gold'].sum() + population['inventory'].sum() >= gold - 1e-3
+
+    rulers = np.nonzero(population['role'] == agents.AGENT_ROLES.index('ruler'))[0]
+    state_cells = {s: {c for c, t in zip(table['cell'], table['state']) if t == s} for s in (1, 2)}
+    assert all(population['goal'][r] in state_cells[population['state'][r]] for r in rulers)
+    for cell in set(population['cell'].tolist()):
+        assert sorted(agents.get_agents_at(population, cell).tolist()) == np.nonzero(population['cell'] == cell)[0].tolist()
+
+def test_hundred_thousand_agents_tick():
+    """A crowd of agents stays on land and the spatial hash holds every one of them once after each tick."""
+    world, _ = make_world(load_config())
+    population = agents.spawn_agents(world, counts={'merchant': 60000, 'adventurer': 40000})
+    land = set(world['land_cells'].tolist())
+    for _ in range(2):
+        agents.advance_agents(world, population)
+        assert set(population['cell'].tolist()) <= land
+        assert np.array_equal(np.sort(population['hash_order']), np.arange(len(population['cell'])))
+        assert np.all(np.diff(population['cell'][population['hash_order']]) >= 0)
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import burg_table
+import catchments
+import cell_graph
+import simulate_economy
+from test_economy import load_config
+from test_trade_engines import make_lattice_cells
+
+TRANSPORT_COSTS = {'Land': 20, 'River': 4, 'Sea': 1}
+
+def make_world(config):
+    burgs = [{'i': i, 'name': f"Burg {i}", 'x': 90.0 * (i % 6), 'y': 70.0 * (i // 6), 'type': 'Generic',
+              'state': 1, 'capital': 0, 'population': [1, 20, 300][i % 3], 'port': 0} for i in range(1, 25)]
+    cells = make_lattice_cells(burgs)
+    for cell in cells:
+        cell['area'] = 2
+    return simulate_economy.get_burg_table(burgs, config), cells
+
+def test_cells_go_to_their_cheapest_burg():
+    """The one multi-source search gives every cell the travel cost of its cheapest burg, as one search per burg would."""
+    table, cells = make_world(load_config())
+    graph = cell_graph.build_cell_graph(cells, TRANSPORT_COSTS)
+    origin, land_cells, land_ha = catchments.get_catchments(table, cells, TRANSPORT_COSTS, hectares_per_area_unit=1)
+
+    per_burg = np.array([cell_graph.dijkstra(graph, [cell])[0] for cell in table['cell']])
+    cost = per_burg[origin, np.arange(graph['n'])]
+    assert np.all(origin >= 0) and np.allclose(cost, per_burg.min(axis=0))
+
+    land = graph['h'] >= cell_graph.WATER_HEIGHT
+    assert land_cells.sum() == land.sum() and land_ha.sum() == 2 * land.sum()
+
+def test_farmland_flags_reach_the_output_burgs():
+    table, cells = make_world(load_config())
+    stats = catchments.apply_catchments(table, cells, TRANSPORT_COSTS, hectares_per_area_unit=1000)
+    farmland_min = table['area_requirements'][:, table['area_keys'].index("Farmland_to_Feed_Burg_ha_Min")]
+    assert np.array_equal(table['farmland_feasible'][:, 0], farmland_min <= table['catchment_ha'])
+    assert 0 < stats['infeasible_min'] < table['n']
+
+    burgs = burg_table.materialize_burgs(table)
+    assert [b['catchment_burg']['Farmland_Feasible_Min'] for b in burgs] == table['farmland_feasible'][:, 0].tolist()
+    assert catchments.get_hectares_per_area_unit({'settings': {'distanceScale': 2, 'distanceUnit': 'km'}}) == 400
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import climate
+import economy_ticks
+import simulate_economy
+from test_economy import load_config
+from test_trade_engines import make_lattice_cells
+
+def make_world(config):
+    burgs = [{'i': i, 'name': f"Burg {i}", 'x': 100.0 * (i % 5), 'y': 100.0 * (i // 5), 'type': 'Generic',
+              'state': 1, 'capital': 0, 'population': 3 + (i * 5 % 13), 'port': 0} for i in range(1, 21)]
+    cells = make_lattice_cells(burgs)
+    for cell in cells:
+        cell.update(t=cell['i'] % 30 - 5, biome=[4, 6, 1, 9][cell['i'] % 4])
+    return simulate_economy.get_burg_table(burgs, config), cells
+
+def test_normal_year_yields_average_one(monkeypatch):
+    """Without weather, summers are warmer than winters and every burg's food yield averages 1 over a year."""
+    monkeypatch.setattr(climate, 'TEMPERATURE_NOISE', 0)
+    monkeypatch.setattr(climate, 'PRECIPITATION_NOISE', 0)
+    config = load_config()
+    table, cells = make_world(config)
+    state = climate.build_climate_state(table, cells)
+
+    yields, temperatures = [], []
+    for tick in range(1, 2 * climate.TICKS_PER_YEAR + 1):
+        yields.append(climate.advance_climate(state, tick).copy())
+        temperatures.append(state['temperature'].copy())
+    yields, temperatures = np.array(yields), np.array(temperatures)
+
+    assert np.all(temperatures[climate.SUMMER_TICK - 1] > temperatures[(climate.SUMMER_TICK + 5) % climate.TICKS_PER_YEAR])
+    grows = state['normal_suitability'][state['burg_cells']] > 0
+    assert grows.any()
+    assert np.allclose(yields.mean(axis=0)[grows], 1)
+    assert np.all(yields[:, ~grows] == 1)
+
+def test_economy_ticks_with_climate_resume_from_checkpoint(tmp_path):
+    config = load_config()
+    table, cells = make_world(config)
+
+    full = economy_ticks.init_tick_state(table, config, climate_state=climate.build_climate_state(table, cells))
+    economy_ticks.run_ticks(full, 30)
+    checkpoint = tmp_path / "economy_checkpoint.npz"
+    economy_ticks.run_ticks(economy_ticks.init_tick_state(table, config, climate_state=climate.build_climate_state(table, cells)), 17, str(checkpoint))
+    resumed = economy_ticks.init_tick_state(table, config, climate_state=climate.build_climate_state(table, cells))
+    assert economy_ticks.load_checkpoint(resumed, str(checkpoint))
+    economy_ticks.run_ticks(resumed, 13)
+
+    assert np.array_equal(full['population'], resumed['population'])
+    assert np.array_equal(full['climate']['temperature'], resumed['climate']['temperature'])
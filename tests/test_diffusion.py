@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import diffusion
+from test_trade_engines import make_lattice_cells
+
+def make_cells():
+    burgs = [{'x': 450.0, 'y': 450.0}]
+    return make_lattice_cells(burgs) # 11 x 11 cells, sea in column 3
+
+def test_sparse_product_matches_dense_matrix():
+    cells = make_cells()
+    matrix = diffusion.build_diffusion_matrix(cells)
+    n = matrix['n']
+    dense = np.zeros((n, n))
+    for row in range(n):
+        for k in range(matrix['indptr'][row], matrix['indptr'][row + 1]):
+            dense[row, matrix['indices'][k]] += matrix['data'][k]
+    assert np.allclose(dense.sum(axis=1), 1)
+
+    x = np.random.default_rng(0).random((n, 3)).astype(np.float32)
+    out = np.zeros_like(x)
+    diffusion.spmv(matrix, x, out, np.zeros_like(x))
+    assert np.allclose(out, dense @ x, atol=1e-6)
+
+def test_cultures_dominate_around_their_seeds():
+    """Each culture dominates the land around its center and burgs; the sea column slows it down."""
+    cells = make_cells()
+    for cell in cells:
+        cell['area'] = 1
+    cultures = [{'i': 0, 'name': "Wildlands"}, {'i': 1, 'name': "West", 'center': 0 + 5 * 11},
+                {'i': 2, 'name': "East", 'center': 10 + 5 * 11, 'expansionism': 2}]
+    burgs = [{'cell': 1 + 2 * 11, 'culture': 1, 'population': 5}]
+    result = diffusion.run_culture_diffusion(cells, cultures, burgs, steps=200)
+
+    dominant = np.array(result['dominant'])
+    assert dominant[0 + 5 * 11] == 1 and dominant[10 + 5 * 11] == 2 and dominant[1 + 2 * 11] == 1
+    assert [g['i'] for g in result['groups']] == [1, 2]
+    assert sum(g['cells'] for g in result['groups']) <= sum(c['h'] >= 20 for c in cells)
+    east = next(g for g in result['groups'] if g['i'] == 2)
+    assert east['cells'] > 11 * 6 # All or nearly all land east of the sea column
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import disasters
+import economy_ticks
+import simulate_economy
+from test_economy import load_config
+from test_trade_engines import make_lattice_cells
+
+def make_world():
+    burgs = [{'i': i, 'name': f"Burg {i}", 'x': 25.0 * (i % 16), 'y': 25.0 * (i // 16), 'type': 'Generic', 'state': 1,
+              'capital': 0, 'population': 1 + i % 13} for i in range(1, 200)]
+    cells = make_lattice_cells(burgs)
+    return simulate_economy.get_burg_table(burgs, load_config()), cells
+
+def test_affected_burgs_match_a_full_scan():
+    """Radius lookups through the spatial indexes find exactly the burgs a scan over all cells and burgs finds."""
+    table, cells = make_world()
+    state = disasters.build_disaster_state(table, cells)
+    cell_of = {c['i']: c for c in cells}
+    x, y = 200.0, 250.0
+
+    for kind in disasters.DISASTER_KINDS:
+        radius = disasters.DISASTERS[kind]['radius']
+        expected = []
+        for row in range(table['n']):
+            cell = cell_of[table['cell'][row]]
+            if kind == 'plague':
+                px, py = table['x'][row], table['y'][row]
+            else:
+                px, py = cell['p']
+            if (px - x) ** 2 + (py - y) ** 2 > radius ** 2: continue
+            if kind == 'flood' and cell['r'] != 1: continue # (200, 250) lies on the river row
+            if kind == 'drought' and cell['h'] < 20: continue
+            expected.append(row)
+        assert disasters.get_affected_burgs(state, kind, x, y) == expected, kind
+
+def test_events_strike_in_order_and_resume_exactly(tmp_path):
+    table, cells = make_world()
+    state = disasters.build_disaster_state(table, cells)
+    state['queue'].clear()
+    disasters.schedule_many(state, [(5, 'drought', 1, 0.0, 0.0, 0.5), (3, 'drought', 1, 0.0, 0.0, 0.5)])
+    disasters.schedule(state, 3, 'flood', 1, 0.0, 0.0, 0.5)
+    assert [(e[0], disasters.DISASTER_KINDS[e[2]]) for e in sorted(state['queue'])] == [(3, 'drought'), (3, 'flood'), (5, 'drought')]
+
+    config = load_config()
+    full = economy_ticks.init_tick_state(table, config, disaster_state=disasters.build_disaster_state(table, cells))
+    economy_ticks.run_ticks(full, 240)
+    assert sum(s['events'] for s in full['disasters']['stats'].values()) > 0
+
+    checkpoint = str(tmp_path / "economy_checkpoint.npz")
+    first = economy_ticks.init_tick_state(table, config, disaster_state=disasters.build_disaster_state(table, cells))
+    economy_ticks.run_ticks(first, 100, checkpoint)
+    resumed = economy_ticks.init_tick_state(table, config, disaster_state=disasters.build_disaster_state(table, cells))
+    assert economy_ticks.load_checkpoint(resumed, checkpoint)
+    economy_ticks.run_ticks(resumed, 140)
+
+    assert np.array_equal(full['population'], resumed['population'])
+    assert full['disasters']['stats'] == resumed['disasters']['stats']
@@ -0,0 +1,57 @@
+import copy
+import os
+import sys
+import numpy as np
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import distance_cache
+import simulate_trade
+from test_trade_engines import load_montreia, make_lattice_cells
+
+def test_cached_runs_reproduce_trades(tmp_path, capsys):
+    """
+    A second run on the same map must hit the cache for both the distance block and the
+    transport cost table, and still produce identical trades.
+    """
+    burgs, snapshot_trades = load_montreia()
+    cells = make_lattice_cells(burgs)
+    costs = {'Land': 20, 'River': 4, 'Sea': 1}
+
+    runs = []
+    for _ in range(2):
+        trades = simulate_trade.simulate_trade(copy.deepcopy(burgs), engine="matrix", cache_dir=str(tmp_path))
+        table = simulate_trade.build_trade_transport_costs(burgs, cells, costs, cache_dir=str(tmp_path))
+        cost_trades = simulate_trade.simulate_trade(copy.deepcopy(burgs), engine="matrix", transport_costs=table, cache_dir=str(tmp_path))
+        runs.append((trades, cost_trades, capsys.readouterr().out.count("Cache hit")))
+
+    assert runs[0][0] == snapshot_trades
+    assert runs[1][0] == runs[0][0]
+    assert runs[1][1] == runs[0][1]
+    assert runs[0][2] == 0
+    assert runs[1][2] == 2
+
+def test_changed_settings_miss_cache(tmp_path):
+    """Changing the terrain settings or the geometry must change the cache key."""
+    burgs, _ = load_montreia()
+    geometry = distance_cache.get_burg_geometry(burgs)
+    key = distance_cache.get_cache_key('distance_block', True, geometry)
+
+    moved = copy.deepcopy(burgs)
+    moved[0]['x'] += 1
+    assert distance_cache.get_cache_key('distance_block', False, geometry) != key
+    assert distance_cache.get_cache_key('distance_block', True, distance_cache.get_burg_geometry(moved)) != key
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Entries beyond the size bound are evicted oldest first."""
+    array = np.zeros(1000)
+    for i, key in enumerate(['a', 'b', 'c']):
+        distance_cache.save_array(str(tmp_path), key, array, max_bytes=20000)
+        os.utime(tmp_path / f"{key}.npy", (i, i))
+
+    distance_cache.save_array(str(tmp_path), 'd', array, max_bytes=20000)
+
+    assert sorted(os.listdir(tmp_path)) == ['c.npy', 'd.npy']
+    assert isinstance(distance_cache.load_array(str(tmp_path), 'c'), np.memmap)
@@ -0,0 +1,73 @@
+import copy
+import json
+import sys
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import burg_table
+import simulate_economy
+
+def load_config():
+    with open(base_dir / "info" / "citizen_info.json", "r", encoding="utf-8") as f:
+        citizens = json.load(f)
+    with open(base_dir / "info" / "economy_info.json", "r", encoding="utf-8") as f:
+        economy = json.load(f)
+    return {'citizens': citizens, 'settlements': [], 'economy': economy}
+
+def test_commodities_are_declared_in_citizen_info():
+    """
+    A new Production_/Consumption_ key in citizen_info.json adds a commodity to every burg's net production,
+    computed from the same quartiers as food and gold.
+    """
+    config = load_config()
+    extended = copy.deepcopy(config)
+    miner = dict(extended['citizens'][0], Citizen='Miner', Base_Frequency=20, Production_Ore=3, Consumption_Ore=0)
+    extended['citizens'].append(miner)
+    for citizen in extended['citizens'][:-1]:
+        citizen['Consumption_Ore'] = -0.5
+
+    burg = {'i': 1, 'name': 'Testburg', 'x': 0, 'y': 0, 'type': 'Generic', 'state': 1, 'capital': 1, 'population': 12.3, 'port': 1}
+    model = simulate_economy.get_burg_models([burg], extended)[0]
+    quartiers = model['quartiers']
+
+    assert simulate_economy.get_commodities(config) == ['Net_Food', 'Net_Gold']
+    assert simulate_economy.get_commodities(extended) == ['Net_Food', 'Net_Gold', 'Net_Ore']
+    assert model['net_production_burg']['Net_Ore'] == 3 * quartiers['Miner'] - 0.5 * (sum(quartiers.values()) - quartiers['Miner'])
+    assert model['net_production_burg']['Net_Food'] == simulate_economy.get_net_production_from_per_quartier_type(
+        simulate_economy.get_net_production_and_consumption_per_quartier_type_for_burg(quartiers, extended))['Net_Food']
+
+def test_vectorized_burg_models_match_scalar_path():
+    """get_burg_models (array engine) must give exactly what get_burg_model computes burg by burg."""
+    config = load_config()
+    types = ['Generic', 'Naval', 'Highland', 'Nomadic', 'Hunting', 'River', 'Lake', None]
+    burgs = [{'i': i, 'name': f"Burg {i}", 'cell': i, 'x': i, 'y': i, 'type': types[i % len(types)], 'state': i % 3,
+              'capital': i % 7 == 0, 'population': [0.0, 0.0025, 1.5, 7.31, 42.9][i % 5] + i / 100,
+              'port': i % 4 == 0, 'citadel': i % 5 == 0, 'church': i % 6 == 0}
+             for i in range(1, 200)]
+
+    models = simulate_economy.get_burg_models(copy.deepcopy(burgs), config)
+
+    assert models == [simulate_economy.get_burg_model(burg, config) for burg in copy.deepcopy(burgs)]
+
+def test_burg_table_materializes_output_burgs():
+    """Burg dicts are only built at output time, with state_id/state_name up front; trade reads flat rows of the table."""
+    config = load_config()
+    burgs = [{'i': i, 'name': f"Burg {i}", 'cell': i, 'x': i * 10.5, 'y': i * 3.25, 'type': 'Generic', 'state': None if i == 3 else i % 3,
+              'capital': int(i == 1), 'population': 2.5 * i} for i in range(1, 10)]
+    states = [{'name': 'Neutrals'}, {'name': 'Alpha'}]
+
+    table = simulate_economy.get_burg_table(copy.deepcopy(burgs), config)
+    burg_table.set_state_names(table, states)
+    output = burg_table.materialize_burgs(table)
+    models = simulate_economy.get_burg_models(copy.deepcopy(burgs), config)
+
+    assert list(output[0])[:8] == ['id', 'name', 'x', 'y', 'type', 'state_id', 'state_name', 'cell']
+    assert [b.get('state_name') for b in output[:4]] == ['Alpha', 'Neutral', None, 'Alpha']
+    assert output[2] == models[2] and 'state' in output[2]
+    assert [{k: v for k, v in b.items() if k not in ('state_id', 'state_name')} for b in output[3:4]] == [{k: v for k, v in models[3].items() if k != 'state'}]
+
+    trade_burgs = burg_table.get_trade_burgs(table)
+    assert 'citizens' not in trade_burgs[0]
+    assert [b['net_production_burg'] for b in trade_burgs] == [b['net_production_burg'] for b in output]
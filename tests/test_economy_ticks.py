@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import economy_ticks
+import simulate_economy
+from test_economy import load_config
+
+def make_table(config):
+    types = ['Generic', 'Naval', 'Highland', 'River']
+    burgs = [{'i': i, 'name': f"Burg {i}", 'cell': i, 'x': float(i), 'y': float(i), 'type': types[i % len(types)], 'state': 1,
+              'capital': 0, 'population': 0.5 + (i * 7 % 23), 'port': i % 3 == 0} for i in range(1, 60)]
+    return simulate_economy.get_burg_table(burgs, config)
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    """Stopping at a checkpoint and resuming gives exactly the state of one long run."""
+    config = load_config()
+    table = make_table(config)
+
+    full = economy_ticks.init_tick_state(table, config)
+    history = economy_ticks.run_ticks(full, 90)
+
+    checkpoint = tmp_path / "economy_checkpoint.npz"
+    first = economy_ticks.init_tick_state(table, config)
+    economy_ticks.run_ticks(first, 40, str(checkpoint), checkpoint_every=25)
+    resumed = economy_ticks.init_tick_state(table, config)
+    assert economy_ticks.load_checkpoint(resumed, str(checkpoint))
+    assert resumed['tick'] == 40
+    economy_ticks.run_ticks(resumed, 50)
+
+    for key in ('population', 'stocks', 'log_factor', 'citizens', 'quartiers', 'net_production'):
+        assert np.array_equal(full[key], resumed[key]), key
+    assert list(history['tick'][[0, -1]]) == [1, 90]
+    assert np.allclose(history['population'][-1], full['population'].sum())
+
+def test_food_shortage_shrinks_population():
+    """Without production, stocks run dry and the starving population of every burg shrinks."""
+    config = load_config()
+    table = make_table(config)
+    initial_population = table['population'].copy()
+    state = economy_ticks.init_tick_state(table, config)
+    state['production_matrix'][:] = 0
+
+    economy_ticks.run_ticks(state, 24)
+    economy_ticks.apply_tick_state(table, state)
+
+    fed = table['quartiers'].sum(axis=1) == 0 # Burgs too small for a quartier neither produce nor consume
+    assert np.all(table['population'][~fed] < initial_population[~fed] * 0.5)
+    assert np.all(table['net_production'] <= 0)
+    assert np.all(state['stocks'] == 0)
+
+def test_rerun_against_finished_checkpoint_keeps_results(tmp_path):
+    """A second run on a checkpoint already at the last tick writes the same table; a changed config starts over."""
+    config = load_config()
+    checkpoint = str(tmp_path / "economy_checkpoint.npz")
+    first = make_table(config)
+    economy_ticks.run_economy_ticks(first, config, ticks=30, checkpoint_path=checkpoint)
+    second = make_table(config)
+    stats, _ = economy_ticks.run_economy_ticks(second, config, ticks=30, checkpoint_path=checkpoint)
+
+    assert stats['start_tick'] == 30
+    assert np.abs(first['net_production']).sum() > 0
+    for key in ('population', 'citizens', 'quartiers', 'net_production', 'area_requirements'):
+        assert np.array_equal(first[key], second[key]), key
+
+    config['economy']['Quartiers']['Min_Inhabitants_Per_Quartier'] += 1
+    stats, _ = economy_ticks.run_economy_ticks(make_table(config), config, ticks=30, checkpoint_path=checkpoint)
+    assert stats['start_tick'] == 0
+
+def test_changed_plugin_settings_are_not_resumed(tmp_path, monkeypatch):
+    """A checkpoint written under other resource or migration settings is ignored, the same settings resume."""
+    import migration
+    import resources
+    from test_resources import make_world
+    config = load_config()
+    table, cells = make_world(config)
+    build = lambda: economy_ticks.init_tick_state(table, config, resource_state=resources.build_resource_state(table, cells, config),
+                                                  migration_graph=migration.build_migration_graph(table, cells))
+    checkpoint = str(tmp_path / "economy_checkpoint.npz")
+    economy_ticks.run_ticks(build(), 10, checkpoint)
+    assert economy_ticks.load_checkpoint(build(), checkpoint)
+
+    monkeypatch.setitem(resources.REGENERATION_RATE, 'soil', 0.5)
+    assert not economy_ticks.load_checkpoint(build(), checkpoint)
+    monkeypatch.undo()
+    monkeypatch.setattr(migration, 'MIGRATION_RATE', 0.02)
+    assert not economy_ticks.load_checkpoint(build(), checkpoint)
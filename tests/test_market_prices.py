@@ -0,0 +1,56 @@
+import copy
+import sys
+import pytest
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import market_prices
+import simulate_trade
+from test_trade_engines import load_montreia
+
+def test_montreia_markets_clear():
+    """
+    After price discovery, every commodity's total supply must match its total demand, and the
+    cleared quantities must drive trade: the greedy matching then trades the whole market
+    (apart from the burgs left with less than trade's 0.01 minimum).
+    """
+    burgs, _ = load_montreia()
+    burgs = copy.deepcopy(burgs)
+
+    stats = market_prices.apply_market_prices(burgs)
+
+    assert stats['converged']
+    for commodity, market in stats['commodities'].items():
+        assert market['supply'] == pytest.approx(market['demand'], rel=1e-3)
+
+    trade_stats = {}
+    simulate_trade.simulate_trade(burgs, stats=trade_stats)
+    for commodity, market in stats['commodities'].items():
+        nets = [b['net_production_burg'].get(commodity, 0) for b in burgs]
+        tradable = min(sum(n for n in nets if n > 0.01), -sum(n for n in nets if n < -0.01))
+        assert trade_stats[commodity]['traded'] == pytest.approx(tradable, rel=1e-6)
+        assert tradable == pytest.approx(market['demand'], rel=1e-2)
+
+def test_scarce_commodity_gets_expensive():
+    """A commodity in short supply must end up priced above 1, an abundant one below."""
+    burgs = [{'id': i, 'net_production_burg': {'Net_Food': 6 if i < 2 else -1, 'Net_Ore': 1 if i < 2 else -1}} for i in range(10)]
+
+    stats = market_prices.apply_market_prices(burgs)
+
+    assert stats['commodities']['Net_Food']['price'] < 1
+    assert stats['commodities']['Net_Ore']['price'] > 1
+
+def test_prices_decide_who_trades():
+    """Exporters with more surplus per inhabitant sell cheaper, so at the cleared price they sell a larger share."""
+    burgs = [{'id': 0, 'population': 1, 'net_production_burg': {'Net_Food': 4}},
+             {'id': 1, 'population': 20, 'net_production_burg': {'Net_Food': 4}},
+             {'id': 2, 'population': 5, 'net_production_burg': {'Net_Food': -4}}]
+
+    stats = market_prices.apply_market_prices(burgs)
+
+    sold = [b['net_production_burg']['Net_Food'] for b in burgs]
+    assert stats['converged']
+    assert sold[0] > 2 * sold[1] > 0
+    assert sold[0] + sold[1] == pytest.approx(-sold[2], rel=1e-3)
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import migration
+import simulate_economy
+from test_economy import load_config
+from test_trade_engines import make_lattice_cells
+
+def make_table(config):
+    burgs = [{'i': i, 'name': f"Burg {i}", 'x': 60.0 * (i % 6), 'y': 60.0 * (i // 6), 'type': ['Generic', 'Naval', 'Highland'][i % 3],
+              'state': 1, 'capital': 0, 'population': 2 + (i * 5 % 17), 'port': i % 2} for i in range(1, 31)]
+    cells = make_lattice_cells(burgs)
+    return simulate_economy.get_burg_table(burgs, config), cells
+
+def test_migration_moves_population_towards_prosperity():
+    """Migration conserves population, only moves it to more prosperous neighbours and keeps the table consistent."""
+    config = load_config()
+    table, cells = make_table(config)
+    graph = migration.build_migration_graph(table, cells)
+    population = table['population'].astype(np.float64)
+    prosperity = migration.get_prosperity(population, table['net_production'])
+
+    weights = migration.get_migration_weights(graph, prosperity)
+    moving = weights > 0
+    assert np.all(prosperity[graph['cols'][moving]] > prosperity[graph['rows'][moving]])
+    assert np.all(np.bincount(graph['rows'], weights=weights, minlength=table['n']) <= migration.MIGRATION_RATE + 1e-12)
+
+    migrated = population.copy()
+    migration.apply_migration(graph, weights, migrated)
+    assert np.isclose(migrated.sum(), population.sum())
+
+    migration.run_migration(table, config, graph, ticks=24)
+    compiled = simulate_economy.compile_citizen_config(config)
+    assert abs(table['population'].sum() - population.sum()) <= table['n']
+    assert np.array_equal(table['quartiers'], table['citizens'] // compiled['inhabitants_per_quartier'])
+    assert np.allclose(table['net_production'], table['quartiers'] @ compiled['commodity_matrix'])
+
+def test_cell_and_nearest_graphs_are_symmetric():
+    config = load_config()
+    table, cells = make_table(config)
+    for graph in (migration.build_cell_region_graph(table, cells), migration.build_nearest_graph(table, k=3)):
+        edges = set(zip(graph['rows'].tolist(), graph['cols'].tolist()))
+        assert edges and all((b, a) in edges for a, b in edges)
+        assert all(a != b for a, b in edges)
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import economy_ticks
+import resources
+import simulate_economy
+from test_economy import load_config
+from test_trade_engines import make_lattice_cells
+
+def make_world(config):
+    burgs = [{'i': i, 'name': f"Burg {i}", 'x': 100.0 * (i % 5), 'y': 100.0 * (i // 5), 'type': ['Generic', 'Naval', 'Hunting'][i % 3],
+              'state': 1, 'capital': 0, 'population': 3 + (i * 5 % 13), 'port': i % 2} for i in range(1, 21)]
+    cells = make_lattice_cells(burgs)
+    for cell in cells:
+        cell.update(area=20, biome=6 if cell['i'] % 2 else 4)
+    return simulate_economy.get_burg_table(burgs, config), cells
+
+def test_harvest_depletes_hinterland_and_regenerates():
+    """Burgs take at most what their hinterland holds, only from their own cells, and stocks grow back towards capacity."""
+    config = load_config()
+    table, cells = make_world(config)
+    state = resources.build_resource_state(table, cells, config, {'Land': 20, 'River': 4, 'Sea': 1})
+    assert np.all(np.bincount(state['burgs'], minlength=table['n'])[[c is not None for c in table['cell']]] > 0)
+
+    quartiers = table['quartiers'].astype(np.float64) * 50 # More demand than the hinterland can give
+    full = state['stock'].copy()
+    yields = resources.draw_resources(state, quartiers)
+    assert np.all((yields >= 0) & (yields <= 1)) and yields.min() < 1
+    assert np.all(state['stock'] <= full) and np.all(state['stock'] >= 0)
+    # A burg's harvest is exactly what left its cells
+    harvested = np.stack([np.bincount(state['burgs'], weights=full[:, r] - state['stock'][:, r], minlength=table['n']) for r in range(len(resources.RESOURCES))], axis=1)
+    assert np.allclose(harvested, np.minimum(state['demand'], state['available']))
+
+    depleted = state['stock'].copy()
+    resources.regenerate_resources(state)
+    assert np.all(state['stock'] >= depleted) and np.all(state['stock'] <= state['capacity'] + 1e-9)
+
+def test_economy_ticks_with_resources_resume_from_checkpoint(tmp_path):
+    config = load_config()
+    table, cells = make_world(config)
+    build = lambda: resources.build_resource_state(table, cells, config)
+
+    full = economy_ticks.init_tick_state(table, config, resource_state=build())
+    economy_ticks.run_ticks(full, 60)
+    checkpoint = tmp_path / "economy_checkpoint.npz"
+    economy_ticks.run_ticks(economy_ticks.init_tick_state(table, config, resource_state=build()), 25, str(checkpoint))
+    resumed = economy_ticks.init_tick_state(table, config, resource_state=build())
+    assert economy_ticks.load_checkpoint(resumed, str(checkpoint))
+    economy_ticks.run_ticks(resumed, 35)
+
+    assert np.array_equal(full['population'], resumed['population'])
+    assert np.array_equal(full['resources']['stock'], resumed['resources']['stock'])
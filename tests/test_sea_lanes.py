@@ -0,0 +1,73 @@
+import copy
+import math
+import sys
+import pytest
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import sea_lanes
+import simulate_trade
+from test_trade_engines import load_montreia, make_lattice_cells
+
+def make_two_seas_map(nx=20, ny=10, step=10):
+    """Lattice with a western and an eastern sea separated by land; coastal land cells get a haven."""
+    cells = []
+    for j in range(ny):
+        for i in range(nx):
+            neighbours = [(i + di) + (j + dj) * nx for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1)) if 0 <= i + di < nx and 0 <= j + dj < ny]
+            cells.append({'i': i + j * nx, 'c': neighbours, 'p': [i * step, j * step], 'h': 10 if i < 3 or i >= nx - 3 else 40})
+    for cell in cells:
+        water = [n for n in cell['c'] if cells[n]['h'] < 20]
+        if cell['h'] >= 20 and water:
+            cell['haven'] = water[0]
+
+    def burg(burg_id, i, j):
+        return {'id': burg_id, 'name': f"Port {burg_id}", 'x': i * step, 'y': j * step, 'cell': i + j * nx}
+    burgs = [burg(1, 3, 1), burg(2, 3, 8), burg(3, nx - 4, 5), burg(4, 10, 5)]
+    return cells, burgs
+
+def test_sea_lanes_only_join_ports_on_the_same_water():
+    cells, burgs = make_two_seas_map()
+
+    lanes = sea_lanes.build_sea_lanes(cells, burgs)
+
+    assert set(lanes['ports']) == {1, 2, 3}
+    assert sea_lanes.get_sea_distance(lanes, 1, 2) == pytest.approx(70)
+    assert sea_lanes.get_sea_distance(lanes, 1, 3) == math.inf
+    assert sea_lanes.get_sea_distance(lanes, 1, 4) == math.inf
+
+def test_calculate_distance_uses_sea_lanes():
+    """Only ports joined by a lane get the sea bonus, over at least the straight-line distance."""
+    cells, burgs = make_two_seas_map()
+
+    simulate_trade.SEA_LANES = sea_lanes.build_sea_lanes(cells, burgs)
+    try:
+        joined = simulate_trade.calculate_distance(burgs[0], burgs[1])
+        apart = simulate_trade.calculate_distance(burgs[0], burgs[2])
+        matrix = simulate_trade.build_distance_matrix(burgs, burgs)
+    finally:
+        simulate_trade.SEA_LANES = None
+
+    assert joined == round(70 * 0.3 * 0.8, 2)
+    assert apart == round(math.dist((30, 10), (160, 50)) * 0.8, 2)
+    assert matrix[0, 1] == joined
+    assert matrix[0, 2] == apart
+
+def test_montreia_trade_engines_agree_with_sea_lanes():
+    burgs, _ = load_montreia()
+    cells = make_lattice_cells(burgs)
+    for cell in cells:
+        water = [n for n in cell['c'] if cells[n]['h'] < 20]
+        if cell['h'] >= 20 and water:
+            cell['haven'] = water[0]
+
+    simulate_trade.SEA_LANES = sea_lanes.build_sea_lanes(cells, burgs)
+    try:
+        trades = {engine: simulate_trade.simulate_trade(copy.deepcopy(burgs), engine=engine) for engine in ["full_scan", "spatial", "matrix"]}
+    finally:
+        simulate_trade.SEA_LANES = None
+
+    assert trades["spatial"] == trades["full_scan"]
+    assert trades["matrix"] == trades["full_scan"]
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import sensitivity
+import simulate_economy
+import sweep
+from test_economy import load_config
+
+def make_burgs():
+    types = ['Generic', 'Naval', 'Highland', 'Hunting'] # No Nomadic: its Craftsman frequency is exactly 0, a kink
+    return [{'i': i, 'name': f"Burg {i}", 'type': types[i % len(types)], 'state': i % 3 or None, 'capital': int(i % 7 == 0),
+             'citadel': int(i % 4 == 0), 'population': 1 + (i * 7 % 19)} for i in range(1, 40)]
+
+def test_gradients_match_finite_differences():
+    """Analytic gradients of every parameter agree with central differences of the smooth economy."""
+    config = load_config()
+    burgs = make_burgs()
+    result = sensitivity.get_sensitivities(burgs, config)
+    parameters = result['parameters']
+    assert {p['kind'] for p in parameters} == {'base', 'type', 'feature', 'commodity', 'quartier'}
+
+    def world_net_production(variant):
+        compiled = simulate_economy.compile_citizen_config(sweep.apply_variant(config, variant))
+        return sensitivity.get_smooth_economy(simulate_economy.get_burg_economy_inputs(burgs, compiled), compiled)[4].sum(axis=0)
+
+    h = 1e-3
+    for p, parameter in enumerate(parameters):
+        if parameter['kind'] != 'commodity' and parameter['value'] == 0:
+            continue # Clipped frequencies only have a one-sided derivative
+        path, value = parameter['parameter'], parameter['value']
+        difference = (world_net_production({path: value + h}) - world_net_production({path: value - h})) / (2 * h)
+        assert np.allclose(result['world'][p], difference, rtol=1e-5, atol=1e-6), path
+    assert np.allclose(result['state'].sum(axis=0), result['world'])
+
+def test_report_is_ranked_by_effect():
+    config = load_config()
+    world, states = sensitivity.get_sensitivity_report(make_burgs(), config, states=[{'name': "Neutrals"}, {'name': "One"}, {'name': "Two"}])
+    assert list(world['rank']) == list(range(1, len(world) + 1))
+    assert np.all(np.diff(world['effect'].abs().to_numpy()) <= 1e-9)
+    assert world['parameter'].str.startswith(('citizens.', 'economy.')).all()
+    assert set(states['state_name'].dropna()) == {"One", "Two"}
+    assert states.groupby('state_id', dropna=False).size().max() <= sensitivity.SENSITIVITY_TOP
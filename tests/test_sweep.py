@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import burg_table
+import simulate_economy
+import simulate_trade
+import sweep
+from test_economy import load_config
+
+def make_burgs():
+    types = ['Generic', 'Naval', 'Highland', 'River']
+    return [{'i': i, 'name': f"Burg {i}", 'cell': i, 'x': (i * 37) % 500, 'y': (i * 53) % 300, 'type': types[i % 4], 'state': i % 3,
+             'capital': int(i % 20 == 0), 'population': 0.5 + (i * 7 % 19), 'port': i % 3 == 0} for i in range(1, 120)]
+
+def test_variants_grid_and_monte_carlo():
+    grid = sweep.get_variants({'citizens.Farmer.Production_Food': {'range': [1, 2, 3]}, 'citizens.Craftsman.Production_Gold': [0.5, 1]})
+    assert len(grid) == 6 and grid[0] == {'citizens.Farmer.Production_Food': 1.0, 'citizens.Craftsman.Production_Gold': 0.5}
+
+    draws = sweep.get_variants({'economy.Quartiers.Max_Inhabitants_Per_Quartier': {'uniform': [900, 1100]}}, samples=5, seed=1)
+    assert len(draws) == 5 and all(900 <= v['economy.Quartiers.Max_Inhabitants_Per_Quartier'] <= 1100 for v in draws)
+
+    with pytest.raises(KeyError):
+        sweep.apply_variant(load_config(), {'citizens.Wizard.Production_Food': 1})
+
+def test_sweep_matches_pipeline_and_workers_agree():
+    """Each variant gives the trade of the normal pipeline run with that config, in-process or on shared memory workers."""
+    config = load_config()
+    burgs = make_burgs()
+    states = [{'name': 'Neutrals'}, {'name': 'Alpha'}, {'name': 'Beta'}]
+    variants = sweep.get_variants({'citizens.Farmer.Production_Food': [1.25, 2.0]})
+
+    summary, state_balances = sweep.run_sweep(burgs, config, variants, states=states, workers=1)
+    parallel, parallel_states = sweep.run_sweep(burgs, config, variants, states=states, workers=2)
+
+    assert summary.drop(columns='time_s').equals(parallel.drop(columns='time_s'))
+    assert state_balances.equals(parallel_states)
+    assert list(state_balances['state_name'][:3]) == ['Neutrals', 'Alpha', 'Beta']
+
+    for row in summary.to_dict('records'):
+        table = simulate_economy.get_burg_table(burgs, sweep.apply_variant(config, variants[row['variant']]))
+        burg_table.set_state_names(table, states)
+        trades = simulate_trade.simulate_trade(burg_table.get_trade_burgs(table))
+        assert row['trades'] == len(trades)
+        assert row['Net_Food'] == pytest.approx(table['net_production'][:, 0].sum())
+        assert row['Traded_Net_Food'] == pytest.approx(sum(t['Amount'] for t in trades if t['Commodity'] == 'Net_Food'))
@@ -0,0 +1,159 @@
+import copy
+import json
+import sys
+import pytest
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import simulate_trade
+
+def load_montreia():
+    with open(base_dir / "tests" / "data" / "Montreia_burgs.json", "r", encoding="utf-8") as f:
+        burgs = json.load(f)
+    with open(base_dir / "tests" / "data" / "Montreia_trade_routes.json", "r", encoding="utf-8") as f:
+        trades = json.load(f)
+    return burgs, trades
+
+@pytest.mark.parametrize("engine", ["full_scan", "spatial", "matrix"])
+def test_montreia_trade_engines_match_snapshot(engine):
+    """
+    Every greedy trade engine must reproduce the saved Montreia trade routes exactly.
+    """
+    burgs, snapshot_trades = load_montreia()
+
+    trades = simulate_trade.simulate_trade(copy.deepcopy(burgs), engine=engine)
+
+    assert trades == snapshot_trades
+
+def make_lattice_cells(burgs, step=50):
+    """Square lattice of land cells covering the burgs, with a river row and a sea column."""
+    nx = int(max(b['x'] for b in burgs) / step) + 2
+    ny = int(max(b['y'] for b in burgs) / step) + 2
+    cells = []
+    for j in range(ny):
+        for i in range(nx):
+            neighbours = [(i + di) + (j + dj) * nx for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1)) if 0 <= i + di < nx and 0 <= j + dj < ny]
+            cells.append({'i': i + j * nx, 'c': neighbours, 'p': [i * step, j * step], 'h': 10 if i == 3 else 40, 'r': 1 if j == 5 else 0})
+    for b in burgs:
+        b['cell'] = round(b['x'] / step) + round(b['y'] / step) * nx
+    return cells
+
+def test_montreia_trade_engines_agree_with_transport_costs():
+    """
+    With a cell-graph transport cost table, all greedy engines must still produce identical trades.
+    """
+    burgs, _ = load_montreia()
+    cells = make_lattice_cells(burgs)
+    transport_costs = simulate_trade.build_trade_transport_costs(burgs, cells, {'Land': 20, 'River': 4, 'Sea': 1})
+
+    trades = {engine: simulate_trade.simulate_trade(copy.deepcopy(burgs), engine=engine, transport_costs=transport_costs)
+              for engine in ["full_scan", "spatial", "matrix"]}
+
+    assert trades["full_scan"]
+    assert trades["spatial"] == trades["full_scan"]
+    assert trades["matrix"] == trades["full_scan"]
+
+def test_montreia_flow_solver_beats_greedy():
+    """
+    The min-cost flow solver must deliver the same volume as the greedy matching at no higher
+    transport cost, using the same trade record shape.
+    """
+    burgs, snapshot_trades = load_montreia()
+
+    greedy_stats, flow_stats = {}, {}
+    simulate_trade.simulate_trade(copy.deepcopy(burgs), stats=greedy_stats)
+    trades = simulate_trade.simulate_trade(copy.deepcopy(burgs), solver="flow", stats=flow_stats)
+
+    assert trades
+    assert all(t.keys() == snapshot_trades[0].keys() for t in trades)
+    for commodity, stats in flow_stats.items():
+        assert stats['traded'] == pytest.approx(greedy_stats[commodity]['traded'])
+        assert stats['objective'] <= greedy_stats[commodity]['objective']
+
+def test_montreia_incremental_trade_matches_full_rerun():
+    """
+    Re-simulating after a few burgs change must give the same trades as a full greedy rerun.
+    """
+    burgs, snapshot_trades = load_montreia()
+
+    changes = {1: {'Net_Food': 12.0, 'Net_Gold': -3.0}, 50: {'Net_Food': -8.0, 'Net_Gold': 0}, 200: {'Net_Food': 0, 'Net_Gold': 4.5}}
+    for burg in burgs:
+        if burg['id'] in changes:
+            burg['net_production_burg'] = changes[burg['id']]
+
+    full = simulate_trade.simulate_trade(copy.deepcopy(burgs))
+    incremental = simulate_trade.resimulate_trade(copy.deepcopy(burgs), snapshot_trades, changes.keys())
+
+    assert incremental == full
+
+@pytest.mark.parametrize("grouping", ["state", "grid"])
+def test_montreia_hub_solver_trades_full_volume(grouping):
+    """
+    The hub solver must trade the same volume as the greedy matching without any burg
+    exporting more than its surplus or importing more than its deficit.
+    """
+    burgs, _ = load_montreia()
+
+    greedy_stats, hub_stats = {}, {}
+    simulate_trade.simulate_trade(copy.deepcopy(burgs), stats=greedy_stats)
+    simulate_trade.HUB_GROUPING = grouping
+    try:
+        trades = simulate_trade.simulate_trade(copy.deepcopy(burgs), solver="hub", stats=hub_stats)
+    finally:
+        simulate_trade.HUB_GROUPING = "state"
+
+    for commodity, stats in hub_stats.items():
+        assert stats['traded'] == pytest.approx(greedy_stats[commodity]['traded'])
+
+    burg_lookup = {b['id']: b for b in burgs}
+    exported, imported = {}, {}
+    for t in trades:
+        exported[(t['From_ID'], t['Commodity'])] = exported.get((t['From_ID'], t['Commodity']), 0) + t['Amount']
+        imported[(t['To_ID'], t['Commodity'])] = imported.get((t['To_ID'], t['Commodity']), 0) + t['Amount']
+    for (burg_id, commodity), amount in exported.items():
+        assert amount <= burg_lookup[burg_id]['net_production_burg'][commodity] + 1e-9
+    for (burg_id, commodity), amount in imported.items():
+        assert amount <= -burg_lookup[burg_id]['net_production_burg'][commodity] + 1e-9
+
+def test_montreia_many_commodities_batched_matrix_matches_full_scan():
+    """
+    With extra commodities, the batched matrix pass must give the same trades as matching
+    each commodity on its own with the full scan.
+    """
+    burgs, _ = load_montreia()
+    for i, burg in enumerate(burgs):
+        net = burg['net_production_burg']
+        net['Net_Ore'] = [-2, 0, 3, -1, 0.5][i % 5]
+        net['Net_Timber'] = net['Net_Food'] - net['Net_Gold']
+
+    full_scan = simulate_trade.simulate_trade(copy.deepcopy(burgs), engine="full_scan")
+    matrix = simulate_trade.simulate_trade(copy.deepcopy(burgs), engine="matrix")
+
+    assert {t['Commodity'] for t in full_scan} == {'Net_Food', 'Net_Gold', 'Net_Ore', 'Net_Timber'}
+    assert matrix == full_scan
+
+@pytest.mark.parametrize("solver", ["greedy", "flow", "hub"])
+def test_montreia_parallel_trade_matches_serial(solver):
+    """Matching commodities in a process pool must give exactly the serial trades."""
+    burgs, _ = load_montreia()
+
+    serial = simulate_trade.simulate_trade(copy.deepcopy(burgs), solver=solver)
+    parallel = simulate_trade.simulate_trade(copy.deepcopy(burgs), solver=solver, workers=2)
+
+    assert parallel == serial
+
+def test_montreia_parallel_regions_match_serial():
+    """With a short transport cutoff the map splits into regions; matching them apart must not change the trades."""
+    burgs, _ = load_montreia()
+    cells = make_lattice_cells(burgs)
+    graph = simulate_trade.cell_graph.build_cell_graph(cells, {'Land': 20, 'River': 4, 'Sea': 1})
+    importing, exporting = simulate_trade.get_trading_burgs(burgs, ['Net_Food', 'Net_Gold'])
+    transport_costs = simulate_trade.cell_graph.build_transport_cost_table(graph, exporting, importing, cutoff=150)
+
+    serial = simulate_trade.simulate_trade(copy.deepcopy(burgs), transport_costs=transport_costs)
+    parallel = simulate_trade.simulate_trade(copy.deepcopy(burgs), transport_costs=transport_costs, workers=2)
+
+    assert len(simulate_trade.get_trade_regions(transport_costs)) > 1
+    assert parallel == serial
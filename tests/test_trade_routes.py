@@ -0,0 +1,64 @@
+import copy
+import sys
+import numpy as np
+import pytest
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import cell_graph
+import trade_routes
+from test_trade_engines import load_montreia, make_lattice_cells
+
+TRANSPORT_COSTS = {'Land': 20, 'River': 4, 'Sea': 1}
+
+def route_one_at_a_time(graph, burgs, trades):
+    """Reference: walk every trade's path separately."""
+    cell_of = {b['id']: b['cell'] for b in burgs}
+    arc_flow = np.zeros(len(graph['indices']))
+    for t in trades:
+        source, cell = cell_of[t['From_ID']], cell_of[t['To_ID']]
+        _, _, predecessor = cell_graph.dijkstra(graph, [source])
+        while cell != source:
+            arc_flow[trade_routes.find_arcs(graph, [predecessor[cell]], [cell])[0]] += t['Amount']
+            cell = predecessor[cell]
+    return arc_flow
+
+def test_montreia_tree_routing_matches_single_paths():
+    """Accumulating routes per source tree must give the same edge flows as routing each trade alone."""
+    burgs, trades = load_montreia()
+    cells = make_lattice_cells(burgs)
+    graph = trade_routes.prepare_route_graph(cell_graph.build_cell_graph(cells, TRANSPORT_COSTS))
+
+    arc_flow = trade_routes.assign_trade_routes(graph, burgs, trades)
+
+    assert arc_flow.sum() > 0
+    assert np.allclose(arc_flow, route_one_at_a_time(graph, burgs, trades))
+    corridors = trade_routes.get_corridors(graph, arc_flow)
+    assert corridors[0]['Flow'] == max(c['Flow'] for c in corridors)
+
+def test_montreia_congested_trade_delivers_full_volume():
+    """Re-matching with congested edge costs must keep delivering the full volume."""
+    burgs, _ = load_montreia()
+    cells = make_lattice_cells(burgs)
+
+    stats = {}
+    trades, graph, arc_flow = trade_routes.simulate_congested_trade(copy.deepcopy(burgs), cells, TRANSPORT_COSTS, stats=stats)
+
+    assert trades
+    assert len(arc_flow) == len(graph['indices'])
+    for commodity_stats in stats.values():
+        assert commodity_stats['traded'] == pytest.approx(min(commodity_stats['supply'], commodity_stats['demand']))
+
+def test_zero_cost_edges_keep_child_volume():
+    """Cells reached over zero-cost edges tie their parent's cost and must still pass their volume up."""
+    cells = [{'i': i, 'c': [j for j in (i - 1, i + 1) if 0 <= j < 4], 'p': [min(i, 1) * 10, 0], 'h': 40} for i in range(4)]
+    burgs = [{'id': i + 1, 'cell': i} for i in range(4)]
+    trades = [{'From_ID': 1, 'To_ID': i + 1, 'Amount': i} for i in range(1, 4)]
+    graph = trade_routes.prepare_route_graph(cell_graph.build_cell_graph(cells, TRANSPORT_COSTS))
+
+    arc_flow = trade_routes.assign_trade_routes(graph, burgs, trades)
+
+    assert arc_flow[trade_routes.find_arcs(graph, [0], [1])[0]] == 6
+    assert np.allclose(arc_flow, route_one_at_a_time(graph, burgs, trades))
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+base_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base_dir))
+
+import simulate_economy
+import war
+from test_economy import load_config
+
+def make_world(config):
+    # State 1 is at war with 2 and 3; state 2 and 3 are neutral to each other
+    states = [{'i': 0, 'name': "Neutrals"},
+              {'i': 1, 'name': "Strong", 'diplomacy': ['x', 'x', 'Enemy', 'Enemy']},
+              {'i': 2, 'name': "Weak", 'diplomacy': ['x', 'Enemy', 'x', 'Neutral']},
+              {'i': 3, 'name': "Weaker", 'diplomacy': ['x', 'Enemy', 'Neutral', 'x']}]
+    burgs = [{'i': i, 'name': f"Burg {i}", 'x': float(i), 'y': 0.0, 'type': 'Generic', 'state': [1, 1, 1, 2, 3, 0][i % 6],
+              'capital': int(i < 6), 'citadel': 1, 'population': 5 + (i * 3 % 11), 'port': 0} for i in range(1, 61)]
+    table = simulate_economy.get_burg_table(burgs, config)
+    table['state_name'] = [states[s]['name'] for s in table['state']]
+    return states, table
+
+def test_hostility_matrix_is_symmetric_and_skips_neutrals():
+    states, _ = make_world(load_config())
+    states[2]['diplomacy'][1] = 'Suspicion' # One side declaring war is enough
+    hostile = war.get_hostility_matrix(states)
+    assert np.array_equal(hostile, hostile.T)
+    assert {tuple(p) for p in np.argwhere(np.triu(hostile)).tolist()} == {(1, 2), (1, 3)}
+
+def test_map_without_states_has_no_wars():
+    config = load_config()
+    _, table = make_world(config)
+    owners = list(table['state'])
+    assert war.get_hostility_matrix([]).shape == (0, 0)
+    stats = war.run_war(table, [], config, ticks=10)
+    assert not stats['conquests'] and list(table['state']) == owners
+
+def test_war_conquers_burgs_and_kills_soldiers():
+    """The stronger state takes its enemies' burgs, capitals last; neutrals keep theirs."""
+    config = load_config()
+    states, table = make_world(config)
+    population = table['population'].sum()
+    neutral_rows = [i for i, s in enumerate(table['state']) if s == 0]
+
+    stats = war.run_war(table, states, config, ticks=2000)
+
+    assert stats['conquests'] and all(new == 1 for _, _, _, new in stats['conquests'])
+    assert stats['burgs'][1] > 30 and stats['burgs'][0] == len(neutral_rows)
+    assert all(table['state'][i] == 0 for i in neutral_rows)
+    assert all(table['state_name'][i] == states[s]['name'] for i, s in enumerate(table['state']))
+    assert table['population'].sum() < population and stats['casualties'] > 0
+    # Capitals fall after every other burg of their state
+    fallen = {}
+    for tick, burg_id, old, _ in stats['conquests']:
+        fallen.setdefault(old, []).append(burg_id)
+    for old, burg_ids in fallen.items():
+        capitals = [j for j, burg_id in enumerate(burg_ids) if burg_id < 6]
+        assert not capitals or capitals[0] >= len(burg_ids) - len(capitals)
@@ -0,0 +1,109 @@
+import heapq
+import math
+
+EPSILON = 1e-9
+
+def solve_min_cost_flow(supplies, demands, edges):
+    """
+    Solves the transportation problem with successive shortest paths (Dijkstra with node potentials).
+    supplies: list of supply amounts (one per source)
+    demands: list of demand amounts (one per sink)
+    edges: list of (source_index, sink_index, cost) with uncapacitated, non-negative cost
+    Ships as much as possible (max flow) at minimum total cost.
+    Returns (flows, objective) where flows maps (source_index, sink_index) -> amount.
+
+    Sources are added one at a time, each augmenting along shortest residual paths to the
+    nearest open sink until it is empty. Potentials keep every reduced cost non-negative,
+    so each step stays optimal and searches stay local to the source.
+    Every source can also dump its supply on an overflow arc costlier than any real path,
+    so all supply is always shipped and the cheapest real flow is the maximum one.
+    """
+    # Searches end at the first open sink, so grow them from the side with fewer terminals
+    if len(demands) < len(supplies):
+        flows, objective = solve_min_cost_flow(demands, supplies, [(t, s, c) for s, t, c in edges])
+        return {(s, t): amount for (t, s), amount in flows.items()}, objective
+
+    n_sources, n_sinks = len(supplies), len(demands)
+    # Node layout: 0..n_sources-1 = sources, then sinks, last = super sink
+    super_sink = n_sources + n_sinks
+    n = super_sink + 1
+
+    # Residual graph as parallel lists of arcs; arc k ^ 1 is the reverse of arc k
+    head, cap, cost, adj = [], [], [], [[] for _ in range(n)]
+
+    def add_arc(u, v, capacity, arc_cost):
+        adj[u].append(len(head)); head.append(v); cap.append(capacity); cost.append(arc_cost)
+        adj[v].append(len(head)); head.append(u); cap.append(0.0); cost.append(-arc_cost)
+
+    for s, t, edge_cost in edges:
+        add_arc(s, n_sources + t, math.inf, edge_cost)
+    last_edge_arc = len(head)
+    for t, demand in enumerate(demands):
+        add_arc(n_sources + t, super_sink, demand, 0.0)
+    overflow_cost = 1.0 + sum(c for _, _, c in edges)
+    for s, supply in enumerate(supplies):
+        add_arc(s, super_sink, supply, overflow_cost)
+
+    potential = [0.0] * n
+    objective = 0.0
+
+    for source, supply in enumerate(supplies):
+        remaining = supply
+        while remaining > EPSILON:
+            # Dijkstra on reduced costs, stopping as soon as the super sink is settled
+            dist = {source: 0.0}
+            parent_arc = {}
+            settled = []
+            done = set()
+            heap = [(0.0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if u in done: continue
+                done.add(u)
+                settled.append(u)
+                if u == super_sink: break
+                pu = potential[u]
+                for k in adj[u]:
+                    if cap[k] <= EPSILON: continue
+                    v = head[k]
+                    if v in done: continue
+                    nd = d + cost[k] + pu - potential[v]
+                    if nd < dist.get(v, math.inf) - 1e-12:
+                        dist[v] = nd
+                        parent_arc[v] = k
+                        heapq.heappush(heap, (nd, v))
+
+            if super_sink not in done:
+                break # Cannot happen while the overflow arc has capacity left
+
+            # Keep reduced costs non-negative: shift settled nodes, leave the rest (a constant offset)
+            d_sink = dist[super_sink]
+            for u in settled:
+                potential[u] += dist[u] - d_sink
+
+            # Augment along the path by its bottleneck
+            amount = remaining
+            v = super_sink
+            while v != source:
+                k = parent_arc[v]
+                amount = min(amount, cap[k])
+                v = head[k ^ 1]
+            v = super_sink
+            while v != source:
+                k = parent_arc[v]
+                cap[k] -= amount
+                cap[k ^ 1] += amount
+                if k < last_edge_arc: # Overflow arcs are not real shipments
+                    objective += amount * cost[k]
+                v = head[k ^ 1]
+            remaining -= amount
+
+    flows = {}
+    for k in range(0, last_edge_arc, 2):
+        amount = cap[k + 1]
+        if amount > EPSILON:
+            s = head[k + 1]
+            t = head[k] - n_sources
+            flows[(s, t)] = flows.get((s, t), 0.0) + amount
+
+    return flows, objective
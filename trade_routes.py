@@ -0,0 +1,132 @@
+import numpy as np
+
+import cell_graph
+import simulate_trade
+
+# Configuration
+ASSIGN_TRADE_ROUTES = False # Route every trade over the cell graph and report the busiest corridors
+USE_CONGESTION = False # Re-match trades with volume-dependent edge costs until flows settle
+CORRIDOR_CAPACITY = 50 # Flow at which an edge is considered busy
+CONGESTION_ALPHA = 0.15 # Travel cost grows by alpha x (flow / capacity) ^ beta (BPR curve)
+CONGESTION_BETA = 4
+MAX_ASSIGNMENT_ITERATIONS = 10
+ASSIGNMENT_TOLERANCE = 0.01 # Stop once edge flows change by less than this fraction
+
+def prepare_route_graph(graph):
+    """
+    Adds arc lookups to a cell graph: the tail cell of every CSR arc, sorted arc keys
+    for vectorized (tail, head) -> arc searches, and the reverse of every arc.
+    """
+    n = graph['n']
+    tails = np.repeat(np.arange(n, dtype=np.int64), np.diff(graph['indptr']))
+    keys = tails * n + graph['indices']
+    order = np.argsort(keys, kind='stable')
+    route_graph = dict(graph, tails=tails, arc_keys=keys[order], arc_order=order)
+    route_graph['reverse'] = find_arcs(route_graph, graph['indices'], tails)
+    return route_graph
+
+def find_arcs(graph, tails, heads):
+    """CSR positions of the arcs tail -> head (vectorized; every pair must be an edge of the graph)."""
+    keys = np.asarray(tails, dtype=np.int64) * graph['n'] + np.asarray(heads, dtype=np.int64)
+    return graph['arc_order'][np.searchsorted(graph['arc_keys'], keys)]
+
+def assign_trade_routes(graph, burgs, trades):
+    """
+    Routes every trade along its shortest cell path and returns the traded volume on every arc.
+    Trades are grouped by exporter cell: one shortest-path tree per exporter, and all of its
+    routes are accumulated in a single pass up that tree instead of one path at a time.
+    """
+    cell_of = {b['id']: b.get('cell') for b in burgs}
+    by_source = {}
+    for t in trades:
+        source, target = cell_of.get(t['From_ID']), cell_of.get(t['To_ID'])
+        if source is None or target is None or source == target: continue
+        by_source.setdefault(source, []).append((target, t['Amount']))
+
+    arc_flow = np.zeros(len(graph['indices']))
+    for source, routes in by_source.items():
+        accumulate_source_tree(graph, source, [c for c, _ in routes], [a for _, a in routes], arc_flow)
+    return arc_flow
+
+def accumulate_source_tree(graph, source, target_cells, amounts, arc_flow):
+    """
+    Adds the flows of all routes leaving one source cell to arc_flow.
+    Volumes are dropped at their target cells and pushed towards the source, deepest tree cells first
+    (not by cost: over zero-cost edges a child can cost as much as its parent), so each tree arc carries
+    the sum of everything routed beyond it.
+    """
+    cost, _, predecessor = cell_graph.dijkstra(graph, [source], targets=target_cells)
+    pred = predecessor.tolist()
+
+    volume = {}
+    for cell, amount in zip(target_cells, amounts):
+        if cost[cell] == np.inf: continue # Unreachable over the cell graph
+        volume[cell] = volume.get(cell, 0.0) + amount
+
+    # Cells on the union of the routes with their depth in the tree; each ancestor chain is walked once
+    depth = {source: 0}
+    for cell in list(volume):
+        chain = []
+        while cell not in depth:
+            chain.append(cell)
+            cell = pred[cell]
+        for d, cell in enumerate(reversed(chain), depth[cell] + 1):
+            depth[cell] = d
+    del depth[source]
+    if not depth:
+        return
+
+    nodes = sorted(depth, key=depth.get, reverse=True)
+    for cell in nodes:
+        parent = pred[cell]
+        volume[parent] = volume.get(parent, 0.0) + volume.get(cell, 0.0)
+
+    np.add.at(arc_flow, find_arcs(graph, [pred[c] for c in nodes], nodes), [volume.get(c, 0.0) for c in nodes])
+
+def get_edge_flow(graph, arc_flow):
+    """Flow on every arc's undirected edge (both directions added up)."""
+    return arc_flow + arc_flow[graph['reverse']]
+
+def get_congested_graph(graph, arc_flow):
+    """Copy of the graph with edge costs raised by their flow (BPR volume-delay curve)."""
+    ratio = get_edge_flow(graph, arc_flow) / CORRIDOR_CAPACITY
+    weights = graph['weights'] * (1 + CONGESTION_ALPHA * ratio ** CONGESTION_BETA)
+    return dict(graph, weights=weights.astype(np.float32))
+
+def get_corridors(graph, arc_flow):
+    """Cell edges carrying trade, busiest first, as JSON-ready records."""
+    edge_flow = get_edge_flow(graph, arc_flow)
+    arcs = np.nonzero((edge_flow > 0) & (graph['tails'] < graph['indices']))[0]
+    arcs = arcs[np.argsort(-edge_flow[arcs], kind='stable')]
+    return [{'From_Cell': int(graph['tails'][k]), 'To_Cell': int(graph['indices'][k]), 'Flow': round(float(edge_flow[k]), 2)} for k in arcs]
+
+def simulate_congested_trade(burgs, cells, transport_costs, commodities=None, stats=None):
+    """
+    Trade matching and route assignment repeated with congestion: after each round, edge costs grow
+    with the volume routed over them, the transport cost table is rebuilt and trade is matched again.
+    Flows are averaged over rounds (method of successive averages) until they change by less than
+    ASSIGNMENT_TOLERANCE or MAX_ASSIGNMENT_ITERATIONS is reached.
+    Returns (trades, graph, arc_flow) with the graph of the last round.
+    """
+    graph = prepare_route_graph(cell_graph.build_cell_graph(cells, transport_costs))
+    commodities = commodities or simulate_trade.get_burg_commodities(burgs)
+    importing, exporting = simulate_trade.get_trading_burgs(burgs, commodities)
+
+    arc_flow = None
+    for iteration in range(1, MAX_ASSIGNMENT_ITERATIONS + 1):
+        route_graph = graph if arc_flow is None else get_congested_graph(graph, arc_flow)
+        table = cell_graph.build_transport_cost_table(route_graph, exporting, importing)
+        trades = simulate_trade.simulate_trade(burgs, commodities, transport_costs=table, stats=stats)
+        new_flow = assign_trade_routes(route_graph, burgs, trades)
+
+        if arc_flow is None:
+            arc_flow, change = new_flow, 1.0
+        else:
+            step = (new_flow - arc_flow) / iteration
+            change = np.abs(step).sum() / max(arc_flow.sum(), 1e-9)
+            arc_flow = arc_flow + step
+        print(f"Route assignment {iteration}: flow change {change:.4f}")
+        if change < ASSIGNMENT_TOLERANCE:
+            break
+
+    return trades, route_graph, arc_flow
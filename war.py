@@ -0,0 +1,138 @@
+import time
+
+import numpy as np
+
+import burg_table
+import simulate_economy
+
+# Configuration
+USE_WAR = False # Fight the wars of the diplomacy matrix before trade (burgs change owner, soldiers and population die)
+WAR_TICKS = 1000 # One tick is one month
+HOSTILE_RELATIONS = ("Enemy",) # Diplomacy relations that mean war (either side declaring it is enough)
+CASUALTY_RATE = 0.05 # Share of an army's front strength it kills per tick against an equal enemy
+CONQUEST_RATIO = 2.0 # A front this many times stronger than the enemy's takes one of the enemy's burgs per tick
+SACK_RATE = 0.1 # Share of a conquered burg's population lost
+RECRUIT_RATE = 0.05 # Armies recover this share of the gap to their burgs' soldier citizens per tick
+
+def get_hostility_matrix(states):
+    """States x states boolean matrix of the pairs at war, from each state's diplomacy list (index = state id)."""
+    m = len(states)
+    hostile = np.zeros((m, m), dtype=bool)
+    for i, state in enumerate(states):
+        for j, relation in enumerate(state.get('diplomacy', [])[:m] if isinstance(state, dict) else []):
+            if isinstance(relation, str) and relation in HOSTILE_RELATIONS:
+                hostile[i, j] = True
+    hostile |= hostile.T
+    np.fill_diagonal(hostile, False)
+    if m:
+        hostile[0, :] = hostile[:, 0] = False # Neutrals (state 0) fight nobody
+    return hostile
+
+def init_war_state(table, states, config):
+    """Owner, soldiers and population of every burg plus the hostile state pairs, as arrays."""
+    compiled = simulate_economy.compile_citizen_config(config)
+    names = compiled['citizens']
+    population = table['population'].astype(np.float64)
+    soldiers = table['citizens'][:, names.index('Soldier')].astype(np.float64) if 'Soldier' in names else np.zeros(table['n'])
+    m = max(len(states), max((s for s in table['state'] if s is not None), default=-1) + 1)
+    a, b = np.nonzero(np.triu(np.pad(get_hostility_matrix(states), (0, m - len(states)))))
+
+    return {
+        'tick': 0,
+        'compiled': compiled,
+        'n_states': m,
+        'pairs': (a.astype(np.int64), b.astype(np.int64)),
+        'owner': np.array([0 if s is None else s for s in table['state']], dtype=np.int64),
+        'has_owner': np.array([s is not None for s in table['state']], dtype=bool),
+        'capital': np.array([bool(c) for c in table['capital']], dtype=bool),
+        'population': population,
+        'shares': simulate_economy.get_citizen_shares(population, table['citizens']),
+        'soldiers': soldiers,
+        'soldier_share': np.divide(soldiers, population, out=np.zeros(table['n']), where=population > 0),
+        'conquests': [], # (tick, burg row, from state, to state)
+        'casualties': 0.0,
+    }
+
+def advance_war(state):
+    """
+    One tick of every war at once. Each state splits its soldiers evenly over its fronts; on every front both
+    sides lose soldiers in proportion to the enemy's strength times its share of the front (the stronger side
+    snowballs), and a front CONQUEST_RATIO times stronger than the enemy's takes the enemy's least defended burg
+    (its capital last). States without burgs drop out of their wars. Armies then recruit back towards their burgs' soldiers.
+    """
+    m = state['n_states']
+    owner, soldiers, population = state['owner'], state['soldiers'], state['population']
+    a, b = state['pairs']
+    state['tick'] += 1
+
+    burgs = np.bincount(owner, weights=state['has_owner'], minlength=m)
+    active = (burgs[a] > 0) & (burgs[b] > 0)
+    a, b = a[active], b[active]
+    if len(a):
+        strength = np.bincount(owner, weights=soldiers * state['has_owner'], minlength=m)
+        fronts = np.bincount(a, minlength=m) + np.bincount(b, minlength=m)
+        front = strength / np.maximum(fronts, 1)
+        fa, fb = front[a], front[b]
+        total = np.maximum(fa + fb, 1e-12)
+
+        losses = np.bincount(a, weights=CASUALTY_RATE * fb * fb / total, minlength=m) + np.bincount(b, weights=CASUALTY_RATE * fa * fa / total, minlength=m)
+        loss_share = np.minimum(np.divide(losses, strength, out=np.zeros(m), where=strength > 0), 1)
+        casualties = soldiers * loss_share[owner] * state['has_owner']
+        soldiers -= casualties
+        population -= casualties
+        state['casualties'] += float(casualties.sum())
+
+        # Conquests: each losing state loses one burg per tick, to the first front that beats it
+        a_wins = (fa > 0) & (fa >= CONQUEST_RATIO * fb)
+        b_wins = (fb > 0) & (fb >= CONQUEST_RATIO * fa)
+        losers = np.concatenate([b[a_wins], a[b_wins]])
+        winners = np.concatenate([a[a_wins], b[b_wins]])
+        if len(losers):
+            losers, first = np.unique(losers, return_index=True)
+            winners = winners[first]
+            # Least defended burg of every state, capitals last
+            order = np.lexsort((soldiers, state['capital'], owner, ~state['has_owner']))
+            sorted_owner = owner[order]
+            starts = np.searchsorted(sorted_owner[:int(state['has_owner'].sum())], losers)
+            targets = order[starts]
+            for row, old, new in zip(targets.tolist(), losers.tolist(), winners.tolist()):
+                state['conquests'].append((state['tick'], row, old, new))
+            owner[targets] = winners
+            state['capital'][targets] = False
+            population[targets] *= 1 - SACK_RATE
+            soldiers[targets] = 0
+
+    soldiers += (state['soldier_share'] * population - soldiers) * RECRUIT_RATE
+
+def apply_war_state(table, states, state):
+    """Writes owners (state and state_name), population and the citizens of every changed burg back into the table."""
+    changed = np.nonzero(np.round(state['population']) != table['population'])[0]
+    simulate_economy.update_burg_rows(table, state['compiled'], state['population'], state['shares'], changed)
+    for _, row, _, new in state['conquests']:
+        table['state'][row] = new
+        table['capital'][row] = 0
+    if table['state_name'] is not None:
+        burg_table.set_state_names(table, states)
+
+def run_war(table, states, config, ticks=None):
+    """
+    Fights all wars of the diplomacy matrix for a number of ticks and updates the burg table.
+    Returns stats: conquests as (tick, burg id, from state, to state), casualties and the burgs held per state.
+    """
+    ticks = WAR_TICKS if ticks is None else ticks
+    start = time.perf_counter()
+    state = init_war_state(table, states, config)
+    print(f"--- Simulating Wars ({len(state['pairs'][0])} hostile pairs, {ticks} ticks) ---")
+    for _ in range(ticks):
+        advance_war(state)
+    apply_war_state(table, states, state)
+
+    ids = table['id'].tolist()
+    stats = {
+        'conquests': [(tick, ids[row], old, new) for tick, row, old, new in state['conquests']],
+        'casualties': round(state['casualties']),
+        'burgs': np.bincount(state['owner'][state['has_owner']], minlength=state['n_states']).tolist(),
+        'run_time_s': round(time.perf_counter() - start, 4),
+    }
+    print(f"Conquests: {len(stats['conquests'])}, casualties: {stats['casualties']:,} ({stats['run_time_s']:.2f}s)")
+    return stats